@@ -1,10 +1,58 @@
+import io
 import os
-from flask import Flask, jsonify, request, redirect, url_for, session
+import re
+import csv
+import gzip
+import json
+import time
+import base64
+import random
+import secrets
+import select
+import hashlib
+import hmac
+import queue
+import multiprocessing
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from functools import wraps
+from operator import itemgetter
+import click
+from flask import Flask, Response, g, has_request_context, jsonify, make_response, request, redirect, url_for, session, stream_with_context
+from flask.cli import AppGroup
+from flask.json.provider import DefaultJSONProvider
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSessionInterface, SessionInterface, SessionMixin
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as FlaskSQLAlchemySession
+from sqlalchemy import create_engine, event as sa_event
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DataError, IntegrityError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
 from flask_cors import CORS
 from dotenv import load_dotenv
+from werkzeug.datastructures import CallbackDict, MIMEAccept
+from werkzeug.http import parse_accept_header
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import timedelta
+from datetime import datetime, timedelta
+
+# Optional wire-format accelerators; the API works without any of them
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 # Load environment variables from .env file
 load_dotenv()
@@ -15,16 +63,353 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'default_secret_key')
 app.config['SESSION_COOKIE_NAME'] = 'session'
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=5)
+# Sessions live server-side, keyed by a random id in the cookie: in an
+# in-process LRU of SESSION_MAX_ENTRIES, or in Redis when SESSION_URL is set
+# (needed once there is more than one worker process)
+app.config['SESSION_MAX_ENTRIES'] = int(os.getenv('SESSION_MAX_ENTRIES', 100000))
+app.config['SESSION_URL'] = os.getenv('SESSION_URL')
 
 # Set up the PostgreSQL database connection using SQLAlchemy
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Page sizes for the keyset-paginated event listing
+app.config['EVENTS_PAGE_SIZE'] = int(os.getenv('EVENTS_PAGE_SIZE', 50))
+app.config['EVENTS_MAX_PAGE_SIZE'] = int(os.getenv('EVENTS_MAX_PAGE_SIZE', 200))
+
+# Upper bound on the number of tickets bought in a single purchase
+app.config['MAX_TICKETS_PER_PURCHASE'] = int(os.getenv('MAX_TICKETS_PER_PURCHASE', 10))
+
+# Password hashing runs in a bounded process pool, which keeps the CPU work
+# off the server process. The request thread still waits for the result, so
+# under a sync server each login or registration holds its worker thread for
+# the length of a hash; the per-IP and per-account limits cap how many do at
+# once in each worker. The PBKDF2 iteration count is calibrated at startup to
+# take about PASSWORD_HASH_TARGET_MS, rounded down to a multiple of
+# PASSWORD_HASH_ITERATION_STEP so workers and restarts agree on it, never
+# going below PASSWORD_HASH_MIN_ITERATIONS, unless PASSWORD_HASH_ITERATIONS
+# is set.
+app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', max((os.cpu_count() or 2) // 2, 1)))
+app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 32))
+app.config['PASSWORD_HASH_TARGET_MS'] = int(os.getenv('PASSWORD_HASH_TARGET_MS', 250))
+app.config['PASSWORD_HASH_MIN_ITERATIONS'] = int(os.getenv('PASSWORD_HASH_MIN_ITERATIONS', 600000))
+app.config['PASSWORD_HASH_ITERATIONS'] = int(os.getenv('PASSWORD_HASH_ITERATIONS', 0))
+app.config['PASSWORD_HASH_ITERATION_STEP'] = int(os.getenv('PASSWORD_HASH_ITERATION_STEP', 200000))
+app.config['MAX_HASHES_PER_IP'] = int(os.getenv('MAX_HASHES_PER_IP', 4))
+app.config['MAX_HASHES_PER_ACCOUNT'] = int(os.getenv('MAX_HASHES_PER_ACCOUNT', 1))
+
+# Opt-in request profiling. Statements slower than SLOW_QUERY_MS are logged,
+# and on Postgres a sampled fraction (EXPLAIN_SAMPLE_RATE) of the slow
+# SELECTs is re-run under EXPLAIN ANALYZE and their plans logged.
+app.config['PROFILE_REQUESTS'] = os.getenv('PROFILE_REQUESTS', 'false').lower() == 'true'
+app.config['SLOW_QUERY_MS'] = float(os.getenv('SLOW_QUERY_MS', 200))
+app.config['EXPLAIN_SAMPLE_RATE'] = float(os.getenv('EXPLAIN_SAMPLE_RATE', 0.01))
+
+# Ticket holds: how long a reservation keeps its stock, and how the
+# background sweeper (RESERVATION_SWEEPER=true) releases expired holds
+app.config['RESERVATION_TTL'] = int(os.getenv('RESERVATION_TTL', 600))
+app.config['RESERVATION_SWEEPER'] = os.getenv('RESERVATION_SWEEPER', 'false').lower() == 'true'
+app.config['RESERVATION_SWEEP_INTERVAL'] = float(os.getenv('RESERVATION_SWEEP_INTERVAL', 5))
+app.config['RESERVATION_SWEEP_BATCH'] = int(os.getenv('RESERVATION_SWEEP_BATCH', 500))
+
+# Payment ingest: concurrent webhook callbacks are queued and written together,
+# up to PAYMENT_BATCH_SIZE payments or PAYMENT_BATCH_WINDOW_MS per transaction
+app.config['PAYMENT_BATCH_SIZE'] = int(os.getenv('PAYMENT_BATCH_SIZE', 500))
+app.config['PAYMENT_BATCH_WINDOW_MS'] = float(os.getenv('PAYMENT_BATCH_WINDOW_MS', 10))
+app.config['PAYMENT_INGEST_TIMEOUT'] = float(os.getenv('PAYMENT_INGEST_TIMEOUT', 10))
+# Callbacks are signed by the provider: X-Signature is the hex HMAC-SHA256 of
+# the raw body under PAYMENT_WEBHOOK_SECRET. With no secret set, every
+# callback is rejected.
+app.config['PAYMENT_WEBHOOK_SECRET'] = os.getenv('PAYMENT_WEBHOOK_SECRET')
+
+# Background jobs (`flask jobs work`). Failed batches are retried after
+# JOB_RETRY_BASE * 2^attempts seconds, up to JOB_MAX_ATTEMPTS; jobs left running
+# longer than JOB_TIMEOUT are reclaimed. JOBS_DEFER_SUMMARIES=true moves the
+# event_summary refresh, and the stock deltas of purchases and releases, out of
+# the request transaction onto the queue.
+app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', 2))
+app.config['JOB_BATCH_SIZE'] = int(os.getenv('JOB_BATCH_SIZE', 100))
+app.config['JOB_POLL_INTERVAL'] = float(os.getenv('JOB_POLL_INTERVAL', 1))
+app.config['JOB_MAX_ATTEMPTS'] = int(os.getenv('JOB_MAX_ATTEMPTS', 5))
+app.config['JOB_RETRY_BASE'] = float(os.getenv('JOB_RETRY_BASE', 2))
+app.config['JOB_TIMEOUT'] = int(os.getenv('JOB_TIMEOUT', 300))
+app.config['JOB_RETENTION'] = int(os.getenv('JOB_RETENTION', 86400))
+app.config['JOBS_DEFER_SUMMARIES'] = os.getenv('JOBS_DEFER_SUMMARIES', 'false').lower() == 'true'
+
+# Live inventory push (GET /inventory/stream): changes are coalesced and sent
+# to subscribers every INVENTORY_TICK seconds, with a keepalive comment after
+# INVENTORY_KEEPALIVE idle seconds. Off by default: every write that moves
+# stock pays a snapshot query (and a pg_notify on Postgres), and under WSGI
+# each subscriber holds a worker thread for as long as it stays connected.
+# Enable it when serving asgi:application.
+app.config['INVENTORY_PUSH'] = os.getenv('INVENTORY_PUSH', 'false').lower() == 'true'
+app.config['INVENTORY_TICK'] = float(os.getenv('INVENTORY_TICK', 0.5))
+app.config['INVENTORY_KEEPALIVE'] = float(os.getenv('INVENTORY_KEEPALIVE', 15))
+
+# Rows fetched per round trip by the streaming list endpoints
+app.config['STREAM_BATCH_SIZE'] = int(os.getenv('STREAM_BATCH_SIZE', 1000))
+
+# Response cache for the catalog endpoints. CACHE_TTL (seconds) bounds how
+# long a cached response can outlive a write; CACHE_URL selects a Redis
+# compatible backend instead of the in-process LRU.
+app.config['CACHE_TTL'] = int(os.getenv('CACHE_TTL', 5))
+app.config['CACHE_MAX_ENTRIES'] = int(os.getenv('CACHE_MAX_ENTRIES', 1024))
+app.config['CACHE_URL'] = os.getenv('CACHE_URL')
+
+# Response compression: bodies of at least COMPRESS_MIN_SIZE bytes are sent
+# with brotli (when installed) or gzip, as the client's Accept-Encoding allows
+app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+app.config['GZIP_LEVEL'] = int(os.getenv('GZIP_LEVEL', 6))
+app.config['BROTLI_QUALITY'] = int(os.getenv('BROTLI_QUALITY', 5))
+
+# Connection pool settings, read from the environment. PGBOUNCER=true keeps
+# the connection free of session state (startup options, server-side
+# prepared statements) so it can sit behind PgBouncer in transaction mode.
+app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', 5))
+app.config['DB_MAX_OVERFLOW'] = int(os.getenv('DB_MAX_OVERFLOW', 10))
+app.config['DB_POOL_TIMEOUT'] = int(os.getenv('DB_POOL_TIMEOUT', 30))
+app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', 1800))
+app.config['DB_POOL_PRE_PING'] = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+app.config['DB_STATEMENT_TIMEOUT_MS'] = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))
+app.config['PGBOUNCER'] = os.getenv('PGBOUNCER', 'false').lower() == 'true'
+
+# Read replicas. Read-only GET routes run their queries on one of
+# DATABASE_REPLICA_URLS (comma separated) whose lag, checked every
+# REPLICA_CHECK_INTERVAL seconds, is at most REPLICA_MAX_LAG seconds. After a
+# write, the client reads from the primary for REPLICA_STICKY_SECONDS so it
+# sees its own changes; keep that above REPLICA_MAX_LAG.
+app.config['DATABASE_REPLICA_URLS'] = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+app.config['REPLICA_MAX_LAG'] = float(os.getenv('REPLICA_MAX_LAG', 5))
+app.config['REPLICA_CHECK_INTERVAL'] = float(os.getenv('REPLICA_CHECK_INTERVAL', 1))
+app.config['REPLICA_STICKY_SECONDS'] = float(os.getenv('REPLICA_STICKY_SECONDS', 10))
+
+# Prometheus-style histogram used by the /metrics endpoint
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        with self.lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+            self.total += 1
+            self.sum += value
+
+    def render(self, name, labels=''):
+        prefix = labels + ',' if labels else ''
+        lines = []
+        for bound, count in zip(self.buckets, self.counts):
+            lines.append('{}_bucket{{{}le="{}"}} {}'.format(name, prefix, bound, count))
+        lines.append('{}_bucket{{{}le="+Inf"}} {}'.format(name, prefix, self.total))
+        suffix = '{' + labels + '}' if labels else ''
+        lines.append('{}_sum{} {}'.format(name, suffix, self.sum))
+        lines.append('{}_count{} {}'.format(name, suffix, self.total))
+        return lines
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Pool instrumentation: checkout latency, checkout timeouts and connection churn
+pool_metrics = {
+    "checkout_seconds": Histogram(LATENCY_BUCKETS),
+    "checkout_timeouts": 0,
+    "connections_opened": 0,
+    "connections_closed": 0,
+    "connections_invalidated": 0
+}
+
+class InstrumentedQueuePool(QueuePool):
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics["checkout_timeouts"] += 1
+            raise
+        finally:
+            pool_metrics["checkout_seconds"].observe(time.perf_counter() - started)
+
+def _count_pool_event(name):
+    def listener(*args):
+        pool_metrics[name] += 1
+    return listener
+
+sa_event.listen(InstrumentedQueuePool, 'connect', _count_pool_event("connections_opened"))
+sa_event.listen(InstrumentedQueuePool, 'close', _count_pool_event("connections_closed"))
+sa_event.listen(InstrumentedQueuePool, 'invalidate', _count_pool_event("connections_invalidated"))
+
+def _engine_options(url=None):
+    url = url or app.config['SQLALCHEMY_DATABASE_URI'] or ''
+    options = {"pool_pre_ping": app.config['DB_POOL_PRE_PING']}
+    if not url.startswith('postgres'):
+        return options
+
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=app.config['DB_POOL_SIZE'],
+        max_overflow=app.config['DB_MAX_OVERFLOW'],
+        pool_timeout=app.config['DB_POOL_TIMEOUT'],
+        pool_recycle=app.config['DB_POOL_RECYCLE']
+    )
+    connect_args = {}
+    if app.config['PGBOUNCER']:
+        # psycopg2 never prepares statements server-side; psycopg 3 does
+        # unless told not to
+        if url.startswith('postgresql+psycopg:'):
+            connect_args['prepare_threshold'] = None
+    elif app.config['DB_STATEMENT_TIMEOUT_MS']:
+        connect_args['options'] = '-c statement_timeout={}'.format(app.config['DB_STATEMENT_TIMEOUT_MS'])
+    if connect_args:
+        options['connect_args'] = connect_args
+    return options
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = _engine_options()
+
+# Queries of a read-only request go to the replica picked for it (see
+# read_only below); flushes and INSERT/UPDATE/DELETE statements always run on
+# the primary
+class RoutingSession(FlaskSQLAlchemySession):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context() and g.get('read_replica') is not None:
+            if not getattr(clause, 'is_dml', False):
+                return g.read_replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
 # Initialize the database
-db = SQLAlchemy(app)
+db = SQLAlchemy(app, session_options={"class_": RoutingSession})
+
+# Behind PgBouncer the statement timeout is set per transaction, since
+# session-level settings would leak to other clients of the server connection
+if app.config['PGBOUNCER'] and app.config['DB_STATEMENT_TIMEOUT_MS']:
+    def _set_statement_timeout(conn):
+        conn.exec_driver_sql('SET LOCAL statement_timeout = {}'.format(app.config['DB_STATEMENT_TIMEOUT_MS']))
+
+    with app.app_context():
+        sa_event.listen(db.engine, 'begin', _set_statement_timeout)
+
+# Read replicas
+# Replication lag in seconds, 0 when the replica has replayed everything it
+# has received
+POSTGRES_REPLICA_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END
+"""
+
+class ReplicaRouter:
+    """Picks a replica for each read-only request, skipping lagging or unreachable ones.
+
+    The lag check runs in a background thread started by the first pick;
+    until its first pass completes, reads go to the primary.
+    """
+
+    def __init__(self, urls, max_lag, interval):
+        self.engines = [create_engine(url, **_engine_options(url)) for url in urls]
+        self.max_lag = max_lag
+        self.interval = interval
+        self.lags = [None] * len(urls)
+        self.healthy = []
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def pick(self):
+        """Return the engine to read from, or None for the primary."""
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._run, name='replica-lag-check', daemon=True)
+                    self.thread.start()
+        healthy = self.healthy
+        return self.engines[random.choice(healthy)] if healthy else None
+
+    def check(self):
+        lags = []
+        for engine in self.engines:
+            try:
+                with engine.connect() as conn:
+                    if engine.dialect.name == 'postgresql':
+                        lag = conn.execute(db.text(POSTGRES_REPLICA_LAG_SQL)).scalar()
+                    else:
+                        # No replication to measure; only check the database answers
+                        lag = conn.execute(db.text('SELECT 0')).scalar()
+                lags.append(None if lag is None else float(lag))
+            except Exception as error:
+                app.logger.warning('Replica %s is unreachable: %s', engine.url.render_as_string(hide_password=True), error)
+                lags.append(None)
+        self.lags = lags
+        self.healthy = [index for index, lag in enumerate(lags) if lag is not None and lag <= self.max_lag]
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception:
+                app.logger.exception('Replica lag check failed')
+            time.sleep(self.interval)
+
+replica_router = ReplicaRouter(
+    app.config['DATABASE_REPLICA_URLS'], app.config['REPLICA_MAX_LAG'], app.config['REPLICA_CHECK_INTERVAL']
+) if app.config['DATABASE_REPLICA_URLS'] else None
+
+if replica_router and app.config['PGBOUNCER'] and app.config['DB_STATEMENT_TIMEOUT_MS']:
+    for replica_engine in replica_router.engines:
+        sa_event.listen(replica_engine, 'begin', _set_statement_timeout)
+
+REPLICA_STICKY_COOKIE = 'read_primary_until'
+
+def reads_from_primary(sticky_until):
+    """Whether a client wrote recently; takes the value of its sticky cookie."""
+    try:
+        return float(sticky_until or 0) > time.time()
+    except ValueError:
+        return False
+
+def read_only(view):
+    """Let a view's queries run on a replica, unless the client wrote recently."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if replica_router and not reads_from_primary(request.cookies.get(REPLICA_STICKY_COOKIE)):
+            g.read_replica = replica_router.pick()
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.after_request
+def stick_to_primary(response):
+    if replica_router and request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+        window = app.config['REPLICA_STICKY_SECONDS']
+        response.set_cookie(REPLICA_STICKY_COOKIE, '{:.3f}'.format(time.time() + window), max_age=int(window) + 1, httponly=True, samesite='Lax')
+    return response
+
+# orjson encodes to the same values as the standard encoder (dates still go
+# through Flask's default), several times faster. The text is not identical:
+# non-ASCII characters are written as UTF-8 instead of \u escapes. Anything
+# orjson cannot encode, such as integers beyond 64 bits, falls back to the
+# standard encoder.
+class OrjsonProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        if kwargs.get('indent'):
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=self.default, option=option).decode()
+        except orjson.JSONEncodeError:
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+if orjson is not None:
+    app.json = OrjsonProvider(app)
 
 # Enable Cross-Origin Resource Sharing (CORS)
-CORS(app)
+CORS(app, expose_headers=['X-Next-Cursor', 'Link'])
 
 # Define models here
 class User(db.Model):
@@ -48,6 +433,10 @@ class Event(db.Model):
     organiser_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+    __table_args__ = (
+        # Keyset pagination order for the event listing
+        db.Index('ix_events_time_id', 'time', 'id'),
+    )
 
 class Category(db.Model):
     __tablename__ = 'categories'
@@ -58,11 +447,17 @@ class EventCategory(db.Model):
     __tablename__ = 'event_categories'
     event_id = db.Column(db.Integer, db.ForeignKey('events.id'), primary_key=True)
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), primary_key=True)
+    __table_args__ = (
+        db.Index('ix_event_categories_category_id_event_id', 'category_id', 'event_id'),
+    )
 
 class EventTag(db.Model):
     __tablename__ = 'event_tags'
     event_id = db.Column(db.Integer, db.ForeignKey('events.id'), primary_key=True)
     tag_id = db.Column(db.Integer, db.ForeignKey('tags.id'), primary_key=True)
+    __table_args__ = (
+        db.Index('ix_event_tags_tag_id_event_id', 'tag_id', 'event_id'),
+    )
 
 class EventTicketCount(db.Model):
     __tablename__ = 'event_ticket_count'
@@ -78,12 +473,18 @@ class EventTicketType(db.Model):
     event_id = db.Column(db.Integer, db.ForeignKey('events.id'), nullable=False)
     tier_name = db.Column(db.String(255), nullable=False)
     price = db.Column(db.Integer, nullable=False)
+    __table_args__ = (
+        db.UniqueConstraint('event_id', 'tier_name', name='uq_event_ticket_types_event_id_tier_name'),
+    )
 
 class EventDate(db.Model):
     __tablename__ = 'event_dates'
     id = db.Column(db.Integer, primary_key=True)
     event_id = db.Column(db.Integer, db.ForeignKey('events.id'), nullable=False)
     event_date = db.Column(db.DateTime, nullable=False)
+    __table_args__ = (
+        db.Index('ix_event_dates_event_id_event_date', 'event_id', 'event_date'),
+    )
 
 class Tag(db.Model):
     __tablename__ = 'tags'
@@ -97,16 +498,851 @@ class Ticket(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     tier = db.Column(db.String(50))
     price = db.Column(db.Numeric(10, 2))
+    reservation_id = db.Column(db.Integer, db.ForeignKey('reservations.id'))
+    # 'pending' until a payment for it (or its reservation) settles
+    status = db.Column(db.String(20), nullable=False, default='pending', server_default='pending')
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    __table_args__ = (
+        # Covers the per-user ticket history, newest first
+        db.Index('ix_tickets_user_id_created_at', 'user_id', 'created_at', 'id',
+                 postgresql_include=['event_id', 'tier', 'price', 'status']),
+        db.Index('ix_tickets_event_id', 'event_id'),
+    )
 
 class Payment(db.Model):
     __tablename__ = 'payments'
     id = db.Column(db.Integer, primary_key=True)
     ticket_id = db.Column(db.Integer, db.ForeignKey('tickets.id'), nullable=False)
-    transaction_id = db.Column(db.String(255))
+    # Unique so provider webhook retries land on the same row
+    transaction_id = db.Column(db.String(255), unique=True)
     status = db.Column(db.String(50))
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    __table_args__ = (
+        # Latest payment per ticket without touching the table
+        db.Index('ix_payments_ticket_id', 'ticket_id', 'id', postgresql_include=['status']),
+    )
+
+# Time-boxed hold on ticket stock, taken from EventTicketCount.available_count
+class Reservation(db.Model):
+    __tablename__ = 'reservations'
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('events.id'), nullable=False)
+    tier = db.Column(db.String(255), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='held')  # held, confirmed or released
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    __table_args__ = (
+        # Only live holds are indexed, so the sweeper's scan stays proportional to them
+        db.Index('ix_reservations_held_expires_at', 'expires_at',
+                 postgresql_where=db.text("status = 'held'"), sqlite_where=db.text("status = 'held'")),
+    )
+
+# Deferred work, written in the same transaction as the change that caused it
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done or failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    latency = db.Column(db.Float)  # seconds from enqueue to completion
+    last_error = db.Column(db.Text)
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+
+# Denormalised read model for the homepage, maintained from the tables above
+class EventSummary(db.Model):
+    __tablename__ = 'event_summary'
+    event_id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(255), nullable=False)
+    venue = db.Column(db.String(255))
+    time = db.Column(db.DateTime)
+    image_url = db.Column(db.String(255))
+    next_date = db.Column(db.DateTime)
+    min_price = db.Column(db.Integer)
+    max_price = db.Column(db.Integer)
+    total_available = db.Column(db.Integer, nullable=False, default=0)
+    sold_out = db.Column(db.Boolean, nullable=False, default=False)
+    category_names = db.Column(db.Text)
+    tag_names = db.Column(db.Text)
+    id = db.synonym('event_id')
+    __table_args__ = (
+        db.Index('ix_event_summary_time_event_id', 'time', 'event_id'),
+    )
 	
+# Response cache
+# Backends store opaque bytes with a TTL and keep integer generation counters.
+# Invalidation bumps a generation, which retires every key built from it.
+class MemoryCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.generations = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def generation(self, key):
+        return self.generations.get(key, 0)
+
+    def incr(self, key):
+        with self.lock:
+            self.generations[key] = self.generations.get(key, 0) + 1
+            return self.generations[key]
+
+class RedisCache:
+    def __init__(self, url):
+        import redis  # Only needed when CACHE_URL is set
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl):
+        self.client.set(key, value, ex=ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*keys)
+
+    def generation(self, key):
+        return int(self.client.get('gen:' + key) or 0)
+
+    def incr(self, key):
+        return self.client.incr('gen:' + key)
+
+if app.config['CACHE_URL']:
+    response_cache = RedisCache(app.config['CACHE_URL'])
+else:
+    response_cache = MemoryCache(app.config['CACHE_MAX_ENTRIES'])
+
+# Wire formats
+# Catalog routes negotiate their representation: plain JSON (the default), a
+# columnar JSON variant (?format=columnar or Accept: application/vnd.columnar+json)
+# that lists the keys of each array of objects once, including those of nested
+# arrays such as ticket_counts, whose rows sit inline; and the same columnar
+# shape as MessagePack (?format=msgpack or Accept: application/msgpack).
+# Responses are then compressed according to Accept-Encoding. The helpers
+# below take header values rather than the request so asgi.py can share them.
+COLUMNAR_MIMETYPE = 'application/vnd.columnar+json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+CATALOG_MIMETYPES = {'json': 'application/json', 'columnar': COLUMNAR_MIMETYPE, 'msgpack': MSGPACK_MIMETYPE}
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', COLUMNAR_MIMETYPE, MSGPACK_MIMETYPE, 'text/csv'}
+
+def negotiate_catalog_format(format_arg, accept):
+    formats = ['json', 'columnar'] + (['msgpack'] if msgpack is not None else [])
+    if format_arg in formats:
+        return format_arg
+    best = parse_accept_header(accept or '', MIMEAccept).best_match([CATALOG_MIMETYPES[fmt] for fmt in formats])
+    return next((fmt for fmt in formats if CATALOG_MIMETYPES[fmt] == best), 'json')
+
+def negotiate_encoding(accept_encoding):
+    encodings = (['br'] if brotli is not None else []) + ['gzip']
+    return parse_accept_header(accept_encoding or '').best_match(encodings)
+
+def _columnar_table(items):
+    columns = list(dict.fromkeys(key for item in items for key in item))
+    if len(columns) == 1:
+        rows = [[item.get(columns[0])] for item in items]
+    else:
+        # Rows are built by itemgetter; items missing a key take the slow path
+        getter = itemgetter(*columns)
+        rows = [list(getter(item)) if len(item) == len(columns) else [item.get(column) for column in columns]
+                for item in items]
+
+    schema = []
+    for index, column in enumerate(columns):
+        cells = [row[index] for row in rows if isinstance(row[index], list) and row[index]]
+        if not cells or not all(isinstance(item, dict) for cell in cells for item in cell):
+            schema.append(column)
+            continue
+        # Nested lists of objects share one column list, declared in the schema
+        nested_schema, nested_rows = _columnar_table([item for cell in cells for item in cell])
+        position = 0
+        for row in rows:
+            cell = row[index]
+            if isinstance(cell, list) and cell:
+                row[index] = nested_rows[position:position + len(cell)]
+                position += len(cell)
+        schema.append({"name": column, "columns": nested_schema})
+    return schema, rows
+
+def to_columnar(value):
+    """Turn lists of objects into {"columns": [...], "rows": [[...], ...]}."""
+    if isinstance(value, dict):
+        return {key: to_columnar(item) for key, item in value.items()}
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        columns, rows = _columnar_table(value)
+        return {"columns": columns, "rows": rows}
+    return value
+
+def encode_catalog(data, fmt):
+    """Serialise catalog data; returns (body bytes, mimetype)."""
+    if fmt == 'json':
+        return app.json.response(data).get_data(), 'application/json'
+    data = to_columnar(data)
+    if fmt == 'msgpack':
+        return msgpack.packb(data, default=app.json.default), MSGPACK_MIMETYPE
+    return app.json.response(data).get_data(), COLUMNAR_MIMETYPE
+
+def compress_body(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=app.config['BROTLI_QUALITY'])
+    # A fixed mtime keeps the output, and so the ETag, stable
+    return gzip.compress(body, compresslevel=app.config['GZIP_LEVEL'], mtime=0)
+
+def catalog_format():
+    return negotiate_catalog_format(request.args.get('format'), request.headers.get('Accept'))
+
+def catalog_response(data):
+    body, mimetype = encode_catalog(data, catalog_format())
+    response = app.response_class(body, mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compress buffered responses the client accepts an encoding for."""
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers
+            or response.status_code != 200):
+        return response
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    body = response.get_data()
+    if not encoding or len(body) < app.config['COMPRESS_MIN_SIZE']:
+        return response
+    response.set_data(compress_body(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+# Cached responses are stored as a JSON header line (ETag and extra headers)
+# followed by the serialised body
+def _pack_response(response):
+    body = response.get_data()
+    headers = {k: v for k, v in response.headers.items() if k not in ('Content-Type', 'Content-Length')}
+    header = {"etag": hashlib.sha1(body).hexdigest(), "mimetype": response.mimetype, "headers": headers}
+    return json.dumps(header).encode() + b'\n' + body
+
+def _unpack_response(entry):
+    header, body = entry.split(b'\n', 1)
+    header = json.loads(header)
+    response = Response(body, mimetype=header['mimetype'], headers=header['headers'])
+    response.set_etag(header['etag'])
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def cached_response(*namespaces):
+    """Serve a GET view from the response cache.
+
+    The key is built from the request path and query string, the current
+    generation of each namespace, which may reference view arguments
+    (e.g. ``'event:{id}'``), and the negotiated format and encoding.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            generations = [
+                '{}={}'.format(name, response_cache.generation(name))
+                for name in (namespace.format(**kwargs) for namespace in namespaces)
+            ]
+            # One entry per representation, stored already compressed. Replica
+            # reads are kept apart, so a lagging replica's copy is never served
+            # to a client that must see its own writes.
+            key = 'response:{}:{}:{}:{}:{}'.format(
+                request.full_path, ','.join(generations), catalog_format(),
+                negotiate_encoding(request.headers.get('Accept-Encoding')),
+                'primary' if g.get('read_replica') is None else 'replica'
+            )
+            entry = response_cache.get(key)
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                entry = _pack_response(compress_response(response))
+                response_cache.set(key, entry, app.config['CACHE_TTL'])
+            return _unpack_response(entry)
+        return wrapper
+    return decorator
+
+def invalidate_cache(*namespaces):
+    for namespace in namespaces:
+        response_cache.incr(namespace)
+
+def invalidate_event_cache(*event_ids):
+    # Listings can include any event, so they are retired on every change
+    invalidate_cache('events', *['event:{}'.format(event_id) for event_id in event_ids])
+
+# Event catalog loader
+# Fetches the dates, ticket counts and ticket types for a batch of events with
+# one query per table, so the number of statements does not grow with the
+# number of events.
+def _catalog_child_queries(event_ids):
+    dates_query = db.select(EventDate.event_id, EventDate.event_date) \
+        .where(EventDate.event_id.in_(event_ids)) \
+        .order_by(EventDate.event_id, EventDate.id)
+    counts_query = db.select(
+        EventTicketCount.event_id,
+        EventTicketCount.tier,
+        EventTicketCount.total_count,
+        EventTicketCount.available_count,
+        EventTicketCount.total_purchased
+    ).where(EventTicketCount.event_id.in_(event_ids)) \
+        .order_by(EventTicketCount.event_id, EventTicketCount.tier)
+    types_query = db.select(EventTicketType.event_id, EventTicketType.tier_name, EventTicketType.price) \
+        .where(EventTicketType.event_id.in_(event_ids)) \
+        .order_by(EventTicketType.event_id, EventTicketType.id)
+    return dates_query, counts_query, types_query
+
+def _assemble_catalog(events, date_rows, count_rows, type_rows):
+    dates = {}
+    for row in date_rows:
+        # Keep the first date recorded for each event
+        dates.setdefault(row.event_id, row.event_date)
+
+    ticket_data = {}
+    for row in count_rows:
+        ticket_data.setdefault(row.event_id, []).append({
+            "tier": row.tier,
+            "total_count": row.total_count,
+            "available_count": row.available_count,
+            "total_purchased": row.total_purchased
+        })
+
+    ticket_types_data = {}
+    for row in type_rows:
+        ticket_types_data.setdefault(row.event_id, []).append({
+            "tier_name": row.tier_name,
+            "price": row.price
+        })
+
+    events_data = []
+    for event in events:
+        event_date = dates.get(event.id)
+        events_data.append({
+            "id": event.id,
+            "name": event.name,
+            "description": event.description,
+            "venue": event.venue,
+            "time": event.time.strftime('%H:%M') if event.time else None,
+            "image_url": event.image_url,
+            "date": event_date.strftime('%Y-%m-%d') if event_date else None,
+            "ticket_counts": ticket_data.get(event.id, []),  # Ticket counts for each tier
+            "ticket_types": ticket_types_data.get(event.id, [])  # Ticket types and prices
+        })
+    return events_data
+
+def load_event_catalog(events):
+    events = list(events)
+    if not events:
+        return []
+    event_ids = [event.id for event in events]
+    dates_query, counts_query, types_query = _catalog_child_queries(event_ids)
+    return _assemble_catalog(
+        events,
+        db.session.execute(dates_query),
+        db.session.execute(counts_query),
+        db.session.execute(types_query)
+    )
+
+# Streaming list responses
+# Rows are read from a server-side cursor one batch at a time and written out
+# as they arrive, as a JSON array or as NDJSON (?format=ndjson or
+# Accept: application/x-ndjson), so memory use does not grow with the table.
+def stream_rows(query):
+    ndjson = request.args.get('format') == 'ndjson' or \
+        request.accept_mimetypes.best == 'application/x-ndjson'
+
+    def generate():
+        result = db.session.execute(query.execution_options(yield_per=app.config['STREAM_BATCH_SIZE']))
+        if ndjson:
+            for rows in result.partitions():
+                yield ''.join(app.json.dumps(row._asdict()) + '\n' for row in rows)
+            return
+        separator = '['
+        for rows in result.partitions():
+            yield separator + ','.join(app.json.dumps(row._asdict()) for row in rows)
+            separator = ','
+        yield ']' if separator == ',' else '[]'
+
+    mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+# Password hashing
+def _calibrate_hash_iterations():
+    if app.config['PASSWORD_HASH_ITERATIONS']:
+        return app.config['PASSWORD_HASH_ITERATIONS']
+    probe = 50000
+    started = time.perf_counter()
+    hashlib.pbkdf2_hmac('sha256', b'calibration', b'salt', probe)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    iterations = int(probe * app.config['PASSWORD_HASH_TARGET_MS'] / max(elapsed_ms, 0.001))
+    # Timing noise between probes would otherwise change the count, and every
+    # increase makes users' next login rehash
+    step = max(app.config['PASSWORD_HASH_ITERATION_STEP'], 1)
+    return max(iterations // step * step, app.config['PASSWORD_HASH_MIN_ITERATIONS'])
+
+PASSWORD_HASH_METHOD = 'pbkdf2:sha256:{}'.format(_calibrate_hash_iterations())
+
+_hash_executor = None
+_hash_executor_lock = threading.Lock()
+
+def _run_hash(function, *args):
+    global _hash_executor
+    if app.config['PASSWORD_HASH_WORKERS'] <= 0:
+        return function(*args)
+    # Created on first use so each server worker process gets its own pool
+    with _hash_executor_lock:
+        if _hash_executor is None:
+            _hash_executor = ProcessPoolExecutor(max_workers=app.config['PASSWORD_HASH_WORKERS'])
+    return _hash_executor.submit(function, *args).result()
+
+def hash_password(password):
+    return _run_hash(generate_password_hash, password, PASSWORD_HASH_METHOD)
+
+def verify_password(password_hash, password):
+    return _run_hash(check_password_hash, password_hash, password)
+
+def password_needs_rehash(password_hash):
+    method = password_hash.split('$', 1)[0]
+    if not method.startswith('pbkdf2:sha256:'):
+        return True
+    return int(method.rsplit(':', 1)[1]) < int(PASSWORD_HASH_METHOD.rsplit(':', 1)[1])
+
+# In-flight hashes, counted per client IP and per account
+_hash_slots = Counter()
+_hash_slots_lock = threading.Lock()
+
+@contextmanager
+def password_hash_slot(account):
+    keys = ('pending', 'ip:{}'.format(request.remote_addr), 'account:{}'.format(account))
+    limits = (app.config['PASSWORD_HASH_MAX_PENDING'], app.config['MAX_HASHES_PER_IP'], app.config['MAX_HASHES_PER_ACCOUNT'])
+    with _hash_slots_lock:
+        acquired = all(_hash_slots[key] < limit for key, limit in zip(keys, limits))
+        if acquired:
+            for key in keys:
+                _hash_slots[key] += 1
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with _hash_slots_lock:
+                for key in keys:
+                    _hash_slots[key] -= 1
+                    if not _hash_slots[key]:
+                        del _hash_slots[key]
+
+# Event summary read model
+# One event_summary row per event, recomputed in the same transaction as any
+# write to the event or its dates, tiers, categories or tags. ORM changes are
+# picked up at flush; writes that bypass the unit of work (bulk inserts,
+# conditional UPDATEs) call mark_events_changed. Sales and holds only move
+# stock, so they call adjust_event_inventory instead and the summary row is
+# shifted in place rather than recomputed. next_date only counts upcoming
+# dates, so `flask summary rebuild` should also run periodically.
+SUMMARY_SEPARATOR = ', '
+
+def upsert(model, rows, conflict_columns, update_columns=None, where=None, returning=()):
+    insert = postgresql_insert if db.engine.dialect.name == 'postgresql' else sqlite_insert
+    statement = insert(model).values(rows)
+    if update_columns:
+        statement = statement.on_conflict_do_update(
+            index_elements=conflict_columns,
+            set_={column: statement.excluded[column] for column in update_columns},
+            where=where
+        )
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=conflict_columns)
+    if returning:
+        statement = statement.returning(*returning)
+    return db.session.execute(statement)
+
+def _event_summary_query(event_ids=None):
+    def tiers(*criteria):
+        return db.select(EventTicketCount.event_id).where(EventTicketCount.event_id == Event.id, *criteria)
+
+    def names(model, link, link_column):
+        return db.select(db.func.aggregate_strings(model.name, SUMMARY_SEPARATOR)) \
+            .join(link, link_column == model.id) \
+            .where(link.event_id == Event.id).scalar_subquery()
+
+    def price(aggregate):
+        return db.select(aggregate(EventTicketType.price)) \
+            .where(EventTicketType.event_id == Event.id).scalar_subquery()
+
+    query = db.select(
+        Event.id.label('event_id'),
+        Event.name,
+        Event.venue,
+        Event.time,
+        Event.image_url,
+        db.select(db.func.min(EventDate.event_date))
+            .where(EventDate.event_id == Event.id, EventDate.event_date >= datetime.now())
+            .scalar_subquery().label('next_date'),
+        price(db.func.min).label('min_price'),
+        price(db.func.max).label('max_price'),
+        db.select(db.func.coalesce(db.func.sum(EventTicketCount.available_count), 0))
+            .where(EventTicketCount.event_id == Event.id)
+            .scalar_subquery().label('total_available'),
+        db.and_(tiers().exists(), ~tiers(EventTicketCount.available_count > 0).exists()).label('sold_out'),
+        names(Category, EventCategory, EventCategory.category_id).label('category_names'),
+        names(Tag, EventTag, EventTag.tag_id).label('tag_names')
+    )
+    if event_ids is not None:
+        query = query.where(Event.id.in_(event_ids))
+    return query.order_by(Event.id)
+
+SUMMARY_COLUMNS = ['name', 'venue', 'time', 'image_url', 'next_date', 'min_price', 'max_price',
+                   'total_available', 'sold_out', 'category_names', 'tag_names']
+
+def refresh_event_summaries(event_ids):
+    event_ids = sorted(set(event_ids))
+    if not event_ids:
+        return
+    # Lock the existing rows first, so the recomputation below runs after any
+    # concurrent refresh of the same events has committed
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(
+            db.select(EventSummary.event_id).where(EventSummary.event_id.in_(event_ids))
+            .order_by(EventSummary.event_id).with_for_update()
+        )
+    rows = [dict(row) for row in db.session.execute(_event_summary_query(event_ids)).mappings()]
+    for row in rows:
+        row['sold_out'] = bool(row['sold_out'])
+    if rows:
+        upsert(EventSummary, rows, ['event_id'], SUMMARY_COLUMNS)
+    deleted = set(event_ids) - {row['event_id'] for row in rows}
+    if deleted:
+        db.session.execute(db.delete(EventSummary).where(EventSummary.event_id.in_(deleted)))
+
+def mark_events_changed(*event_ids):
+    db.session.info.setdefault('changed_event_ids', set()).update(event_ids)
+
+def adjust_event_inventory(event_id, delta):
+    db.session.info.setdefault('inventory_deltas', Counter())[event_id] += delta
+
+def _apply_inventory_deltas(session, deltas):
+    # available_count never goes below zero, so the event is sold out exactly
+    # when the sum reaches zero. Every tier of an event shares its summary row,
+    # so inline this runs as the last statement before COMMIT and holds the row
+    # lock for that one round trip; JOBS_DEFER_SUMMARIES hands it to the queue,
+    # where a batch of jobs applies one summed update per event.
+    for event_id, delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        session.execute(
+            db.update(EventSummary)
+            .where(EventSummary.event_id == event_id)
+            .values(
+                total_available=EventSummary.total_available + delta,
+                sold_out=EventSummary.total_available + delta <= 0
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+def _track_changed_events(session, flush_context):
+    changed = session.info.setdefault('changed_event_ids', set())
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(instance, Event):
+            changed.add(instance.id)
+        elif isinstance(instance, (EventDate, EventTicketCount, EventTicketType, EventCategory, EventTag)):
+            changed.add(instance.event_id)
+
+def _refresh_changed_summaries(session):
+    session.flush()
+    # Left in place for the other before_commit listeners; cleared after commit
+    changed = session.info.get('changed_event_ids') or set()
+    # A full recompute of the same event already sees the new stock
+    deltas = {event_id: delta for event_id, delta in (session.info.get('inventory_deltas') or {}).items()
+              if delta and event_id not in changed}
+    event_ids = sorted(event_id for event_id in changed if event_id is not None)
+    if app.config['JOBS_DEFER_SUMMARIES']:
+        if deltas:
+            enqueue_job('inventory_deltas', {"deltas": {str(event_id): delta for event_id, delta in deltas.items()}})
+        if event_ids:
+            enqueue_job('refresh_summaries', {"event_ids": event_ids})
+        return
+    if deltas:
+        _apply_inventory_deltas(session, deltas)
+    if event_ids:
+        refresh_event_summaries(event_ids)
+
+def _discard_changed_events(session):
+    session.info.pop('changed_event_ids', None)
+    session.info.pop('inventory_deltas', None)
+
+sa_event.listen(db.session, 'after_flush', _track_changed_events)
+sa_event.listen(db.session, 'before_commit', _refresh_changed_summaries)
+sa_event.listen(db.session, 'after_commit', _discard_changed_events)
+sa_event.listen(db.session, 'after_rollback', _discard_changed_events)
+
+def serialize_event_summary(summary):
+    return {
+        "id": summary.event_id,
+        "name": summary.name,
+        "venue": summary.venue,
+        "time": summary.time.strftime('%H:%M') if summary.time else None,
+        "image_url": summary.image_url,
+        "next_date": summary.next_date.strftime('%Y-%m-%d') if summary.next_date else None,
+        "min_price": summary.min_price,
+        "max_price": summary.max_price,
+        "total_available": summary.total_available,
+        "sold_out": summary.sold_out,
+        "categories": summary.category_names.split(SUMMARY_SEPARATOR) if summary.category_names else [],
+        "tags": summary.tag_names.split(SUMMARY_SEPARATOR) if summary.tag_names else []
+    }
+
+# Server-side sessions
+# The store keeps the session data (user_id, username and role, i.e. the
+# principal) plus an index of session ids per user, so both lookup and
+# revoking every session of a user are O(1) per session.
+class MemorySessionStore:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.user_sessions = {}
+        self.lock = threading.Lock()
+
+    def get(self, sid):
+        with self.lock:
+            entry = self.entries.get(sid)
+            if entry is None:
+                return None
+            data, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(sid)
+                return None
+            self.entries.move_to_end(sid)
+            return dict(data)
+
+    def set(self, sid, data, ttl):
+        with self.lock:
+            self._remove(sid)
+            self.entries[sid] = (dict(data), time.monotonic() + ttl)
+            if data.get('user_id') is not None:
+                self.user_sessions.setdefault(data['user_id'], set()).add(sid)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def delete(self, sid):
+        with self.lock:
+            self._remove(sid)
+
+    def delete_user(self, user_id):
+        with self.lock:
+            sids = self.user_sessions.pop(user_id, set())
+            for sid in sids:
+                self.entries.pop(sid, None)
+            return len(sids)
+
+    def _remove(self, sid):
+        entry = self.entries.pop(sid, None)
+        if entry is None:
+            return
+        user_id = entry[0].get('user_id')
+        sids = self.user_sessions.get(user_id)
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del self.user_sessions[user_id]
+
+class RedisSessionStore:
+    def __init__(self, url):
+        import redis  # Only needed when SESSION_URL is set
+        self.client = redis.Redis.from_url(url)
+        self.serializer = TaggedJSONSerializer()
+
+    def get(self, sid):
+        data = self.client.get('session:' + sid)
+        return self.serializer.loads(data) if data is not None else None
+
+    def set(self, sid, data, ttl):
+        pipeline = self.client.pipeline()
+        pipeline.set('session:' + sid, self.serializer.dumps(dict(data)), ex=ttl)
+        if data.get('user_id') is not None:
+            key = 'user_sessions:{}'.format(data['user_id'])
+            pipeline.sadd(key, sid)
+            pipeline.expire(key, ttl)
+        pipeline.execute()
+
+    def delete(self, sid):
+        self.client.delete('session:' + sid)
+
+    def delete_user(self, user_id):
+        key = 'user_sessions:{}'.format(user_id)
+        sids = self.client.smembers(key)
+        if sids:
+            self.client.delete(*['session:' + sid.decode() for sid in sids])
+        self.client.delete(key)
+        return len(sids)
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.accessed = False
+        self.previous_sid = None
+
+    # Only responses that read the session vary by Cookie
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        self.accessed = True
+        return super().__contains__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+    def regenerate(self):
+        """Move the session to a fresh id, so an id planted before login is useless."""
+        if not self.new:
+            self.previous_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.modified = True
+
+class ServerSessionInterface(SessionInterface):
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.store.get(sid)
+            if data is not None:
+                return ServerSession(data, sid=sid)
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+        if session.previous_sid:
+            self.store.delete(session.previous_sid)
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure, samesite=samesite, httponly=httponly)
+            return
+        if not session.modified:
+            return
+        self.store.set(session.sid, session, int(app.permanent_session_lifetime.total_seconds()))
+        response.set_cookie(
+            name, session.sid, expires=self.get_expiration_time(app, session),
+            domain=domain, path=path, secure=secure, samesite=samesite, httponly=httponly
+        )
+
+if app.config['SESSION_URL']:
+    session_store = RedisSessionStore(app.config['SESSION_URL'])
+else:
+    session_store = MemorySessionStore(app.config['SESSION_MAX_ENTRIES'])
+app.session_interface = ServerSessionInterface(session_store)
+
+def revoke_user_sessions(user_id):
+    """Log a user out everywhere, e.g. after a role or password change."""
+    return session_store.delete_user(user_id)
+
+def organiser_required(view):
+    # The role comes from the session, so the check needs no users lookup
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({"message": "Login required"}), 401
+        if session.get('role') != 'organiser':
+            return jsonify({"message": "Organiser access required"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+sessions_cli = AppGroup('sessions', help='Server-side session maintenance.')
+
+@sessions_cli.command('revoke')
+@click.argument('user_id', type=int)
+def revoke_sessions_command(user_id):
+    """End every session of a user."""
+    click.echo('Revoked {} sessions'.format(revoke_user_sessions(user_id)))
+
+@sessions_cli.command('bench')
+@click.option('--requests', 'count', default=10000, show_default=True)
+def bench_sessions_command(count):
+    """Measure the auth overhead of an organiser route per request."""
+    user = User.query.order_by(User.role != 'organiser', User.id).first()
+    if not user:
+        raise click.ClickException('Register a user first')
+    principal = {"user_id": user.id, "username": user.username, "role": user.role}
+    cookie_interface = SecureCookieSessionInterface()
+    signed_cookie = cookie_interface.get_signing_serializer(app).dumps(principal)
+    sid = secrets.token_urlsafe(32)
+    session_store.set(sid, principal, 60)
+
+    def measure(label, interface, cookie, load_role):
+        headers = {'Cookie': '{}={}'.format(app.config['SESSION_COOKIE_NAME'], cookie)}
+        with app.test_request_context(headers=headers):
+            start = time.perf_counter()
+            for _ in range(count):
+                current = interface.open_session(app, request)
+                if load_role:
+                    role = db.session.execute(db.select(User.role).where(User.id == current['user_id'])).scalar()
+                else:
+                    role = current.get('role')
+                assert role == user.role
+            elapsed = time.perf_counter() - start
+        click.echo('{:<28} {:10.1f} us/request'.format(label, elapsed / count * 1e6))
+
+    try:
+        measure('signed cookie + users query', cookie_interface, signed_cookie, True)
+        measure('signed cookie', cookie_interface, signed_cookie, False)
+        measure('server-side store', app.session_interface, sid, False)
+    finally:
+        session_store.delete(sid)
+
+app.cli.add_command(sessions_cli)
+
 # Define routes here
 # Register route
 @app.route('/register', methods=['POST'])
@@ -119,15 +1355,20 @@ def register():
 
     if not username:
         return jsonify({"message": "Username is required"}), 400
-
-    # Hash password for storage
-    hashed_password = generate_password_hash(password, method='pbkdf2:sha256')
+    if not password:
+        return jsonify({"message": "Password is required"}), 400
 
     # Check if user already exists
     existing_user = User.query.filter_by(email=email).first()
     if existing_user:
         return jsonify({"message": "User already exists"}), 409
 
+    # Hash password for storage
+    with password_hash_slot(email) as acquired:
+        if not acquired:
+            return jsonify({"message": "Too many requests, try again shortly"}), 429
+        hashed_password = hash_password(password)
+
     # Create new user and add to database
     new_user = User(
         username=username,
@@ -150,10 +1391,22 @@ def login():
 
     # Find user by email
     user = User.query.filter_by(email=email).first()
-    if not user or not check_password_hash(user.password, password):
+    if not user or not password:
         return jsonify({"message": "Invalid credentials"}), 401
-    
-    # Store user information in session
+
+    with password_hash_slot(email) as acquired:
+        if not acquired:
+            return jsonify({"message": "Too many login attempts, try again shortly"}), 429
+        if not verify_password(user.password, password):
+            return jsonify({"message": "Invalid credentials"}), 401
+
+        # Upgrade hashes made with older parameters while the password is at hand
+        if password_needs_rehash(user.password):
+            user.password = hash_password(password)
+            db.session.commit()
+
+    # Store user information in session, under a fresh session id
+    session.regenerate()
     session['user_id'] = user.id
     session['username'] = user.username
     session['role'] = user.role
@@ -168,6 +1421,15 @@ def logout():
     session.pop('role', None)
     return redirect(url_for('home'))
 
+# Ends every session of the logged in user, on all devices
+@app.route('/logout/all', methods=['POST'])
+def logout_all():
+    if 'user_id' not in session:
+        return jsonify({"message": "You are not logged in"}), 401
+    revoke_user_sessions(session['user_id'])
+    session.clear()
+    return jsonify({"message": "Logged out of all sessions"}), 200
+
 # Home route
 @app.route('/')
 def home():
@@ -186,244 +1448,1305 @@ def check_login():
 		
 # Routes for Users
 @app.route('/users', methods=['GET'])
+@read_only
 def get_users():
-    users = User.query.all()
-    users_data = [{"id": user.id, "username": user.username, "email": user.email, "role": user.role} for user in users]
-    return jsonify(users_data), 200
+    query = db.select(User.id, User.username, User.email, User.role).order_by(User.id)
+    return stream_rows(query), 200
 
 @app.route('/users/<int:id>', methods=['GET'])
+@read_only
 def get_user(id):
     user = User.query.get(id)
     if user:
         return jsonify({"id": user.id, "username": user.username, "email": user.email, "role": user.role}), 200
     return jsonify({"message": "User not found"}), 404
 
+# Ticket history for a user, newest first, keyset-paginated on (created_at, id)
+@app.route('/users/<int:id>/tickets', methods=['GET'])
+@read_only
+def get_user_tickets(id):
+    if not db.session.get(User, id):
+        return jsonify({"message": "User not found"}), 404
+
+    limit = request.args.get('limit', app.config['EVENTS_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, app.config['EVENTS_MAX_PAGE_SIZE']))
+    event_date = db.select(db.func.min(EventDate.event_date)) \
+        .where(EventDate.event_id == Ticket.event_id).scalar_subquery()
+    payment_status = db.select(Payment.status).where(Payment.ticket_id == Ticket.id) \
+        .order_by(Payment.id.desc()).limit(1).scalar_subquery()
+    query = db.select(
+        Ticket.id,
+        Ticket.event_id,
+        Ticket.tier,
+        Ticket.price,
+        Ticket.status,
+        Ticket.created_at,
+        Event.name.label('event_name'),
+        event_date.label('event_date'),
+        payment_status.label('payment_status')
+    ).join(Event, Event.id == Ticket.event_id).where(Ticket.user_id == id)
+
+    # The cursor is the last ticket id; its created_at is read back in SQL so
+    # the comparison uses the stored value
+    before_id = request.args.get('cursor', type=int)
+    if before_id is not None:
+        before_time = db.select(Ticket.created_at).where(Ticket.id == before_id).scalar_subquery()
+        query = query.where(db.tuple_(Ticket.created_at, Ticket.id) < db.tuple_(before_time, before_id))
+    query = query.order_by(Ticket.created_at.desc(), Ticket.id.desc()).limit(limit + 1)
+
+    tickets = db.session.execute(query).all()
+    response = jsonify([{
+        "id": ticket.id,
+        "event_id": ticket.event_id,
+        "event_name": ticket.event_name,
+        "event_date": ticket.event_date.strftime('%Y-%m-%d') if ticket.event_date else None,
+        "tier": ticket.tier,
+        "price": ticket.price,
+        "status": ticket.status,
+        "payment_status": ticket.payment_status,
+        "created_at": ticket.created_at
+    } for ticket in tickets[:limit]])
+    if len(tickets) > limit:
+        response.headers['X-Next-Cursor'] = str(tickets[limit - 1].id)
+    return response, 200
+
 # Routes for Events
+# Cursors are opaque to clients: the (time, id) of the last event on a page
+def _encode_events_cursor(event):
+    key = [event.time.isoformat() if event.time else None, event.id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def _decode_events_cursor(cursor):
+    time, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return (datetime.fromisoformat(time) if time else None), int(id)
+
+def keyset_phases(query, time_column, id_column, cursor, limit):
+    """Split a page in (time, id) order, NULL times last, into phase queries.
+
+    Rows with a time are paged with a row-value seek on (time, id), then rows
+    without one by id alone, so neither phase has an OR that keeps the index
+    from seeking. Callers run the phases in turn until they have limit + 1 rows.
+    """
+    after_time, after_id = cursor or (None, None)
+    phases = []
+    if cursor is None or after_time is not None:
+        timed = query.where(time_column.isnot(None))
+        if after_time is not None:
+            timed = timed.where(db.tuple_(time_column, id_column) > db.tuple_(after_time, after_id))
+        phases.append(timed.order_by(time_column, id_column).limit(limit + 1))
+        after_id = None
+    untimed = query.where(time_column.is_(None))
+    if after_id is not None:
+        untimed = untimed.where(id_column > after_id)
+    phases.append(untimed.order_by(id_column).limit(limit + 1))
+    return phases
+
+def fetch_page(phases, limit):
+    rows = []
+    for phase in phases:
+        if len(rows) > limit:
+            break
+        rows += db.session.execute(phase.limit(limit + 1 - len(rows))).scalars().all()
+    return rows
+
+def int_arg(args, name, default=None):
+    # Unlike args.get(type=int), a value that is not an integer raises ValueError
+    value = args.get(name)
+    return default if value is None else int(value)
+
+def _page_size(args):
+    return max(1, min(int_arg(args, 'limit', app.config['EVENTS_PAGE_SIZE']), app.config['EVENTS_MAX_PAGE_SIZE']))
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d') if value else None
+
+def _filtered_events_query(args):
+    query = db.select(Event)
+
+    venue = args.get('venue')
+    if venue:
+        query = query.where(Event.venue == venue)
+
+    category_id = int_arg(args, 'category')
+    if category_id is not None:
+        query = query.where(db.exists().where(
+            EventCategory.event_id == Event.id, EventCategory.category_id == category_id))
+
+    tag_id = int_arg(args, 'tag')
+    if tag_id is not None:
+        query = query.where(db.exists().where(
+            EventTag.event_id == Event.id, EventTag.tag_id == tag_id))
+
+    # Date range filter over the event dates (both ends inclusive)
+    date_from = _parse_date(args.get('date_from'))
+    date_to = _parse_date(args.get('date_to'))
+    if date_from or date_to:
+        date_filter = [EventDate.event_id == Event.id]
+        if date_from:
+            date_filter.append(EventDate.event_date >= date_from)
+        if date_to:
+            date_filter.append(EventDate.event_date < date_to + timedelta(days=1))
+        query = query.where(db.exists().where(*date_filter))
+
+    return query
+
+def events_page_queries(args):
+    """Build the phase queries for one page of the event listing.
+
+    Fetches one row more than the page size so callers can tell whether a
+    next page exists. Raises ValueError or TypeError on a bad filter or cursor.
+    """
+    limit = _page_size(args)
+    query = _filtered_events_query(args)
+
+    # Keyset pagination on (time, id); events without a time sort last
+    cursor = args.get('cursor')
+    cursor = _decode_events_cursor(cursor) if cursor else None
+    return keyset_phases(query, Event.time, Event.id, cursor, limit), limit
+
 @app.route('/events', methods=['GET'])
+@read_only
+@cached_response('events')
 def get_events():
-    events = Event.query.all()
-    events_data = []
-    for event in events:
-        # Fetch the event date from the EventDate table
-        event_date = EventDate.query.filter_by(event_id=event.id).first()
-        date = event_date.event_date.strftime('%Y-%m-%d') if event_date else None
-        
-        # Fetch the ticket counts from the EventTicketCount table
-        ticket_counts = EventTicketCount.query.filter_by(event_id=event.id).all()
-        ticket_data = []
-        for count in ticket_counts:
-            ticket_data.append({
-                "tier": count.tier,
-                "total_count": count.total_count,
-                "available_count": count.available_count,
-                "total_purchased": count.total_purchased
-            })
-
-        # Fetch the ticket types (tiers) and prices from the EventTicketType table
-        ticket_types = EventTicketType.query.filter_by(event_id=event.id).all()
-        ticket_types_data = []
-        for ticket in ticket_types:
-            ticket_types_data.append({
-                "tier_name": ticket.tier_name,
-                "price": ticket.price
-            })
-        
-        events_data.append({
-            "id": event.id,
-            "name": event.name,
-            "description": event.description,
-            "venue": event.venue,
-            "time": event.time.strftime('%H:%M') if event.time else None,
-            "image_url": event.image_url,
-            "date": date,
-            "ticket_counts": ticket_data,  # Added ticket counts for each tier
-            "ticket_types": ticket_types_data  # Added ticket types and prices
-        })
-    return jsonify(events_data), 200
+    try:
+        phases, limit = events_page_queries(request.args)
+    except (ValueError, TypeError):
+        return jsonify({"message": "Invalid filter or cursor"}), 400
+
+    events = fetch_page(phases, limit)
+    has_more = len(events) > limit
+    events = events[:limit]
+
+    response = catalog_response(load_event_catalog(events))
+    if has_more:
+        next_cursor = _encode_events_cursor(events[-1])
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = '<{}>; rel="next"'.format(url_for('get_events', _external=True, **args))
+    return response, 200
 
 @app.route('/events/<int:id>', methods=['GET'])
+@read_only
+@cached_response('event:{id}')
 def get_event(id):
     event = Event.query.get(id)
     if event:
-        # Fetch the event date from the EventDate table
-        event_date = EventDate.query.filter_by(event_id=event.id).first()
-        date = event_date.event_date.strftime('%Y-%m-%d') if event_date else None
-        
-        # Fetch the ticket counts from the EventTicketCount table
-        ticket_counts = EventTicketCount.query.filter_by(event_id=event.id).all()
-        ticket_data = []
-        for count in ticket_counts:
-            ticket_data.append({
-                "tier": count.tier,
-                "total_count": count.total_count,
-                "available_count": count.available_count,
-                "total_purchased": count.total_purchased
-            })
-
-        # Fetch the ticket types (tiers) and prices from the EventTicketType table
-        ticket_types = EventTicketType.query.filter_by(event_id=event.id).all()
-        ticket_types_data = []
-        for ticket in ticket_types:
-            ticket_types_data.append({
-                "tier_name": ticket.tier_name,
-                "price": ticket.price
-            })
-        
-        return jsonify({
-            "id": event.id,
-            "name": event.name,
-            "description": event.description,
-            "venue": event.venue,
-            "time": event.time.strftime('%H:%M') if event.time else None,
-            "image_url": event.image_url,
-            "date": date,
-            "ticket_counts": ticket_data,  # Added ticket counts for each tier
-            "ticket_types": ticket_types_data  # Added ticket types and prices
-        }), 200
+        return catalog_response(load_event_catalog([event])[0]), 200
     return jsonify({"message": "Event not found"}), 404
 
+# Homepage listing served from the event_summary read model
+@app.route('/events/summary', methods=['GET'])
+@read_only
+@cached_response('events')
+def get_event_summaries():
+    query = db.select(EventSummary)
+    if request.args.get('venue'):
+        query = query.where(EventSummary.venue == request.args['venue'])
+    cursor = request.args.get('cursor')
+    try:
+        limit = _page_size(request.args)
+        cursor = _decode_events_cursor(cursor) if cursor else None
+    except (ValueError, TypeError):
+        return jsonify({"message": "Invalid limit or cursor"}), 400
+    phases = keyset_phases(query, EventSummary.time, EventSummary.event_id, cursor, limit)
+
+    summaries = fetch_page(phases, limit)
+    response = catalog_response([serialize_event_summary(summary) for summary in summaries[:limit]])
+    if len(summaries) > limit:
+        response.headers['X-Next-Cursor'] = _encode_events_cursor(summaries[limit - 1])
+    return response, 200
+
+TIER_COUNT_COLUMNS = ('total_count', 'available_count', 'total_purchased')
+
+def save_ticket_tiers(event_id, ticket_counts_data, ticket_types_data, new_event=False):
+    """Insert or update an event's tiers with one upsert per table.
+
+    Existing tiers are read with a single query per table (skipped for a new
+    event) so only new or changed tiers are written. An existing tier only has
+    the counts named in the payload overwritten, so sales that commit between
+    the read and the upsert are kept.
+    """
+    counts = {}
+    if ticket_counts_data:
+        existing_counts = {} if new_event else {
+            row.tier: row for row in db.session.execute(
+                db.select(EventTicketCount.tier, *(getattr(EventTicketCount, column) for column in TIER_COUNT_COLUMNS))
+                .where(EventTicketCount.event_id == event_id)
+            )
+        }
+        for ticket_count in ticket_counts_data:
+            existing = existing_counts.get(ticket_count.get('tier'))
+            supplied = tuple(column for column in TIER_COUNT_COLUMNS if column in ticket_count)
+            # Stored values only fill in the proposed row, which must satisfy NOT NULL
+            row = {"event_id": event_id, "tier": ticket_count.get('tier')}
+            for column in TIER_COUNT_COLUMNS:
+                row[column] = ticket_count.get(column, getattr(existing, column) if existing else None)
+            if existing is None:
+                # New tiers start with nothing purchased
+                row['total_purchased'] = 0
+                supplied = tuple(column for column in supplied if column != 'total_purchased')
+            if existing is None or any(row[column] != getattr(existing, column) for column in supplied):
+                counts[row['tier']] = (row, supplied)
+    # One upsert per set of columns named in the payload, normally just one
+    batches = {}
+    for row, supplied in counts.values():
+        batches.setdefault(supplied, []).append(row)
+    for supplied, rows in batches.items():
+        upsert(EventTicketCount, rows, ['event_id', 'tier'], list(supplied))
+
+    types = {}
+    if ticket_types_data:
+        existing_prices = {} if new_event else dict(db.session.execute(
+            db.select(EventTicketType.tier_name, EventTicketType.price).where(EventTicketType.event_id == event_id)
+        ).all())
+        for ticket_type in ticket_types_data:
+            tier_name = ticket_type.get('tier_name')
+            price = ticket_type.get('price', existing_prices.get(tier_name))
+            if tier_name not in existing_prices or price != existing_prices[tier_name]:
+                types[tier_name] = {"event_id": event_id, "tier_name": tier_name, "price": price}
+    if types:
+        upsert(EventTicketType, list(types.values()), ['event_id', 'tier_name'], ['price'])
+
+    if counts or types:
+        mark_events_changed(event_id)
+
 @app.route('/events', methods=['POST'])
+@organiser_required
 def create_event():
     data = request.get_json()
 
-    # Create the event
+    # The event, its date and its tiers are written in a single transaction
     new_event = Event(
         name=data.get('name'),
         description=data.get('description'),
         venue=data.get('venue'),
         time=data.get('time'),
         image_url=data.get('image_url'),
-        organiser_id=data.get('organiser_id', 1)  # Default to organiser 1
+        organiser_id=session['user_id']
     )
     db.session.add(new_event)
-    db.session.commit()
 
-    # Create the event date in the EventDate table
-    event_date = data.get('event_date')
-    if event_date:
-        new_event_date = EventDate(event_id=new_event.id, event_date=event_date)
-        db.session.add(new_event_date)
-        db.session.commit()
+    try:
+        db.session.flush()
 
-    # Create ticket counts and types for the event
-    ticket_counts_data = data.get('ticket_counts', [])
-    for ticket_count in ticket_counts_data:
-        ticket_count_entry = EventTicketCount(
-            event_id=new_event.id,
-            tier=ticket_count.get('tier'),
-            total_count=ticket_count.get('total_count'),
-            available_count=ticket_count.get('available_count'),
-            total_purchased=0  # Initially 0 tickets purchased
-        )
-        db.session.add(ticket_count_entry)
-
-    ticket_types_data = data.get('ticket_types', [])
-    for ticket_type in ticket_types_data:
-        ticket_type_entry = EventTicketType(
-            event_id=new_event.id,
-            tier_name=ticket_type.get('tier_name'),
-            price=ticket_type.get('price')
-        )
-        db.session.add(ticket_type_entry)
+        # Create the event date in the EventDate table
+        event_date = data.get('event_date')
+        if event_date:
+            db.session.add(EventDate(event_id=new_event.id, event_date=event_date))
 
-    db.session.commit()
+        save_ticket_tiers(new_event.id, data.get('ticket_counts', []), data.get('ticket_types', []), new_event=True)
+        db.session.commit()
+    except (IntegrityError, DataError):
+        db.session.rollback()
+        return jsonify({"message": "Invalid event data"}), 400
+
+    invalidate_event_cache(new_event.id)
 
     return jsonify({"message": "Event created successfully!"}), 201
 
+def _owned_event(id):
+    # Ownership is checked against the session, like the role, so it costs no users lookup
+    event = db.session.get(Event, id)
+    if event is None:
+        return None, (jsonify({"message": "Event not found"}), 404)
+    if event.organiser_id != session['user_id']:
+        return None, (jsonify({"message": "Only the event's organiser can change it"}), 403)
+    return event, None
+
 @app.route('/events/<int:id>', methods=['PUT'])
+@organiser_required
 def update_event(id):
     data = request.get_json()
-    event = Event.query.get(id)
-    if event:
-        # Update event details
-        event.name = data.get('name', event.name)
-        event.description = data.get('description', event.description)
-        event.venue = data.get('venue', event.venue)
-        event.time = data.get('time', event.time)
-        event.image_url = data.get('image_url', event.image_url)
+    event, error = _owned_event(id)
+    if error:
+        return error
+    # Update event details; everything below is committed together
+    event.name = data.get('name', event.name)
+    event.description = data.get('description', event.description)
+    event.venue = data.get('venue', event.venue)
+    event.time = data.get('time', event.time)
+    event.image_url = data.get('image_url', event.image_url)
+
+    # Update the event date in the EventDate table
+    event_date = data.get('event_date')
+    if event_date:
+        existing_event_date = EventDate.query.filter_by(event_id=event.id).first()
+        if existing_event_date:
+            existing_event_date.event_date = event_date
+        else:
+            db.session.add(EventDate(event_id=event.id, event_date=event_date))
+
+    try:
+        save_ticket_tiers(event.id, data.get('ticket_counts', []), data.get('ticket_types', []))
         db.session.commit()
+    except (IntegrityError, DataError):
+        db.session.rollback()
+        return jsonify({"message": "Invalid event data"}), 400
 
-        # Update the event date in the EventDate table
-        event_date = data.get('event_date')
-        if event_date:
-            existing_event_date = EventDate.query.filter_by(event_id=event.id).first()
-            if existing_event_date:
-                existing_event_date.event_date = event_date
-            else:
-                new_event_date = EventDate(event_id=event.id, event_date=event_date)
-                db.session.add(new_event_date)
-            db.session.commit()
-
-        # Update ticket counts and types for the event
-        ticket_counts_data = data.get('ticket_counts', [])
-        for ticket_count in ticket_counts_data:
-            existing_ticket_count = EventTicketCount.query.filter_by(
-                event_id=event.id, tier=ticket_count.get('tier')).first()
-            if existing_ticket_count:
-                existing_ticket_count.total_count = ticket_count.get('total_count', existing_ticket_count.total_count)
-                existing_ticket_count.available_count = ticket_count.get('available_count', existing_ticket_count.available_count)
-                existing_ticket_count.total_purchased = ticket_count.get('total_purchased', existing_ticket_count.total_purchased)
-            else:
-                new_ticket_count_entry = EventTicketCount(
-                    event_id=event.id,
-                    tier=ticket_count.get('tier'),
-                    total_count=ticket_count.get('total_count'),
-                    available_count=ticket_count.get('available_count'),
-                    total_purchased=0  # Initially 0 tickets purchased
-                )
-                db.session.add(new_ticket_count_entry)
-
-        ticket_types_data = data.get('ticket_types', [])
-        for ticket_type in ticket_types_data:
-            existing_ticket_type = EventTicketType.query.filter_by(
-                event_id=event.id, tier_name=ticket_type.get('tier_name')).first()
-            if existing_ticket_type:
-                existing_ticket_type.price = ticket_type.get('price', existing_ticket_type.price)
-            else:
-                new_ticket_type_entry = EventTicketType(
-                    event_id=event.id,
-                    tier_name=ticket_type.get('tier_name'),
-                    price=ticket_type.get('price')
-                )
-                db.session.add(new_ticket_type_entry)
-
-        db.session.commit()
+    invalidate_event_cache(event.id)
 
-        return jsonify({"message": "Event updated successfully!"}), 200
-    return jsonify({"message": "Event not found"}), 404
+    return jsonify({"message": "Event updated successfully!"}), 200
 
 @app.route('/events/<int:id>', methods=['DELETE'])
+@organiser_required
 def delete_event(id):
-    event = Event.query.get(id)
-    if event:
-        db.session.delete(event)
+    event, error = _owned_event(id)
+    if error:
+        return error
+    # Remove the rows that reference the event, then the event, in one transaction
+    for model in (EventDate, EventTicketCount, EventTicketType, EventCategory, EventTag):
+        db.session.execute(db.delete(model).where(model.event_id == id))
+    db.session.delete(event)
+    try:
         db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"message": "Event has tickets and cannot be deleted"}), 409
 
-        # Also delete the associated event date
-        event_date = EventDate.query.filter_by(event_id=event.id).first()
-        if event_date:
-            db.session.delete(event_date)
+    invalidate_event_cache(id)
+
+    return jsonify({"message": "Event deleted successfully!"}), 200
+
+# Bulk import and export of events
+# Records use the same shape as the POST /events payload, with ISO 8601
+# timestamps. In CSV files ticket_counts and ticket_types are JSON columns.
+EVENT_EXPORT_FIELDS = ['name', 'description', 'venue', 'time', 'image_url', 'organiser_id',
+                       'event_date', 'ticket_counts', 'ticket_types']
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value) if value else None
+
+def read_event_records(stream, fmt):
+    if fmt == 'csv':
+        for record in csv.DictReader(stream):
+            for field in ('ticket_counts', 'ticket_types'):
+                record[field] = json.loads(record[field]) if record.get(field) else []
+            yield record
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+def _copy_rows(table, columns, rows):
+    # Stream rows into Postgres with COPY over the session's connection
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['\\N' if value is None else value for value in row])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert(
+        "COPY {} ({}) FROM STDIN WITH (FORMAT csv, NULL '\\N')".format(table, ', '.join(columns)),
+        buffer
+    )
+
+def _bulk_insert(model, rows):
+    if not rows:
+        return
+    if db.engine.dialect.name == 'postgresql' and db.engine.dialect.driver == 'psycopg2':
+        columns = list(rows[0])
+        _copy_rows(model.__tablename__, columns, ([row[column] for column in columns] for row in rows))
+    else:
+        db.session.execute(db.insert(model), rows)
+
+def _insert_returning_ids(model, rows):
+    if db.engine.dialect.name == 'postgresql':
+        # Reserve the ids up front so the rows can be copied like any other table
+        ids = db.session.execute(
+            db.text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :n)"),
+            {"table": model.__tablename__, "n": len(rows)}
+        ).scalars().all()
+        for row, row_id in zip(rows, ids):
+            row['id'] = row_id
+        _bulk_insert(model, rows)
+        return ids
+    return db.session.execute(
+        db.insert(model).returning(model.id, sort_by_parameter_order=True), rows
+    ).scalars().all()
+
+def _insert_event_chunk(records, organiser_id=None):
+    now = datetime.now()
+    event_rows = []
+    for record in records:
+        if not record.get('name'):
+            raise ValueError("Every event needs a name")
+        event_rows.append({
+            "name": record['name'],
+            "description": record.get('description'),
+            "venue": record.get('venue'),
+            "time": _parse_datetime(record.get('time')),
+            "image_url": record.get('image_url'),
+            "organiser_id": organiser_id or int(record.get('organiser_id') or 1),
+            "created_at": now,
+            "updated_at": now
+        })
+
+    event_ids = _insert_returning_ids(Event, event_rows)
+
+    date_rows, count_rows, type_rows = [], [], []
+    for record, event_id in zip(records, event_ids):
+        if record.get('event_date'):
+            date_rows.append({"event_id": event_id, "event_date": _parse_datetime(record['event_date'])})
+        for ticket_count in record.get('ticket_counts') or []:
+            count_rows.append({
+                "event_id": event_id,
+                "tier": ticket_count.get('tier'),
+                "total_count": ticket_count.get('total_count'),
+                "available_count": ticket_count.get('available_count'),
+                "total_purchased": ticket_count.get('total_purchased', 0)
+            })
+        for ticket_type in record.get('ticket_types') or []:
+            type_rows.append({
+                "event_id": event_id,
+                "tier_name": ticket_type.get('tier_name'),
+                "price": ticket_type.get('price')
+            })
+    _bulk_insert(EventDate, date_rows)
+    _bulk_insert(EventTicketCount, count_rows)
+    _bulk_insert(EventTicketType, type_rows)
+    mark_events_changed(*event_ids)
+    return event_ids
+
+class EventImportError(Exception):
+    """A record could not be imported; `imported` events were committed before it."""
+
+    def __init__(self, error, imported):
+        # Database errors carry the statement; the driver's message is enough
+        super().__init__(str(getattr(error, 'orig', None) or error))
+        self.imported = imported
+
+def import_events(records, chunk_size=1000, organiser_id=None):
+    # Each chunk is written in its own transaction. organiser_id, when given,
+    # owns every event regardless of the records' own organiser_id.
+    imported = 0
+    chunk = []
+    try:
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                _insert_event_chunk(chunk, organiser_id)
+                db.session.commit()
+                imported += len(chunk)
+                chunk = []
+        if chunk:
+            _insert_event_chunk(chunk, organiser_id)
             db.session.commit()
+            imported += len(chunk)
+    except (ValueError, KeyError, TypeError, IntegrityError, DataError) as error:
+        db.session.rollback()
+        raise EventImportError(error, imported) from error
+    finally:
+        if imported:
+            invalidate_cache('events')
+    return imported
+
+def export_event_records(chunk_size=1000):
+    # Walk the events table by id so only one chunk is held in memory
+    last_id = 0
+    while True:
+        events = db.session.execute(
+            db.select(Event).where(Event.id > last_id).order_by(Event.id).limit(chunk_size)
+        ).scalars().all()
+        if not events:
+            return
+        event_ids = [event.id for event in events]
+        dates_query, counts_query, types_query = _catalog_child_queries(event_ids)
+        dates, ticket_counts, ticket_types = {}, {}, {}
+        for row in db.session.execute(dates_query):
+            dates.setdefault(row.event_id, row.event_date)
+        for row in db.session.execute(counts_query):
+            ticket_counts.setdefault(row.event_id, []).append({
+                "tier": row.tier,
+                "total_count": row.total_count,
+                "available_count": row.available_count,
+                "total_purchased": row.total_purchased
+            })
+        for row in db.session.execute(types_query):
+            ticket_types.setdefault(row.event_id, []).append({"tier_name": row.tier_name, "price": row.price})
+
+        for event in events:
+            event_date = dates.get(event.id)
+            yield {
+                "name": event.name,
+                "description": event.description,
+                "venue": event.venue,
+                "time": event.time.isoformat() if event.time else None,
+                "image_url": event.image_url,
+                "organiser_id": event.organiser_id,
+                "event_date": event_date.isoformat() if event_date else None,
+                "ticket_counts": ticket_counts.get(event.id, []),
+                "ticket_types": ticket_types.get(event.id, [])
+            }
+        last_id = event_ids[-1]
+        db.session.expunge_all()
+
+def format_event_records(records, fmt):
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EVENT_EXPORT_FIELDS)
+        writer.writeheader()
+        for record in records:
+            record['ticket_counts'] = json.dumps(record['ticket_counts'])
+            record['ticket_types'] = json.dumps(record['ticket_types'])
+            writer.writerow(record)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        for record in records:
+            yield json.dumps(record) + '\n'
+
+def _bulk_format(default='ndjson'):
+    fmt = request.args.get('format')
+    if not fmt and request.mimetype == 'text/csv':
+        fmt = 'csv'
+    return fmt or default
+
+@app.route('/events/import', methods=['POST'])
+@organiser_required
+def bulk_import_events():
+    fmt = _bulk_format()
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8')
+    try:
+        imported = import_events(read_event_records(stream, fmt), organiser_id=session['user_id'])
+    except EventImportError as error:
+        return jsonify({"message": "Invalid import file: {}".format(error), "imported": error.imported}), 400
+    return jsonify({"message": "Events imported successfully!", "imported": imported}), 201
+
+@app.route('/events/export', methods=['GET'])
+@read_only
+def bulk_export_events():
+    fmt = _bulk_format()
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(format_event_records(export_event_records(), fmt)), mimetype=mimetype)
+
+# CLI: flask events import <file> / flask events export <file>
+events_cli = AppGroup('events', help='Bulk import and export of events.')
+
+def _file_format(file, fmt):
+    return fmt or ('csv' if file.name.endswith('.csv') else 'ndjson')
+
+@events_cli.command('import')
+@click.argument('file', type=click.File('r'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Events per transaction.')
+def import_events_command(file, fmt, chunk_size):
+    started = time.perf_counter()
+    try:
+        imported = import_events(read_event_records(file, _file_format(file, fmt)), chunk_size)
+    except EventImportError as error:
+        raise click.ClickException('Invalid import file: {} ({} events were imported before it)'.format(error, error.imported))
+    elapsed = time.perf_counter() - started
+    click.echo('Imported {} events in {:.2f}s ({:.0f} events/s)'.format(imported, elapsed, imported / elapsed if elapsed else 0))
+
+@events_cli.command('export')
+@click.argument('file', type=click.File('w'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+def export_events_command(file, fmt):
+    for chunk in format_event_records(export_event_records(), _file_format(file, fmt)):
+        file.write(chunk)
+
+app.cli.add_command(events_cli)
+
+# Full-text event search
+# Postgres keeps a weighted tsvector in events.search_vector (name, then venue
+# and category/tag names, then description) behind a GIN index; SQLite keeps
+# an FTS5 table. Triggers maintain both. db.create_all() installs them with
+# the schema, and `flask search init` adds them to an existing database.
+POSTGRES_SEARCH_DDL = [
+    "ALTER TABLE events ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    "CREATE INDEX IF NOT EXISTS ix_events_search_vector ON events USING GIN (search_vector)",
+    """
+    CREATE OR REPLACE FUNCTION events_search_vector(p_event_id integer, p_name text, p_description text, p_venue text)
+    RETURNS tsvector AS $$
+        SELECT setweight(to_tsvector('simple', coalesce(p_name, '')), 'A') ||
+               setweight(to_tsvector('simple', coalesce(p_venue, '')), 'B') ||
+               setweight(to_tsvector('simple', coalesce((
+                   SELECT string_agg(c.name, ' ') FROM event_categories ec
+                   JOIN categories c ON c.id = ec.category_id WHERE ec.event_id = p_event_id
+               ), '') || ' ' || coalesce((
+                   SELECT string_agg(t.name, ' ') FROM event_tags et
+                   JOIN tags t ON t.id = et.tag_id WHERE et.event_id = p_event_id
+               ), '')), 'B') ||
+               setweight(to_tsvector('simple', coalesce(p_description, '')), 'C')
+    $$ LANGUAGE sql STABLE
+    """,
+    """
+    CREATE OR REPLACE FUNCTION events_search_vector_trigger() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := events_search_vector(NEW.id, NEW.name, NEW.description, NEW.venue);
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION event_labels_search_trigger() RETURNS trigger AS $$
+    BEGIN
+        UPDATE events SET search_vector = events_search_vector(id, name, description, venue)
+        WHERE id = CASE WHEN TG_OP = 'DELETE' THEN OLD.event_id ELSE NEW.event_id END;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS events_search_vector ON events",
+    """
+    CREATE TRIGGER events_search_vector BEFORE INSERT OR UPDATE OF name, description, venue ON events
+    FOR EACH ROW EXECUTE FUNCTION events_search_vector_trigger()
+    """,
+    "DROP TRIGGER IF EXISTS event_categories_search_vector ON event_categories",
+    """
+    CREATE TRIGGER event_categories_search_vector AFTER INSERT OR DELETE ON event_categories
+    FOR EACH ROW EXECUTE FUNCTION event_labels_search_trigger()
+    """,
+    "DROP TRIGGER IF EXISTS event_tags_search_vector ON event_tags",
+    """
+    CREATE TRIGGER event_tags_search_vector AFTER INSERT OR DELETE ON event_tags
+    FOR EACH ROW EXECUTE FUNCTION event_labels_search_trigger()
+    """
+]
+
+# FTS5 rows are rebuilt from the events table plus category and tag names
+SQLITE_SEARCH_INSERT = """
+    INSERT INTO events_fts (rowid, name, venue, labels, description)
+    SELECT e.id, e.name, e.venue,
+           coalesce((SELECT group_concat(c.name, ' ') FROM event_categories ec
+                     JOIN categories c ON c.id = ec.category_id WHERE ec.event_id = e.id), '') || ' ' ||
+           coalesce((SELECT group_concat(t.name, ' ') FROM event_tags et
+                     JOIN tags t ON t.id = et.tag_id WHERE et.event_id = e.id), ''),
+           e.description
+    FROM events e
+"""
+
+def _sqlite_search_trigger(name, when, table, event_id):
+    return "CREATE TRIGGER IF NOT EXISTS {} {} ON {} BEGIN DELETE FROM events_fts WHERE rowid = {}; {} WHERE e.id = {}; END".format(
+        name, when, table, event_id, SQLITE_SEARCH_INSERT, event_id)
+
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(name, venue, labels, description)",
+    _sqlite_search_trigger('events_fts_insert', 'AFTER INSERT', 'events', 'new.id'),
+    _sqlite_search_trigger('events_fts_update', 'AFTER UPDATE OF name, description, venue', 'events', 'new.id'),
+    "CREATE TRIGGER IF NOT EXISTS events_fts_delete AFTER DELETE ON events BEGIN "
+    "DELETE FROM events_fts WHERE rowid = old.id; END",
+    _sqlite_search_trigger('event_categories_fts_insert', 'AFTER INSERT', 'event_categories', 'new.event_id'),
+    _sqlite_search_trigger('event_categories_fts_delete', 'AFTER DELETE', 'event_categories', 'old.event_id'),
+    _sqlite_search_trigger('event_tags_fts_insert', 'AFTER INSERT', 'event_tags', 'new.event_id'),
+    _sqlite_search_trigger('event_tags_fts_delete', 'AFTER DELETE', 'event_tags', 'old.event_id')
+]
+
+def _install_search_index(target, connection, **kwargs):
+    ddl = POSTGRES_SEARCH_DDL if connection.dialect.name == 'postgresql' else SQLITE_SEARCH_DDL
+    for statement in ddl:
+        connection.execute(db.text(statement))
+
+def _drop_search_index(target, connection, **kwargs):
+    # The FTS5 table is not part of the metadata, so drop_all would leave it behind
+    if connection.dialect.name == 'sqlite':
+        connection.execute(db.text("DROP TABLE IF EXISTS events_fts"))
+
+sa_event.listen(db.metadata, 'after_create', _install_search_index)
+sa_event.listen(db.metadata, 'after_drop', _drop_search_index)
+
+_search_index_installed = False
+
+def search_index_installed():
+    # Only a positive answer is remembered, so installing the index later
+    # takes effect without a restart
+    global _search_index_installed
+    if not _search_index_installed:
+        inspector = db.inspect(db.engine)
+        if db.engine.dialect.name == 'postgresql':
+            _search_index_installed = any(column['name'] == 'search_vector' for column in inspector.get_columns('events'))
+        else:
+            _search_index_installed = inspector.has_table('events_fts')
+    return _search_index_installed
+
+def _search_terms(q):
+    return re.findall(r'\w+', q.lower())
+
+def search_event_ids(q, limit, offset):
+    # Every term must match; the last one also matches as a prefix so
+    # results can follow the user while they type
+    terms = _search_terms(q)
+    if not terms:
+        return []
+    if db.engine.dialect.name == 'postgresql':
+        tsquery = ' & '.join(terms[:-1] + [terms[-1] + ':*'])
+        rows = db.session.execute(db.text("""
+            SELECT id FROM events, to_tsquery('simple', :tsquery) query
+            WHERE search_vector @@ query
+            ORDER BY ts_rank_cd(search_vector, query) DESC, id
+            LIMIT :limit OFFSET :offset
+        """), {"tsquery": tsquery, "limit": limit, "offset": offset})
+    else:
+        match = ' '.join(['"{}"'.format(term) for term in terms[:-1]] + ['"{}"*'.format(terms[-1])])
+        rows = db.session.execute(db.text("""
+            SELECT rowid FROM events_fts WHERE events_fts MATCH :match
+            ORDER BY bm25(events_fts, 10.0, 5.0, 5.0, 1.0), rowid
+            LIMIT :limit OFFSET :offset
+        """), {"match": match, "limit": limit, "offset": offset})
+    return rows.scalars().all()
+
+@app.route('/events/search', methods=['GET'])
+@read_only
+@cached_response('events')
+def search_events():
+    if not search_index_installed():
+        return jsonify({"message": "Search is not available until `flask search init` has been run"}), 503
+    q = request.args.get('q', '')
+    limit = max(1, min(request.args.get('limit', app.config['EVENTS_PAGE_SIZE'], type=int), app.config['EVENTS_MAX_PAGE_SIZE']))
+    page = max(1, request.args.get('page', 1, type=int))
+
+    event_ids = search_event_ids(q, limit, (page - 1) * limit)
+    events = {event.id: event for event in Event.query.filter(Event.id.in_(event_ids))} if event_ids else {}
+    ranked = [events[event_id] for event_id in event_ids if event_id in events]
+    return catalog_response(load_event_catalog(ranked)), 200
+
+search_cli = AppGroup('search', help='Full-text search index maintenance.')
+
+@search_cli.command('init')
+def init_search_command():
+    """Install the search index and the triggers that maintain it."""
+    ddl = POSTGRES_SEARCH_DDL if db.engine.dialect.name == 'postgresql' else SQLITE_SEARCH_DDL
+    for statement in ddl:
+        db.session.execute(db.text(statement))
+    db.session.commit()
+    rebuild_search_command.callback()
+
+@search_cli.command('rebuild')
+def rebuild_search_command():
+    """Recompute the search document of every event."""
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(db.text(
+            "UPDATE events SET search_vector = events_search_vector(id, name, description, venue)"))
+    else:
+        db.session.execute(db.text("DELETE FROM events_fts"))
+        db.session.execute(db.text(SQLITE_SEARCH_INSERT))
+    db.session.commit()
+    click.echo('Search index rebuilt')
+
+app.cli.add_command(search_cli)
+
+# Routes for Tickets
+def take_inventory(event_id, tier, quantity, purchased):
+    # Decrement inventory with a single conditional UPDATE so concurrent
+    # buyers can never take the count below zero
+    values = {"available_count": EventTicketCount.available_count - quantity}
+    if purchased:
+        values['total_purchased'] = db.func.coalesce(EventTicketCount.total_purchased, 0) + quantity
+    result = db.session.execute(
+        db.update(EventTicketCount)
+        .where(
+            EventTicketCount.event_id == event_id,
+            EventTicketCount.tier == tier,
+            EventTicketCount.available_count >= quantity
+        )
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        return False
+    adjust_event_inventory(event_id, -quantity)
+    return True
+
+def _inventory_error(event_id, tier):
+    db.session.rollback()
+    if not db.session.get(EventTicketCount, (event_id, tier)):
+        return jsonify({"message": "Ticket tier not found"}), 404
+    return jsonify({"message": "Not enough tickets available"}), 409
+
+def _ticket_order(data):
+    # Returns (tier, quantity, user_id), or an error response
+    # The buyer is always the logged in user, never one named in the body
+    user_id = session.get('user_id')
+    if not user_id:
+        return None, (jsonify({"message": "Login required"}), 401)
+    tier = data.get('tier')
+    quantity = data.get('quantity', 1)
+    if not tier:
+        return None, (jsonify({"message": "Tier is required"}), 400)
+    # bool is a subclass of int, so JSON true would otherwise pass as 1
+    if not isinstance(quantity, int) or isinstance(quantity, bool) \
+            or not 1 <= quantity <= app.config['MAX_TICKETS_PER_PURCHASE']:
+        return None, (jsonify({"message": "Invalid ticket quantity"}), 400)
+    return (tier, quantity, user_id), None
+
+def _tier_price(event_id, tier):
+    return db.session.execute(
+        db.select(EventTicketType.price).where(
+            EventTicketType.event_id == event_id, EventTicketType.tier_name == tier)
+    ).scalars().first()
+
+@app.route('/events/<int:id>/purchase', methods=['POST'])
+def purchase_tickets(id):
+    order, error = _ticket_order(request.get_json())
+    if error:
+        return error
+    tier, quantity, user_id = order
+
+    # Look up the price before taking the row lock on the inventory
+    price = _tier_price(id, tier)
+
+    if not take_inventory(id, tier, quantity, purchased=True):
+        return _inventory_error(id, tier)
+
+    tickets = [Ticket(event_id=id, user_id=user_id, tier=tier, price=price) for _ in range(quantity)]
+    db.session.add_all(tickets)
+    # Read the ids before commit expires the tickets, which would reload each one
+    db.session.flush()
+    ticket_ids = [ticket.id for ticket in tickets]
+    db.session.commit()
 
-        return jsonify({"message": "Event deleted successfully!"}), 200
-    return jsonify({"message": "Event not found"}), 404
+    invalidate_event_cache(id)
+
+    return jsonify({
+        "message": "Tickets purchased successfully!",
+        "ticket_ids": ticket_ids
+    }), 201
+
+# Routes for Reservations
+# A hold takes stock immediately and gives it back unless it is confirmed
+# before expires_at. Expired holds are released by the sweeper, which walks
+# the partial index on live holds in expiry order.
+@app.route('/events/<int:id>/reservations', methods=['POST'])
+def create_reservation(id):
+    order, error = _ticket_order(request.get_json())
+    if error:
+        return error
+    tier, quantity, user_id = order
+
+    if not take_inventory(id, tier, quantity, purchased=False):
+        return _inventory_error(id, tier)
+    reservation = Reservation(
+        event_id=id,
+        tier=tier,
+        user_id=user_id,
+        quantity=quantity,
+        expires_at=datetime.now() + timedelta(seconds=app.config['RESERVATION_TTL'])
+    )
+    db.session.add(reservation)
+    # Read the hold before commit expires it, which would reload the row
+    db.session.flush()
+    reservation_id, expires_at = reservation.id, reservation.expires_at
+    db.session.commit()
+
+    invalidate_event_cache(id)
+
+    return jsonify({
+        "message": "Tickets reserved successfully!",
+        "reservation_id": reservation_id,
+        "expires_at": expires_at.isoformat()
+    }), 201
+
+def _claim_reservation(id, status, unexpired, user_id):
+    # Moves a live hold of the given user to its final status; only one caller can win
+    criteria = [Reservation.id == id, Reservation.user_id == user_id, Reservation.status == 'held']
+    if unexpired:
+        criteria.append(Reservation.expires_at > datetime.now())
+    return db.session.execute(
+        db.update(Reservation).where(*criteria).values(status=status)
+        .returning(Reservation.event_id, Reservation.tier, Reservation.user_id, Reservation.quantity)
+        .execution_options(synchronize_session=False)
+    ).first()
+
+def _reservation_error(id, user_id):
+    db.session.rollback()
+    reservation = db.session.get(Reservation, id)
+    # Ids are sequential, so another user's hold looks the same as a missing one
+    if not reservation or reservation.user_id != user_id:
+        return jsonify({"message": "Reservation not found"}), 404
+    return jsonify({"message": "Reservation is no longer held"}), 409
+
+@app.route('/reservations/<int:id>/confirm', methods=['POST'])
+def confirm_reservation(id):
+    data = request.get_json()
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"message": "Login required"}), 401
+    if not data.get('transaction_id'):
+        return jsonify({"message": "Transaction id is required"}), 400
+    held = _claim_reservation(id, 'confirmed', unexpired=True, user_id=user_id)
+    if not held:
+        return _reservation_error(id, user_id)
+
+    db.session.execute(
+        db.update(EventTicketCount)
+        .where(EventTicketCount.event_id == held.event_id, EventTicketCount.tier == held.tier)
+        .values(total_purchased=db.func.coalesce(EventTicketCount.total_purchased, 0) + held.quantity)
+        .execution_options(synchronize_session=False)
+    )
+
+    price = _tier_price(held.event_id, held.tier)
+    tickets = [
+        Ticket(event_id=held.event_id, user_id=held.user_id, tier=held.tier, price=price, reservation_id=id)
+        for _ in range(held.quantity)
+    ]
+    db.session.add_all(tickets)
+    db.session.flush()
+    ticket_ids = [ticket.id for ticket in tickets]
+    # The payment starts out pending; only the payment webhook settles it, and
+    # a replayed confirmation for the same transaction adds no second payment
+    ingest_payments([{
+        "ticket_id": ticket_ids[0],
+        "transaction_id": data['transaction_id'],
+        "status": 'pending'
+    }])
+    db.session.commit()
+
+    invalidate_event_cache(held.event_id)
+
+    return jsonify({
+        "message": "Reservation confirmed successfully!",
+        "ticket_ids": ticket_ids
+    }), 200
+
+def _return_inventory(released):
+    # Give stock back with one UPDATE per tier rather than per reservation
+    quantities = Counter()
+    for row in released:
+        quantities[(row.event_id, row.tier)] += row.quantity
+    for (event_id, tier), quantity in sorted(quantities.items()):
+        db.session.execute(
+            db.update(EventTicketCount)
+            .where(EventTicketCount.event_id == event_id, EventTicketCount.tier == tier)
+            .values(available_count=EventTicketCount.available_count + quantity)
+            .execution_options(synchronize_session=False)
+        )
+        adjust_event_inventory(event_id, quantity)
+    return {event_id for event_id, _ in quantities}
+
+@app.route('/reservations/<int:id>', methods=['DELETE'])
+def release_reservation(id):
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"message": "Login required"}), 401
+    held = _claim_reservation(id, 'released', unexpired=False, user_id=user_id)
+    if not held:
+        return _reservation_error(id, user_id)
+    _return_inventory([held])
+    db.session.commit()
+
+    invalidate_event_cache(held.event_id)
+
+    return jsonify({"message": "Reservation released successfully!"}), 200
+
+def release_expired_reservations(batch_size):
+    """Release expired holds in batches; returns the number released."""
+    released_total = 0
+    while True:
+        expired = db.select(Reservation.id) \
+            .where(Reservation.status == 'held', Reservation.expires_at <= datetime.now()) \
+            .order_by(Reservation.expires_at).limit(batch_size) \
+            .with_for_update(skip_locked=True)
+        released = db.session.execute(
+            db.update(Reservation)
+            .where(Reservation.id.in_(expired.scalar_subquery()), Reservation.status == 'held')
+            .values(status='released')
+            .returning(Reservation.event_id, Reservation.tier, Reservation.quantity)
+            .execution_options(synchronize_session=False)
+        ).all()
+        event_ids = _return_inventory(released)
+        db.session.commit()
+        if event_ids:
+            invalidate_event_cache(*event_ids)
+        released_total += len(released)
+        if len(released) < batch_size:
+            return released_total
+
+def _run_reservation_sweeper():
+    while True:
+        with app.app_context():
+            try:
+                release_expired_reservations(app.config['RESERVATION_SWEEP_BATCH'])
+            except Exception:
+                app.logger.exception('Reservation sweep failed')
+        time.sleep(app.config['RESERVATION_SWEEP_INTERVAL'])
+
+def start_reservation_sweeper():
+    thread = threading.Thread(target=_run_reservation_sweeper, name='reservation-sweeper', daemon=True)
+    thread.start()
+    return thread
+
+if app.config['RESERVATION_SWEEPER']:
+    start_reservation_sweeper()
+
+reservations_cli = AppGroup('reservations', help='Ticket reservation maintenance.')
+
+@reservations_cli.command('sweep')
+@click.option('--batch-size', default=500, show_default=True)
+def sweep_reservations_command(batch_size):
+    """Release every expired reservation."""
+    click.echo('Released {} expired reservations'.format(release_expired_reservations(batch_size)))
+
+app.cli.add_command(reservations_cli)
+
+# Live inventory
+# Commits that touch an event's tiers publish the new available_count of each
+# of its tiers. On Postgres they go out with pg_notify inside the transaction,
+# so only committed values are sent, and every process LISTENs for them;
+# elsewhere they go straight to this process's broker after commit. The
+# broker keeps only the latest value per tier until the next tick, drops
+# values its subscribers already have, and hands each subscriber one merged
+# update, so a slow client never queues more than one value per tier.
+INVENTORY_CHANNEL = 'inventory'
+# pg_notify payloads must stay under 8000 bytes
+INVENTORY_NOTIFY_MAX_BYTES = 7900
+
+class InventorySubscription:
+    def __init__(self, event_ids, wake):
+        self.event_ids = frozenset(event_ids) if event_ids else None
+        self.wake = wake
+        self.pending = None
+        self.owned = False
+        self.lock = threading.Lock()
+
+    def push(self, updates):
+        with self.lock:
+            first = self.pending is None
+            if first:
+                # Shared with the other subscribers of this tick until merged into
+                self.pending = updates
+            else:
+                if not self.owned:
+                    self.pending = {event_id: dict(tiers) for event_id, tiers in self.pending.items()}
+                    self.owned = True
+                for event_id, tiers in updates.items():
+                    if event_id in self.pending:
+                        self.pending[event_id].update(tiers)
+                    else:
+                        self.pending[event_id] = dict(tiers)
+        if first:
+            self.wake()
+
+    def drain(self):
+        with self.lock:
+            pending, self.pending, self.owned = self.pending, None, False
+        return pending
+
+class InventoryBroker:
+    """Fans coalesced inventory updates out to subscribers once per tick.
+
+    With tick=None nothing runs in the background and the owner calls flush().
+    """
+
+    def __init__(self, tick=None, on_start=None):
+        self.tick = tick
+        self.on_start = on_start
+        self.pending = {}
+        self.last = {}
+        self.subscriptions = set()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def subscribe(self, event_ids=None, wake=lambda: None):
+        subscription = InventorySubscription(event_ids, wake)
+        with self.lock:
+            self.subscriptions.add(subscription)
+            start = self.tick is not None and self.thread is None
+            if start:
+                self.thread = threading.Thread(target=self._run, name='inventory-broker', daemon=True)
+                self.thread.start()
+        if start and self.on_start:
+            self.on_start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+            if not self.subscriptions:
+                # Nothing is tracked while nobody listens, so start afresh
+                self.last = {}
+                self.pending = {}
+
+    def publish(self, updates):
+        with self.lock:
+            if not self.subscriptions:
+                return
+            for event_id, tiers in updates.items():
+                known = self.last.setdefault(event_id, {})
+                changed = {tier: count for tier, count in tiers.items() if known.get(tier) != count}
+                if changed:
+                    known.update(changed)
+                    self.pending.setdefault(event_id, {}).update(changed)
+
+    def flush(self):
+        with self.lock:
+            batch, self.pending = self.pending, {}
+            subscriptions = list(self.subscriptions)
+        if not batch:
+            return
+        # One dict per distinct filter, shared by every subscriber using it
+        filtered = {None: batch}
+        for subscription in subscriptions:
+            key = subscription.event_ids
+            if key not in filtered:
+                if len(key) < len(batch):
+                    filtered[key] = {event_id: batch[event_id] for event_id in key if event_id in batch}
+                else:
+                    filtered[key] = {event_id: tiers for event_id, tiers in batch.items() if event_id in key}
+            if filtered[key]:
+                subscription.push(filtered[key])
+
+    def _run(self):
+        while True:
+            time.sleep(self.tick)
+            try:
+                self.flush()
+            except Exception:
+                app.logger.exception('Inventory fan-out failed')
+
+# Encoded messages by id() of the updates they encode, which are kept alive
+# alongside so an id is never reused while it is a key here
+_inventory_messages = {}
+INVENTORY_MESSAGE_MEMO = 4096
+
+def inventory_message(updates):
+    """Encode updates as a server-sent event; shared updates are encoded once."""
+    memo = _inventory_messages.get(id(updates))
+    if memo is not None and memo[0] is updates:
+        return memo[1]
+    message = 'event: inventory\ndata: {}\n\n'.format(
+        app.json.dumps({str(event_id): tiers for event_id, tiers in updates.items()})
+    ).encode()
+    if len(_inventory_messages) >= INVENTORY_MESSAGE_MEMO:
+        _inventory_messages.clear()
+    _inventory_messages[id(updates)] = (updates, message)
+    return message
+
+def inventory_snapshot_query(event_ids):
+    return db.select(EventTicketCount.event_id, EventTicketCount.tier, EventTicketCount.available_count) \
+        .where(EventTicketCount.event_id.in_(event_ids))
+
+def inventory_updates(rows):
+    updates = {}
+    for row in rows:
+        updates.setdefault(row.event_id, {})[row.tier] = row.available_count
+    return updates
+
+def _notify_payloads(updates):
+    payload, size = {}, 2
+    for event_id, tiers in updates.items():
+        entry = len(json.dumps({str(event_id): tiers}))
+        if payload and size + entry > INVENTORY_NOTIFY_MAX_BYTES:
+            yield json.dumps(payload)
+            payload, size = {}, 2
+        payload[str(event_id)] = tiers
+        size += entry
+    if payload:
+        yield json.dumps(payload)
+
+def _collect_inventory_updates(session):
+    changed = set(session.info.get('changed_event_ids') or ())
+    changed.update(session.info.get('inventory_deltas') or ())
+    event_ids = sorted(event_id for event_id in changed if event_id is not None)
+    if not event_ids:
+        return
+    updates = inventory_updates(session.execute(inventory_snapshot_query(event_ids)))
+    if not updates:
+        return
+    if db.engine.dialect.name == 'postgresql':
+        for payload in _notify_payloads(updates):
+            session.execute(db.select(db.func.pg_notify(INVENTORY_CHANNEL, payload)))
+    else:
+        session.info['inventory_updates'] = updates
+
+def _publish_inventory_updates(session):
+    updates = session.info.pop('inventory_updates', None)
+    if updates:
+        inventory_broker.publish(updates)
+
+def _discard_inventory_updates(session):
+    session.info.pop('inventory_updates', None)
+
+def _listen_for_inventory():
+    # Needs a direct connection: LISTEN does not work through PgBouncer in transaction mode
+    while True:
+        try:
+            with app.app_context():
+                pooled = db.engine.raw_connection()
+            pooled.detach()
+            connection = pooled.driver_connection
+            connection.autocommit = True
+            connection.cursor().execute('LISTEN {}'.format(INVENTORY_CHANNEL))
+            while True:
+                if select.select([connection], [], [], 5) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notify = connection.notifies.pop(0)
+                    inventory_broker.publish({int(event_id): tiers for event_id, tiers in json.loads(notify.payload).items()})
+        except Exception:
+            app.logger.exception('Inventory listener failed, reconnecting')
+            time.sleep(1)
+
+def _start_inventory_listener():
+    with app.app_context():
+        postgres = db.engine.dialect.name == 'postgresql'
+    if postgres:
+        threading.Thread(target=_listen_for_inventory, name='inventory-listener', daemon=True).start()
+
+inventory_broker = InventoryBroker(app.config['INVENTORY_TICK'], on_start=_start_inventory_listener)
+
+if app.config['INVENTORY_PUSH']:
+    sa_event.listen(db.session, 'before_commit', _collect_inventory_updates)
+    sa_event.listen(db.session, 'after_commit', _publish_inventory_updates)
+    sa_event.listen(db.session, 'after_rollback', _discard_inventory_updates)
+
+def _inventory_event_ids(args):
+    return args.getlist('event_id', type=int)[:app.config['EVENTS_MAX_PAGE_SIZE']]
+
+# Server-sent events with the available_count of each tier, for every event
+# or only those given as ?event_id=1&event_id=2 (which are sent a snapshot
+# first). Each message maps event ids to {tier: available_count}.
+@app.route('/inventory/stream', methods=['GET'])
+def inventory_stream():
+    if not app.config['INVENTORY_PUSH']:
+        return jsonify({"message": "Inventory push is disabled"}), 404
+    event_ids = _inventory_event_ids(request.args)
+    snapshot = inventory_updates(db.session.execute(inventory_snapshot_query(event_ids))) if event_ids else None
+
+    def generate():
+        wake = threading.Event()
+        subscription = inventory_broker.subscribe(event_ids, wake.set)
+        try:
+            yield b'retry: 3000\n\n'
+            if snapshot:
+                yield inventory_message(snapshot)
+            while True:
+                if not wake.wait(app.config['INVENTORY_KEEPALIVE']):
+                    yield b': keepalive\n\n'
+                    continue
+                wake.clear()
+                updates = subscription.drain()
+                if updates:
+                    yield inventory_message(updates)
+        finally:
+            inventory_broker.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 # Routes for Categories
 @app.route('/categories', methods=['GET'])
+@read_only
+@cached_response('categories')
 def get_categories():
     categories = Category.query.all()
     categories_data = [{"id": category.id, "name": category.name} for category in categories]
     return jsonify(categories_data), 200
 
 @app.route('/categories', methods=['POST'])
+@organiser_required
 def create_category():
     data = request.get_json()
     new_category = Category(name=data.get('name'))
     db.session.add(new_category)
     db.session.commit()
+    invalidate_cache('categories')
     return jsonify({"message": "Category created successfully!"}), 201
 
 @app.route('/categories/<int:id>', methods=['GET'])
+@read_only
 def get_category(id):
     category = Category.query.get(id)
     if category:
@@ -432,34 +2755,197 @@ def get_category(id):
 
 # Routes for Tags
 @app.route('/tags', methods=['GET'])
+@read_only
+@cached_response('tags')
 def get_tags():
     tags = Tag.query.all()
     tags_data = [{"id": tag.id, "name": tag.name} for tag in tags]
     return jsonify(tags_data), 200
 
 @app.route('/tags', methods=['POST'])
+@organiser_required
 def create_tag():
     data = request.get_json()
     new_tag = Tag(name=data.get('name'))
     db.session.add(new_tag)
     db.session.commit()
+    invalidate_cache('tags')
     return jsonify({"message": "Tag created successfully!"}), 201
 
 @app.route('/tags/<int:id>', methods=['GET'])
+@read_only
 def get_tag(id):
     tag = Tag.query.get(id)
     if tag:
         return jsonify({"id": tag.id, "name": tag.name}), 200
     return jsonify({"message": "Tag not found"}), 404
 
+# Payment ingest
+PAID_STATUSES = ('completed', 'success', 'successful', 'paid', 'confirmed')
+FAILED_STATUSES = ('failed', 'cancelled', 'canceled', 'reversed')
+
+def _ticket_status(payment_status):
+    status = (payment_status or '').lower()
+    if status in PAID_STATUSES:
+        return 'paid'
+    if status in FAILED_STATUSES:
+        return 'payment_failed'
+    return None
+
+def _payment_payloads(data):
+    # Accepts one payment, a list of them or {"payments": [...]}
+    if isinstance(data, dict) and 'payments' in data:
+        data = data['payments']
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list) or not data:
+        return None, "Expected a payment or a list of payments"
+    payments = []
+    for payment in data:
+        if not isinstance(payment, dict) or not payment.get('transaction_id'):
+            return None, "Every payment needs a transaction_id"
+        try:
+            ticket_id = int(payment.get('ticket_id'))
+        except (TypeError, ValueError):
+            return None, "Every payment needs a ticket_id"
+        payments.append({
+            "ticket_id": ticket_id,
+            "transaction_id": str(payment['transaction_id']),
+            "status": payment.get('status')
+        })
+    return payments, None
+
+def ingest_payments(payments):
+    """Upsert payments on transaction_id and settle their tickets in the caller's transaction.
+
+    Returns the transaction ids of the rows that were written.
+    """
+    # A settled payment keeps its status when an older callback is replayed,
+    # both against the stored row and within the batch; Postgres rejects two
+    # rows for one key in a single upsert
+    latest = OrderedDict()
+    for payment in payments:
+        previous = latest.get(payment['transaction_id'])
+        if previous is None or not _ticket_status(previous['status']):
+            latest[payment['transaction_id']] = payment
+    rows = list(latest.values())
+    unsettled = db.or_(
+        Payment.status.is_(None),
+        db.func.lower(Payment.status).notin_(PAID_STATUSES + FAILED_STATUSES)
+    )
+    written = upsert(
+        Payment, rows, ['transaction_id'], ['status'],
+        where=unsettled, returning=(Payment.ticket_id, Payment.transaction_id, Payment.status)
+    ).all()
+
+    settled = {}
+    for row in written:
+        status = _ticket_status(row.status)
+        if status:
+            settled.setdefault(status, set()).add(row.ticket_id)
+    if 'paid' in settled:
+        enqueue_job('ticket_confirmation', {"ticket_ids": sorted(settled['paid'])})
+    for status, ticket_ids in sorted(settled.items()):
+        # Tickets confirmed from one reservation share its single payment
+        reservation_ids = (
+            db.select(Ticket.reservation_id)
+            .where(Ticket.id.in_(ticket_ids), Ticket.reservation_id.isnot(None))
+            .scalar_subquery()
+        )
+        db.session.execute(
+            db.update(Ticket)
+            .where(db.or_(Ticket.id.in_(ticket_ids), Ticket.reservation_id.in_(reservation_ids)))
+            .values(status=status)
+            .execution_options(synchronize_session=False)
+        )
+    return {row.transaction_id for row in written}
+
+class PaymentGroupCommitter:
+    """Writes payments queued by concurrent requests in shared transactions."""
+
+    def __init__(self, max_batch, window_ms):
+        self.max_batch = max_batch
+        self.window = window_ms / 1000.0
+        self.pending = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def submit(self, payments):
+        future = Future()
+        self.pending.put((payments, future))
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='payment-ingest', daemon=True)
+                self.thread.start()
+        return future
+
+    def _collect(self):
+        batch = [self.pending.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.window
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.pending.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            with app.app_context():
+                self._commit(batch)
+
+    def _commit(self, batch):
+        try:
+            written = ingest_payments([payment for payments, _ in batch for payment in payments])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+        else:
+            for payments, future in batch:
+                future.set_result(len(written & {payment['transaction_id'] for payment in payments}))
+            return
+        # Replay request by request so one bad payload only fails its own caller
+        for payments, future in batch:
+            try:
+                ingested = len(ingest_payments(payments))
+                db.session.commit()
+            except Exception as error:
+                db.session.rollback()
+                future.set_exception(error)
+            else:
+                future.set_result(ingested)
+
+payment_committer = PaymentGroupCommitter(app.config['PAYMENT_BATCH_SIZE'], app.config['PAYMENT_BATCH_WINDOW_MS'])
+
+def payment_signature(body):
+    return hmac.new(app.config['PAYMENT_WEBHOOK_SECRET'].encode(), body, hashlib.sha256).hexdigest()
+
+def signed_payment_webhook(view):
+    # Payments settle tickets, so nothing is written without the provider's signature
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        signature = request.headers.get('X-Signature', '')
+        if not app.config['PAYMENT_WEBHOOK_SECRET'] or not hmac.compare_digest(signature, payment_signature(request.get_data())):
+            return jsonify({"message": "Invalid payment signature"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
 # Routes for Payments
 @app.route('/payments', methods=['GET'])
+@read_only
 def get_payments():
-    payments = Payment.query.all()
-    payments_data = [{"id": payment.id, "ticket_id": payment.ticket_id, "transaction_id": payment.transaction_id, "status": payment.status} for payment in payments]
-    return jsonify(payments_data), 200
+    query = db.select(Payment.id, Payment.ticket_id, Payment.transaction_id, Payment.status).order_by(Payment.id)
+    return stream_rows(query), 200
 
 @app.route('/payments/<int:id>', methods=['GET'])
+@read_only
 def get_payment(id):
     payment = Payment.query.get(id)
     if payment:
@@ -467,17 +2953,33 @@ def get_payment(id):
     return jsonify({"message": "Payment not found"}), 404
 
 @app.route('/payments', methods=['POST'])
+@signed_payment_webhook
 def create_payment():
-    data = request.get_json()
-    new_payment = Payment(
-        ticket_id=data.get('ticket_id'),
-        transaction_id=data.get('transaction_id'),
-        status=data.get('status')
-    )
-    db.session.add(new_payment)
-    db.session.commit()
+    payments, error = _payment_payloads(request.get_json())
+    if error:
+        return jsonify({"message": error}), 400
+    try:
+        ingest_payments(payments)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"message": "Unknown ticket"}), 400
     return jsonify({"message": "Payment created successfully!"}), 201
 
+@app.route('/payments/ingest', methods=['POST'])
+@signed_payment_webhook
+def ingest_payment_batch():
+    payments, error = _payment_payloads(request.get_json())
+    if error:
+        return jsonify({"message": error}), 400
+    try:
+        ingested = payment_committer.submit(payments).result(app.config['PAYMENT_INGEST_TIMEOUT'])
+    except IntegrityError:
+        return jsonify({"message": "Unknown ticket"}), 400
+    except FutureTimeoutError:
+        return jsonify({"message": "Payment ingest timed out, retry"}), 503
+    return jsonify({"message": "Payments ingested", "ingested": ingested}), 200
+
 @app.route('/payments/<int:id>', methods=['DELETE'])
 def delete_payment(id):
     payment = Payment.query.get(id)
@@ -489,12 +2991,19 @@ def delete_payment(id):
 
 # Routes for EventTicketCount
 @app.route('/event_ticket_counts', methods=['GET'])
+@read_only
 def get_event_ticket_counts():
-    counts = EventTicketCount.query.all()
-    counts_data = [{"event_id": count.event_id, "tier": count.tier, "total_count": count.total_count, "available_count": count.available_count, "total_purchased": count.total_purchased} for count in counts]
-    return jsonify(counts_data), 200
+    query = db.select(
+        EventTicketCount.event_id,
+        EventTicketCount.tier,
+        EventTicketCount.total_count,
+        EventTicketCount.available_count,
+        EventTicketCount.total_purchased
+    ).order_by(EventTicketCount.event_id, EventTicketCount.tier)
+    return stream_rows(query), 200
 
 @app.route('/event_ticket_counts/<int:event_id>/<tier>', methods=['GET'])
+@read_only
 def get_event_ticket_count(event_id, tier):
     count = EventTicketCount.query.filter_by(event_id=event_id, tier=tier).first()
     if count:
@@ -502,6 +3011,7 @@ def get_event_ticket_count(event_id, tier):
     return jsonify({"message": "Ticket count not found"}), 404
 
 @app.route('/event_ticket_counts', methods=['POST'])
+@organiser_required
 def create_event_ticket_count():
     data = request.get_json()
     new_count = EventTicketCount(
@@ -512,16 +3022,19 @@ def create_event_ticket_count():
     )
     db.session.add(new_count)
     db.session.commit()
+    invalidate_event_cache(new_count.event_id)
     return jsonify({"message": "Event ticket count created successfully!"}), 201
 
 # Routes for EventTicketType
 @app.route('/event_ticket_types', methods=['GET'])
+@read_only
 def get_event_ticket_types():
-    types = EventTicketType.query.all()
-    types_data = [{"id": type.id, "event_id": type.event_id, "tier_name": type.tier_name, "price": type.price} for type in types]
-    return jsonify(types_data), 200
+    query = db.select(EventTicketType.id, EventTicketType.event_id, EventTicketType.tier_name, EventTicketType.price) \
+        .order_by(EventTicketType.id)
+    return stream_rows(query), 200
 
 @app.route('/event_ticket_types/<int:id>', methods=['GET'])
+@read_only
 def get_event_ticket_type(id):
     ticket_type = EventTicketType.query.get(id)
     if ticket_type:
@@ -529,6 +3042,7 @@ def get_event_ticket_type(id):
     return jsonify({"message": "Ticket type not found"}), 404
 
 @app.route('/event_ticket_types', methods=['POST'])
+@organiser_required
 def create_event_ticket_type():
     data = request.get_json()
     new_ticket_type = EventTicketType(
@@ -538,16 +3052,18 @@ def create_event_ticket_type():
     )
     db.session.add(new_ticket_type)
     db.session.commit()
+    invalidate_event_cache(new_ticket_type.event_id)
     return jsonify({"message": "Event ticket type created successfully!"}), 201
 
 # Routes for EventDate
 @app.route('/event_dates', methods=['GET'])
+@read_only
 def get_event_dates():
-    dates = EventDate.query.all()
-    dates_data = [{"event_id": date.event_id, "event_date": date.event_date} for date in dates]
-    return jsonify(dates_data), 200
+    query = db.select(EventDate.event_id, EventDate.event_date).order_by(EventDate.id)
+    return stream_rows(query), 200
 
 @app.route('/event_dates/<int:event_id>', methods=['GET'])
+@read_only
 def get_event_dates_by_event(event_id):
     dates = EventDate.query.filter_by(event_id=event_id).all()
     if dates:
@@ -556,6 +3072,7 @@ def get_event_dates_by_event(event_id):
     return jsonify({"message": "No dates found for this event"}), 404
 
 @app.route('/event_dates', methods=['POST'])
+@organiser_required
 def create_event_date():
     data = request.get_json()
     new_date = EventDate(
@@ -564,7 +3081,551 @@ def create_event_date():
     )
     db.session.add(new_date)
     db.session.commit()
+    invalidate_event_cache(new_date.event_id)
     return jsonify({"message": "Event date created successfully!"}), 201
 
+# Request profiling
+# Opt-in (PROFILE_REQUESTS=true). Times every statement through the engine
+# events and reports per-request wall time, DB time, statement count and rows
+# in a Server-Timing header and in the /metrics histograms.
+request_metrics = {}
+request_metrics_lock = threading.Lock()
+
+def _route_metrics(endpoint, method):
+    key = (endpoint, method)
+    with request_metrics_lock:
+        if key not in request_metrics:
+            request_metrics[key] = {
+                "duration_seconds": Histogram(LATENCY_BUCKETS),
+                "db_seconds": Histogram(LATENCY_BUCKETS),
+                "statements": 0,
+                "rows": 0,
+                "uncounted_statements": 0
+            }
+        return request_metrics[key]
+
+# SELECTs that write or lock: sequence calls, notifications, advisory and row
+# locks, SELECT INTO. Re-running one under EXPLAIN ANALYZE would repeat it.
+EXPLAIN_UNSAFE = re.compile(
+    r'\b(nextval|setval|pg_notify|pg_\w*advisory\w*|into)\b|\bfor\s+(no\s+key\s+)?(update|share)\b|\bfor\s+key\s+share\b',
+    re.IGNORECASE
+)
+
+def _explainable(statement):
+    return statement.lstrip().upper().startswith('SELECT') and not EXPLAIN_UNSAFE.search(statement)
+
+def _explain_analyze(cursor, statement, parameters):
+    # Re-run the statement under EXPLAIN ANALYZE on the same connection,
+    # inside a savepoint so a failure cannot abort the caller's transaction
+    explain_cursor = cursor.connection.cursor()
+    try:
+        explain_cursor.execute('SAVEPOINT explain_sample')
+        explain_cursor.execute('EXPLAIN (ANALYZE, BUFFERS) ' + statement, parameters)
+        plan = '\n'.join(row[0] for row in explain_cursor.fetchall())
+        explain_cursor.execute('RELEASE SAVEPOINT explain_sample')
+        return plan
+    except Exception:
+        explain_cursor.execute('ROLLBACK TO SAVEPOINT explain_sample')
+        raise
+    finally:
+        explain_cursor.close()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, so a statement that raises leaves nothing behind
+    context._query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    if has_request_context() and 'profile' in g:
+        g.profile['db_time'] += elapsed
+        g.profile['statements'] += 1
+        # Drivers report -1 when the count is not known before fetching, as
+        # sqlite3 does for every SELECT. Those statements are counted apart
+        # rather than as zero rows.
+        if cursor.rowcount >= 0:
+            g.profile['rows'] += cursor.rowcount
+        else:
+            g.profile['uncounted'] += 1
+
+    if elapsed * 1000 < app.config['SLOW_QUERY_MS']:
+        return
+    app.logger.warning('Slow query (%.1f ms): %s', elapsed * 1000, statement)
+    if (conn.dialect.name == 'postgresql' and not executemany and _explainable(statement)
+            and random.random() < app.config['EXPLAIN_SAMPLE_RATE']):
+        try:
+            app.logger.warning('Query plan:\n%s', _explain_analyze(cursor, statement, parameters))
+        except Exception:
+            app.logger.exception('EXPLAIN ANALYZE failed')
+
+def _start_request_profile():
+    g.profile = {"started": time.perf_counter(), "db_time": 0.0, "statements": 0, "rows": 0, "uncounted": 0}
+
+def _finish_request_profile(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    total = time.perf_counter() - profile['started']
+    response.headers['Server-Timing'] = 'db;dur={:.2f};desc="{} statements, {} rows, {} uncounted", app;dur={:.2f}, total;dur={:.2f}'.format(
+        profile['db_time'] * 1000, profile['statements'], profile['rows'], profile['uncounted'],
+        (total - profile['db_time']) * 1000, total * 1000
+    )
+    metrics = _route_metrics(request.endpoint or 'unmatched', request.method)
+    metrics['duration_seconds'].observe(total)
+    metrics['db_seconds'].observe(profile['db_time'])
+    with request_metrics_lock:
+        metrics['statements'] += profile['statements']
+        metrics['rows'] += profile['rows']
+        metrics['uncounted_statements'] += profile['uncounted']
+    return response
+
+if app.config['PROFILE_REQUESTS']:
+    sa_event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    sa_event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_start_request_profile)
+    app.after_request(_finish_request_profile)
+
+summary_cli = AppGroup('summary', help='Event summary read model maintenance.')
+
+def _summary_chunks(chunk_size):
+    last_id = 0
+    while True:
+        event_ids = db.session.execute(
+            db.select(Event.id).where(Event.id > last_id).order_by(Event.id).limit(chunk_size)
+        ).scalars().all()
+        if not event_ids:
+            return
+        yield event_ids
+        last_id = event_ids[-1]
+
+@summary_cli.command('rebuild')
+@click.option('--chunk-size', default=1000, show_default=True)
+def rebuild_summary_command(chunk_size):
+    """Recompute every summary row and drop rows of deleted events."""
+    for event_ids in _summary_chunks(chunk_size):
+        refresh_event_summaries(event_ids)
+        db.session.commit()
+    db.session.execute(db.delete(EventSummary).where(~db.exists().where(Event.id == EventSummary.event_id)))
+    db.session.commit()
+    click.echo('Event summary rebuilt')
+
+@summary_cli.command('check')
+@click.option('--chunk-size', default=1000, show_default=True)
+def check_summary_command(chunk_size):
+    """Compare event_summary with the normalised tables."""
+    def normalise(row):
+        row = dict(row)
+        row['sold_out'] = bool(row['sold_out'])
+        for column in ('category_names', 'tag_names'):
+            row[column] = sorted(row[column].split(SUMMARY_SEPARATOR)) if row[column] else []
+        return row
+
+    mismatches = 0
+    for event_ids in _summary_chunks(chunk_size):
+        expected = {row['event_id']: normalise(row) for row in db.session.execute(_event_summary_query(event_ids)).mappings()}
+        stored = db.session.execute(db.select(EventSummary).where(EventSummary.event_id.in_(event_ids))).scalars()
+        stored = {summary.event_id: normalise({"event_id": summary.event_id, **{column: getattr(summary, column) for column in SUMMARY_COLUMNS}}) for summary in stored}
+        for event_id, row in expected.items():
+            if stored.get(event_id) != row:
+                mismatches += 1
+                click.echo('Event {}: expected {}, found {}'.format(event_id, row, stored.get(event_id)))
+        db.session.expunge_all()
+    orphans = db.session.execute(
+        db.select(db.func.count()).select_from(EventSummary)
+        .where(~db.exists().where(Event.id == EventSummary.event_id))
+    ).scalar()
+    if orphans:
+        mismatches += orphans
+        click.echo('{} summary rows belong to deleted events'.format(orphans))
+    if mismatches:
+        raise click.ClickException('{} inconsistent summary rows'.format(mismatches))
+    click.echo('Event summary is consistent')
+
+app.cli.add_command(summary_cli)
+
+# Background jobs
+# Handlers take the payloads of every claimed job of their kind, so similar
+# jobs run as one batch in one transaction. A handler may return a callback
+# to run once that transaction has committed.
+job_handlers = {}
+
+def job_handler(kind):
+    def decorator(func):
+        job_handlers[kind] = func
+        return func
+    return decorator
+
+def enqueue_job(kind, payload, delay=0):
+    """Queue a job in the current transaction; it becomes visible to workers on commit."""
+    now = datetime.now()
+    job = Job(kind=kind, payload=payload, created_at=now, run_at=now + timedelta(seconds=delay))
+    db.session.add(job)
+    return job
+
+def _claim_jobs(batch_size):
+    now = datetime.now()
+    due = db.select(Job.id).where(db.or_(
+        db.and_(Job.status == 'queued', Job.run_at <= now),
+        db.and_(Job.status == 'running', Job.started_at <= now - timedelta(seconds=app.config['JOB_TIMEOUT']))
+    )).order_by(Job.run_at).limit(batch_size).with_for_update(skip_locked=True)
+    claimed = db.session.execute(
+        db.update(Job)
+        .where(Job.id.in_(due.scalar_subquery()))
+        .values(status='running', attempts=Job.attempts + 1, started_at=now)
+        .returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.created_at)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.session.commit()
+    return claimed
+
+def _finish_jobs(jobs):
+    now = datetime.now()
+    db.session.execute(db.update(Job), [
+        {"id": job.id, "status": 'done', "finished_at": now, "latency": (now - job.created_at).total_seconds()}
+        for job in jobs
+    ])
+
+def _retry_jobs(jobs, error):
+    now = datetime.now()
+    rows = []
+    for job in jobs:
+        if job.attempts >= app.config['JOB_MAX_ATTEMPTS']:
+            rows.append({"id": job.id, "status": 'failed', "finished_at": now, "last_error": repr(error)})
+        else:
+            backoff = app.config['JOB_RETRY_BASE'] * 2 ** (job.attempts - 1) * random.uniform(1, 1.5)
+            rows.append({"id": job.id, "status": 'queued', "run_at": now + timedelta(seconds=backoff), "last_error": repr(error)})
+    db.session.execute(db.update(Job), rows)
+    db.session.commit()
+
+def run_jobs(batch_size):
+    """Claim and run one batch of due jobs; returns the number claimed."""
+    claimed = _claim_jobs(batch_size)
+    by_kind = OrderedDict()
+    for job in claimed:
+        by_kind.setdefault(job.kind, []).append(job)
+    for kind, jobs in by_kind.items():
+        try:
+            if kind not in job_handlers:
+                raise LookupError('No handler for job kind {}'.format(kind))
+            after_commit = job_handlers[kind]([job.payload for job in jobs])
+            _finish_jobs(jobs)
+            db.session.commit()
+        except Exception as error:
+            db.session.rollback()
+            app.logger.exception('Job batch failed: %s x%d', kind, len(jobs))
+            _retry_jobs(jobs, error)
+            continue
+        if after_commit:
+            after_commit()
+    return len(claimed)
+
+def _job_worker(batch_size, poll_interval):
+    with app.app_context():
+        # Connections inherited from the parent process must not be reused
+        db.engine.dispose(close=False)
+        while True:
+            try:
+                claimed = run_jobs(batch_size)
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('Job worker failed to claim jobs')
+                claimed = 0
+            if claimed < batch_size:
+                time.sleep(poll_interval)
+
+@job_handler('refresh_summaries')
+def _refresh_summaries_job(payloads):
+    event_ids = {event_id for payload in payloads for event_id in payload['event_ids']}
+    refresh_event_summaries(event_ids)
+    return lambda: invalidate_cache('events')
+
+@job_handler('inventory_deltas')
+def _inventory_deltas_job(payloads):
+    deltas = Counter()
+    for payload in payloads:
+        deltas.update({int(event_id): delta for event_id, delta in payload['deltas'].items()})
+    _apply_inventory_deltas(db.session, deltas)
+    return lambda: invalidate_cache('events')
+
+@job_handler('ticket_confirmation')
+def _ticket_confirmation_job(payloads):
+    ticket_ids = {ticket_id for payload in payloads for ticket_id in payload['ticket_ids']}
+    rows = db.session.execute(
+        db.select(User.email, Ticket.id, Event.name)
+        .join(Ticket, Ticket.user_id == User.id).join(Event, Event.id == Ticket.event_id)
+        .where(Ticket.id.in_(ticket_ids)).order_by(User.email, Ticket.id)
+    ).all()
+    tickets_by_email = OrderedDict()
+    for row in rows:
+        tickets_by_email.setdefault(row.email, []).append('#{} ({})'.format(row.id, row.name))
+    # Delivery hook: no mail transport is configured yet, so confirmations are logged
+    for email, tickets in tickets_by_email.items():
+        app.logger.info('Ticket confirmation for %s: %s', email, ', '.join(tickets))
+
+jobs_cli = AppGroup('jobs', help='Background job queue.')
+
+@jobs_cli.command('work')
+@click.option('--processes', type=int, default=None, help='Worker processes [default: JOB_WORKERS].')
+@click.option('--batch-size', type=int, default=None, help='Jobs claimed per round [default: JOB_BATCH_SIZE].')
+@click.option('--once', is_flag=True, help='Drain the due jobs in this process and exit.')
+def work_jobs_command(processes, batch_size, once):
+    """Run queued jobs."""
+    batch_size = batch_size or app.config['JOB_BATCH_SIZE']
+    if once:
+        total = 0
+        while True:
+            claimed = run_jobs(batch_size)
+            total += claimed
+            if claimed < batch_size:
+                break
+        click.echo('Ran {} jobs'.format(total))
+        return
+
+    workers = [
+        multiprocessing.Process(
+            target=_job_worker, args=(batch_size, app.config['JOB_POLL_INTERVAL']), name='job-worker-{}'.format(n)
+        )
+        for n in range(processes or app.config['JOB_WORKERS'])
+    ]
+    for worker in workers:
+        worker.start()
+    click.echo('Started {} job workers'.format(len(workers)))
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+
+@jobs_cli.command('prune')
+def prune_jobs_command():
+    """Delete finished jobs older than JOB_RETENTION."""
+    cutoff = datetime.now() - timedelta(seconds=app.config['JOB_RETENTION'])
+    deleted = db.session.execute(
+        db.delete(Job).where(Job.status == 'done', Job.finished_at < cutoff)
+    ).rowcount
+    db.session.commit()
+    click.echo('Deleted {} finished jobs'.format(deleted))
+
+app.cli.add_command(jobs_cli)
+
+# Synthetic data
+# `flask seed` fills every table at a chosen scale for load tests, one chunk
+# of events (with their tiers, dates, categories, tags, tickets and payments)
+# per transaction. Seeded users all share the password SEED_PASSWORD.
+SEED_PASSWORD = 'password'
+SEED_TIERS = [('Regular', 500, 1500), ('VIP', 2000, 5000), ('VVIP', 6000, 15000)]
+SEED_VENUES = ['KICC', 'Carnivore Grounds', 'Uhuru Gardens', 'Kasarani Stadium', 'Alliance Francaise',
+               'Sarit Expo Centre', 'Nyayo Stadium', 'The Alchemist', 'Ngong Racecourse', 'Village Market']
+SEED_WORDS = ['live', 'jazz', 'festival', 'comedy', 'night', 'summer', 'tech', 'summit', 'food', 'art',
+              'rock', 'gospel', 'theatre', 'marathon', 'expo', 'acoustic', 'film', 'wine', 'poetry', 'dance']
+
+def _seed_names(model, prefix, count):
+    names = ['{}-{}'.format(prefix, n) for n in range(1, count + 1)]
+    if names:
+        upsert(model, [{"name": name} for name in names], ['name'])
+    return db.session.execute(db.select(model.id).where(model.name.in_(names))).scalars().all()
+
+def _seed_users(count, chunk_size, rng, now):
+    password = hash_password(SEED_PASSWORD)
+    first = (db.session.execute(db.select(db.func.max(User.id))).scalar() or 0) + 1
+    user_ids = []
+    for start in range(first, first + count, chunk_size):
+        user_ids += _insert_returning_ids(User, [{
+            "username": 'seed{}'.format(n),
+            "email": 'seed{}@example.com'.format(n),
+            "password": password,
+            "role": 'organiser' if rng.random() < 0.05 else 'user',
+            "created_at": now,
+            "updated_at": now
+        } for n in range(start, min(start + chunk_size, first + count))])
+        db.session.commit()
+    return user_ids
+
+def _seed_event_record(rng, now, user_ids, tickets_per_tier):
+    starts_at = now + timedelta(days=rng.randint(-30, 365), minutes=rng.randrange(0, 1440, 15))
+    words = rng.sample(SEED_WORDS, 3)
+    record = {
+        "name": ' '.join(word.title() for word in words),
+        "description": ' '.join(rng.choice(SEED_WORDS) for _ in range(rng.randint(10, 40))),
+        "venue": rng.choice(SEED_VENUES),
+        "time": starts_at.isoformat(),
+        "organiser_id": rng.choice(user_ids),
+        "event_date": starts_at.isoformat(),
+        "ticket_counts": [],
+        "ticket_types": []
+    }
+    for tier, low, high in SEED_TIERS[:rng.randint(1, len(SEED_TIERS))]:
+        sold = rng.randint(0, tickets_per_tier)
+        total = sold + rng.randint(0, 500)
+        record['ticket_counts'].append({"tier": tier, "total_count": total, "available_count": total - sold, "total_purchased": sold})
+        record['ticket_types'].append({"tier_name": tier, "price": rng.randrange(low, high + 1, 50)})
+    return record
+
+def _seed_event_children(records, event_ids, rng, now, user_ids, category_ids, tag_ids):
+    date_rows, category_rows, tag_rows, ticket_rows = [], [], [], []
+    for record, event_id in zip(records, event_ids):
+        starts_at = datetime.fromisoformat(record['event_date'])
+        for week in range(1, rng.randint(1, 3)):
+            date_rows.append({"event_id": event_id, "event_date": starts_at + timedelta(weeks=week)})
+        for category_id in rng.sample(category_ids, min(len(category_ids), rng.randint(1, 3))):
+            category_rows.append({"event_id": event_id, "category_id": category_id})
+        for tag_id in rng.sample(tag_ids, min(len(tag_ids), rng.randint(0, 4))):
+            tag_rows.append({"event_id": event_id, "tag_id": tag_id})
+        prices = {ticket_type['tier_name']: ticket_type['price'] for ticket_type in record['ticket_types']}
+        for ticket_count in record['ticket_counts']:
+            for _ in range(ticket_count['total_purchased']):
+                ticket_rows.append({
+                    "event_id": event_id,
+                    "user_id": rng.choice(user_ids),
+                    "tier": ticket_count['tier'],
+                    "price": prices[ticket_count['tier']],
+                    "status": 'paid' if rng.random() < 0.9 else 'pending',
+                    "created_at": now - timedelta(seconds=rng.randint(0, 180 * 86400))
+                })
+    _bulk_insert(EventDate, date_rows)
+    _bulk_insert(EventCategory, category_rows)
+    _bulk_insert(EventTag, tag_rows)
+
+    payment_rows = []
+    for ticket_id, ticket in zip(_insert_returning_ids(Ticket, ticket_rows) if ticket_rows else [], ticket_rows):
+        if ticket['status'] == 'paid' or rng.random() < 0.5:
+            payment_rows.append({
+                "ticket_id": ticket_id,
+                "transaction_id": 'SEED{}'.format(ticket_id),
+                "status": 'completed' if ticket['status'] == 'paid' else 'pending',
+                "created_at": ticket['created_at']
+            })
+    _bulk_insert(Payment, payment_rows)
+    return Counter(event_dates=len(date_rows) + len(records), event_categories=len(category_rows),
+                   event_tags=len(tag_rows), tickets=len(ticket_rows), payments=len(payment_rows))
+
+def seed_database(users, events, tickets, categories, tags, chunk_size=500, seed=None):
+    """Generate synthetic rows in every table; returns the number of rows written per table."""
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    written = Counter()
+
+    user_ids = _seed_users(users, chunk_size, rng, now)
+    written['users'] = len(user_ids)
+    if not user_ids:
+        user_ids = db.session.execute(db.select(User.id).limit(10000)).scalars().all()
+    if events and not user_ids:
+        raise ValueError('Events need at least one user to organise them')
+
+    category_ids = _seed_names(Category, 'category', categories)
+    tag_ids = _seed_names(Tag, 'tag', tags)
+    db.session.commit()
+    written.update(categories=len(category_ids), tags=len(tag_ids))
+
+    # Events have two tiers on average and each tier sells half its maximum on
+    # average, so a per-tier maximum of tickets / events lands near the total
+    tickets_per_tier = round(tickets / events) if events else 0
+    for start in range(0, events, chunk_size):
+        records = [_seed_event_record(rng, now, user_ids, tickets_per_tier) for _ in range(min(chunk_size, events - start))]
+        event_ids = _insert_event_chunk(records)
+        written.update(_seed_event_children(records, event_ids, rng, now, user_ids, category_ids, tag_ids))
+        written.update(events=len(event_ids), event_ticket_count=sum(len(record['ticket_counts']) for record in records))
+        written['event_ticket_types'] = written['event_ticket_count']
+        db.session.commit()
+        db.session.expunge_all()
+    return written
+
+@app.cli.command('seed')
+@click.option('--users', default=1000, show_default=True)
+@click.option('--events', default=1000, show_default=True)
+@click.option('--tickets', default=10000, show_default=True, help='Approximate number of sold tickets.')
+@click.option('--categories', default=20, show_default=True)
+@click.option('--tags', default=50, show_default=True)
+@click.option('--chunk-size', default=500, show_default=True, help='Events written per transaction.')
+@click.option('--seed', type=int, default=None, help='Random seed, for repeatable data.')
+def seed_command(users, events, tickets, categories, tags, chunk_size, seed):
+    """Fill the database with synthetic data for load testing."""
+    start = time.perf_counter()
+    try:
+        written = seed_database(users, events, tickets, categories, tags, chunk_size, seed)
+    except ValueError as error:
+        raise click.ClickException(str(error))
+    invalidate_cache('events', 'categories', 'tags')
+    for table, count in sorted(written.items()):
+        click.echo('{:<20} {:>10}'.format(table, count))
+    click.echo('Seeded in {:.1f}s'.format(time.perf_counter() - start))
+
+# Metrics
+def _pool_metric_lines():
+    lines = pool_metrics["checkout_seconds"].render('db_pool_checkout_seconds')
+    lines += [
+        'db_pool_checkout_timeouts_total {}'.format(pool_metrics["checkout_timeouts"]),
+        'db_pool_connections_opened_total {}'.format(pool_metrics["connections_opened"]),
+        'db_pool_connections_closed_total {}'.format(pool_metrics["connections_closed"]),
+        'db_pool_connections_invalidated_total {}'.format(pool_metrics["connections_invalidated"])
+    ]
+    pool = db.engine.pool
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + app.config['DB_MAX_OVERFLOW']
+        lines += [
+            'db_pool_size {}'.format(pool.size()),
+            'db_pool_checked_out {}'.format(pool.checkedout()),
+            'db_pool_overflow {}'.format(max(pool.overflow(), 0)),
+            'db_pool_saturation {}'.format(pool.checkedout() / capacity if capacity else 0)
+        ]
+    return lines
+
+def _replica_metric_lines():
+    if not replica_router:
+        return []
+    lines = []
+    for index, lag in enumerate(replica_router.lags):
+        lines.append('db_replica_healthy{{replica="{}"}} {}'.format(index, int(index in replica_router.healthy)))
+        if lag is not None:
+            lines.append('db_replica_lag_seconds{{replica="{}"}} {}'.format(index, lag))
+    return lines
+
+def _job_metric_lines():
+    lines = []
+    depth = db.session.execute(
+        db.select(Job.kind, Job.status, db.func.count())
+        .where(Job.status != 'done').group_by(Job.kind, Job.status).order_by(Job.kind, Job.status)
+    ).all()
+    for kind, status, count in depth:
+        lines.append('job_queue_depth{{kind="{}",status="{}"}} {}'.format(kind, status, count))
+    now = datetime.now()
+    oldest = db.session.execute(
+        db.select(Job.kind, db.func.min(Job.created_at))
+        .where(Job.status == 'queued').group_by(Job.kind).order_by(Job.kind)
+    ).all()
+    for kind, created_at in oldest:
+        lines.append('job_oldest_queued_seconds{{kind="{}"}} {}'.format(kind, max((now - created_at).total_seconds(), 0)))
+    # Enqueue-to-completion latency of the jobs finished in the last five minutes
+    latency = db.session.execute(
+        db.select(Job.kind, db.func.count(), db.func.avg(Job.latency), db.func.max(Job.latency))
+        .where(Job.status == 'done', Job.finished_at >= now - timedelta(minutes=5))
+        .group_by(Job.kind).order_by(Job.kind)
+    ).all()
+    for kind, count, average, maximum in latency:
+        lines += [
+            'job_recent_completed{{kind="{}"}} {}'.format(kind, count),
+            'job_recent_latency_seconds{{kind="{}",stat="avg"}} {}'.format(kind, average),
+            'job_recent_latency_seconds{{kind="{}",stat="max"}} {}'.format(kind, maximum)
+        ]
+    return lines
+
+def _request_metric_lines():
+    lines = []
+    with request_metrics_lock:
+        routes = sorted(request_metrics.items())
+    for (endpoint, method), metrics in routes:
+        labels = 'endpoint="{}",method="{}"'.format(endpoint, method)
+        lines += metrics['duration_seconds'].render('http_request_duration_seconds', labels)
+        lines += metrics['db_seconds'].render('http_request_db_seconds', labels)
+        lines.append('http_request_statements_total{{{}}} {}'.format(labels, metrics['statements']))
+        lines.append('http_request_rows_total{{{}}} {}'.format(labels, metrics['rows']))
+        lines.append('http_request_uncounted_statements_total{{{}}} {}'.format(labels, metrics['uncounted_statements']))
+    return lines
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    lines = _pool_metric_lines() + _replica_metric_lines() + _job_metric_lines() + _request_metric_lines()
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,360 @@
+# ASGI entry point
+# Serves the read-heavy routes (/events, /events/<id>, /check_login and
+# /event_ticket_counts/<event_id>/<tier>) from async views backed by an async
+# database driver (asyncpg for Postgres, aiosqlite for SQLite), with the same
+# format negotiation, compression and read-replica routing as the Flask
+# catalog routes. The /inventory/stream push channel is served here too, where
+# an idle subscriber costs a coroutine rather than a thread. Every other
+# route, including all writes, falls through to the Flask app unchanged.
+#
+# /events and /events/<id> share the Flask routes' response cache: the same
+# keys, generations and ETags, with a 304 on a matching If-None-Match. The
+# async views are not counted by the per-route request metrics on /metrics.
+#
+# Run with: uvicorn asgi:application --workers 4
+# Each worker is its own process, so set SESSION_URL and CACHE_URL to shared
+# stores: the in-memory session store and cache generations are per process,
+# and a login or an invalidation in one worker is not seen by the others.
+import asyncio
+import json
+import os
+import re
+from urllib.parse import parse_qsl, urlencode
+
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_cookie, parse_etags
+from werkzeug.wrappers import Response
+
+import app as backend
+
+from app import (
+    app, Event, EventTicketCount, COMPRESSIBLE_MIMETYPES, _pack_response, InventoryBroker, REPLICA_STICKY_COOKIE,
+    _assemble_catalog, _catalog_child_queries, _encode_events_cursor, _inventory_event_ids, events_page_queries,
+    compress_body, encode_catalog, inventory_broker, inventory_message, inventory_snapshot_query, inventory_updates,
+    negotiate_catalog_format, negotiate_encoding, reads_from_primary, replica_router
+)
+
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+def _async_database_url(url):
+    scheme, rest = url.split('://', 1)
+    scheme = scheme.split('+')[0]
+    if scheme == 'postgres':
+        scheme = 'postgresql'
+    return '{}://{}'.format(ASYNC_DRIVERS[scheme], rest)
+
+def _async_engine_options(url):
+    options = {"pool_pre_ping": app.config['DB_POOL_PRE_PING']}
+    if not url.startswith('postgresql'):
+        return options
+    options.update(
+        pool_size=app.config['DB_POOL_SIZE'],
+        max_overflow=app.config['DB_MAX_OVERFLOW'],
+        pool_timeout=app.config['DB_POOL_TIMEOUT'],
+        pool_recycle=app.config['DB_POOL_RECYCLE']
+    )
+    if app.config['PGBOUNCER']:
+        # asyncpg prepares every statement unless its caches are disabled
+        options['connect_args'] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+    elif app.config['DB_STATEMENT_TIMEOUT_MS']:
+        options['connect_args'] = {
+            "server_settings": {"statement_timeout": str(app.config['DB_STATEMENT_TIMEOUT_MS'])}
+        }
+    return options
+
+ASYNC_DATABASE_URL = os.getenv('ASYNC_DATABASE_URL') or _async_database_url(app.config['SQLALCHEMY_DATABASE_URI'])
+engine = create_async_engine(ASYNC_DATABASE_URL, **_async_engine_options(ASYNC_DATABASE_URL))
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+def _async_replica_engine(sync_engine):
+    url = _async_database_url(sync_engine.url.render_as_string(hide_password=False))
+    return create_async_engine(url, **_async_engine_options(url))
+
+# Keyed by the Flask app's replica engines, so its lag checks pick for both
+replica_engines = {
+    sync_engine: _async_replica_engine(sync_engine) for sync_engine in (replica_router.engines if replica_router else [])
+}
+replica_sessions = {
+    sync_engine: async_sessionmaker(async_engine, expire_on_commit=False) for sync_engine, async_engine in replica_engines.items()
+}
+
+def _read_replica(scope):
+    # Picked once per request, so the cache key and the session agree
+    if 'read_replica' not in scope:
+        scope['read_replica'] = None
+        if replica_router:
+            cookie = parse_cookie(dict(scope['headers']).get(b'cookie', b'').decode('latin-1'))
+            if not reads_from_primary(cookie.get(REPLICA_STICKY_COOKIE)):
+                scope['read_replica'] = replica_router.pick()
+    return scope['read_replica']
+
+def _read_session(scope):
+    replica = _read_replica(scope)
+    return replica_sessions[replica]() if replica is not None else Session()
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-expose-headers', b'X-Next-Cursor, Link')
+]
+
+def _json(data, status=200, headers=()):
+    return status, app.json.dumps(data).encode() + b'\n', [(b'content-type', b'application/json')] + list(headers)
+
+def _catalog(scope, data, headers=()):
+    # Same representations as the Flask catalog routes
+    args = dict(parse_qsl(scope['query_string'].decode()))
+    accept = dict(scope['headers']).get(b'accept', b'').decode('latin-1')
+    body, mimetype = encode_catalog(data, negotiate_catalog_format(args.get('format'), accept))
+    return 200, body, [(b'content-type', mimetype.encode()), (b'vary', b'Accept')] + list(headers)
+
+def _compress(scope, status, body, headers):
+    content_type = dict(headers).get(b'content-type', b'').decode()
+    if content_type not in COMPRESSIBLE_MIMETYPES:
+        return body, headers
+    if any(name == b'vary' and b'Accept-Encoding' in value for name, value in headers):
+        # Already negotiated, e.g. a response served from the cache
+        return body, headers
+    headers = headers + [(b'vary', b'Accept-Encoding')]
+    encoding = negotiate_encoding(dict(scope['headers']).get(b'accept-encoding', b'').decode('latin-1'))
+    if status != 200 or not encoding or len(body) < app.config['COMPRESS_MIN_SIZE']:
+        return body, headers
+    return compress_body(body, encoding), headers + [(b'content-encoding', encoding.encode())]
+
+async def _load_catalog(session, events):
+    if not events:
+        return []
+    dates_query, counts_query, types_query = _catalog_child_queries([event.id for event in events])
+    return _assemble_catalog(
+        events,
+        await session.execute(dates_query),
+        await session.execute(counts_query),
+        await session.execute(types_query)
+    )
+
+# Response cache
+def _cache_key(scope, namespaces):
+    # Built like the key in app.cached_response, so both serve the same entries
+    headers = dict(scope['headers'])
+    query = scope['query_string'].decode()
+    generations = ','.join('{}={}'.format(name, backend.response_cache.generation(name)) for name in namespaces)
+    fmt = negotiate_catalog_format(dict(parse_qsl(query)).get('format'), headers.get(b'accept', b'').decode('latin-1'))
+    encoding = negotiate_encoding(headers.get(b'accept-encoding', b'').decode('latin-1'))
+    return 'response:{}?{}:{}:{}:{}:{}'.format(
+        scope['path'], query, generations, fmt, encoding,
+        'primary' if _read_replica(scope) is None else 'replica'
+    )
+
+async def _cached(scope, namespaces, view, *args):
+    key = _cache_key(scope, namespaces)
+    entry = backend.response_cache.get(key)
+    if entry is None:
+        status, body, headers = await view(scope, *args)
+        body, headers = _compress(scope, status, body, headers)
+        if status != 200:
+            return status, body, headers
+        response = Response(body, headers=[(name.decode(), value.decode()) for name, value in headers])
+        response.headers['Vary'] = ', '.join(response.headers.getlist('Vary'))
+        entry = _pack_response(response)
+        backend.response_cache.set(key, entry, app.config['CACHE_TTL'])
+    header, body = entry.split(b'\n', 1)
+    header = json.loads(header)
+    etag = '"{}"'.format(header['etag'])
+    headers = [(b'content-type', header['mimetype'].encode())]
+    headers += [(name.lower().encode(), value.encode()) for name, value in header['headers'].items()]
+    headers += [(b'etag', etag.encode()), (b'cache-control', b'no-cache')]
+    if parse_etags(dict(scope['headers']).get(b'if-none-match', b'').decode('latin-1')).contains(header['etag']):
+        return 304, b'', [(name, value) for name, value in headers if name != b'content-encoding']
+    return 200, body, headers
+
+# Async views
+async def get_events(scope):
+    args = MultiDict(parse_qsl(scope['query_string'].decode(), keep_blank_values=True))
+    try:
+        phases, limit = events_page_queries(args)
+    except (ValueError, TypeError):
+        return _json({"message": "Invalid filter or cursor"}, 400)
+
+    async with _read_session(scope) as session:
+        events = []
+        for phase in phases:
+            if len(events) > limit:
+                break
+            events += (await session.execute(phase.limit(limit + 1 - len(events)))).scalars().all()
+        has_more = len(events) > limit
+        events = events[:limit]
+        events_data = await _load_catalog(session, events)
+
+    headers = []
+    if has_more:
+        next_cursor = _encode_events_cursor(events[-1])
+        args = args.to_dict()
+        args['cursor'] = next_cursor
+        host = dict(scope['headers']).get(b'host', b'localhost').decode()
+        url = '{}://{}{}?{}'.format(scope.get('scheme', 'http'), host, scope['path'], urlencode(args))
+        headers.append((b'x-next-cursor', next_cursor.encode()))
+        headers.append((b'link', '<{}>; rel="next"'.format(url).encode()))
+    return _catalog(scope, events_data, headers)
+
+async def get_event(scope, id):
+    async with _read_session(scope) as session:
+        event = await session.get(Event, int(id))
+        if not event:
+            return _json({"message": "Event not found"}, 404)
+        events_data = await _load_catalog(session, [event])
+    return _catalog(scope, events_data[0])
+
+async def get_event_ticket_count(scope, event_id, tier):
+    async with _read_session(scope) as session:
+        count = await session.get(EventTicketCount, (int(event_id), tier))
+    if count:
+        return _json({"event_id": count.event_id, "tier": count.tier, "total_count": count.total_count, "available_count": count.available_count, "total_purchased": count.total_purchased})
+    return _json({"message": "Ticket count not found"}, 404)
+
+async def check_login(scope):
+    # Read the session through Flask's session interface so cookies issued by
+    # the sync app are understood here
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope['query_string'].decode(),
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'HTTP_COOKIE': dict(scope['headers']).get(b'cookie', b'').decode('latin-1')
+    }
+    session = app.session_interface.open_session(app, app.request_class(environ))
+    if session and 'user_id' in session:
+        return _json({"message": "User is logged in", "username": session['username']})
+    return _json({"message": "User is not logged in"}, 401)
+
+# Inventory push
+# The process-wide broker wakes the event loop once per tick; the loop then
+# fans the update out to its own subscribers through a loop-local broker.
+# Each stream waits on a single asyncio.Event, which is also set on
+# disconnect and by the keepalive sweep, so an idle subscriber costs nothing
+# per tick.
+local_broker = None
+
+def _local_broker():
+    global local_broker
+    if local_broker is None:
+        loop = asyncio.get_running_loop()
+        local_broker = InventoryBroker()
+        relay = inventory_broker.subscribe(wake=lambda: loop.call_soon_threadsafe(_relay, relay))
+        loop.create_task(_keepalive_sweep())
+    return local_broker
+
+def _relay(relay):
+    updates = relay.drain()
+    if updates:
+        local_broker.publish(updates)
+        local_broker.flush()
+
+async def _keepalive_sweep():
+    while True:
+        await asyncio.sleep(app.config['INVENTORY_KEEPALIVE'])
+        for subscription in list(local_broker.subscriptions):
+            subscription.keepalive = True
+            subscription.wake()
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+async def inventory_stream(scope, receive, send):
+    if not app.config['INVENTORY_PUSH']:
+        status, body, headers = _json({"message": "Inventory push is disabled"}, 404)
+        await send({'type': 'http.response.start', 'status': status, 'headers': CORS_HEADERS + headers})
+        await send({'type': 'http.response.body', 'body': body})
+        return
+    event_ids = _inventory_event_ids(MultiDict(parse_qsl(scope['query_string'].decode())))
+    wake = asyncio.Event()
+    subscription = _local_broker().subscribe(event_ids, wake.set)
+    subscription.keepalive = False
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    disconnected.add_done_callback(lambda _: wake.set())
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no')
+            ] + CORS_HEADERS
+        })
+        await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+        if event_ids:
+            async with Session() as session:
+                snapshot = inventory_updates(await session.execute(inventory_snapshot_query(event_ids)))
+            if snapshot:
+                await send({'type': 'http.response.body', 'body': inventory_message(snapshot), 'more_body': True})
+        while True:
+            await wake.wait()
+            wake.clear()
+            if disconnected.done():
+                break
+            updates = subscription.drain()
+            if updates:
+                await send({'type': 'http.response.body', 'body': inventory_message(updates), 'more_body': True})
+            elif subscription.keepalive:
+                await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+            subscription.keepalive = False
+    finally:
+        local_broker.unsubscribe(subscription)
+        disconnected.cancel()
+
+async def cached_events(scope):
+    return await _cached(scope, ['events'], get_events)
+
+async def cached_event(scope, id):
+    return await _cached(scope, ['event:{}'.format(int(id))], get_event, id)
+
+ROUTES = [
+    (re.compile(r'^/events$'), cached_events),
+    (re.compile(r'^/events/(\d+)$'), cached_event),
+    (re.compile(r'^/event_ticket_counts/(\d+)/([^/]+)$'), get_event_ticket_count),
+    (re.compile(r'^/check_login$'), check_login)
+]
+
+flask_app = WsgiToAsgi(app)
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await engine.dispose()
+            for replica_engine in replica_engines.values():
+                await replica_engine.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+
+    if scope['type'] == 'http' and scope['method'] == 'GET':
+        if scope['path'] == '/inventory/stream':
+            return await inventory_stream(scope, receive, send)
+        for pattern, view in ROUTES:
+            match = pattern.match(scope['path'])
+            if match:
+                try:
+                    status, body, headers = await view(scope, *match.groups())
+                except Exception:
+                    app.logger.exception('Async view failed: %s', scope['path'])
+                    status, body, headers = _json({"message": "Internal server error"}, 500)
+                body, headers = _compress(scope, status, body, headers)
+                await send({
+                    'type': 'http.response.start',
+                    'status': status,
+                    'headers': [(b'content-length', str(len(body)).encode())] + CORS_HEADERS + headers
+                })
+                await send({'type': 'http.response.body', 'body': body})
+                return
+
+    await flask_app(scope, receive, send)
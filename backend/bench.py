@@ -0,0 +1,902 @@
+# Benchmark suite
+# `routes` drives the main routes through Flask's test client, or over HTTP
+# against a running server with --url, using the database in DATABASE_URL.
+# For each route it records latency percentiles, SQL statements per request
+# (test client only) and peak RSS. With --baseline the run fails when a route
+# has regressed past --tolerance compared with the stored numbers.
+# `wire` compares the catalog wire formats and encodings on the first
+# --events events: bytes on the wire and serialisation time.
+# `push` turns on INVENTORY_PUSH and holds --subscribers server-sent event
+# streams open on the ASGI app while inventory updates are published, and
+# reports the CPU used to fan them out; --max-cpu turns that into a pass/fail
+# check.
+# `stream` tops the payments table up to --payments rows and streams one of
+# the admin list endpoints, sampling RSS as the rows go out; it should stay
+# flat however large the table is.
+# `search` tops the catalog up to --events events and reports search latency
+# for whole words, two-word queries and search-as-you-type prefixes;
+# --max-p95-ms turns that into a pass/fail check.
+# `tiers` creates events with many tiers and times PUT /events/<id> updating
+# every tier, for each --tiers count.
+# `history` gives a new user --tickets tickets across existing events and
+# times the first and deeper pages of GET /users/<id>/tickets, for each
+# --tickets count.
+# `import` times `flask events import` against creating the same events one
+# POST /events at a time, in rows/sec.
+# `load` holds --concurrency keep-alive connections against the read-heavy
+# routes and reports p50/p99 latency and requests/sec. With --compare it
+# serves the same database twice and prints both: the sync Flask app on
+# werkzeug's threaded server (what app.run uses, with keep-alive on), then the
+# async views under uvicorn (asgi:application).
+#
+# Seed a throwaway database first (`flask seed`), since the write routes
+# buy tickets and ingest payments. Payment callbacks are signed with
+# PAYMENT_WEBHOOK_SECRET, so set the same secret for the bench and the server.
+# Then:
+#   python bench.py routes --save-baseline bench_baseline.json
+#   python bench.py routes --baseline bench_baseline.json
+#   python bench.py wire --events 10000
+#   python bench.py push --subscribers 10000 --max-cpu 50
+#   python bench.py load --compare --concurrency 1000
+#   python bench.py import --events 5000 --loop-events 500
+#   python bench.py stream --payments 1000000 --max-growth-mb 20
+#   python bench.py search --events 1000000 --max-p95-ms 50
+#   python bench.py tiers --tiers 10 --tiers 200
+#   python bench.py history --tickets 100 --tickets 5000
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+import click
+from sqlalchemy import event as sa_event
+
+import app as backend
+from flask.json.provider import DefaultJSONProvider
+
+from app import (
+    app, db, Event, EventTicketCount, Payment, Ticket, User, SEED_PASSWORD, SEED_WORDS,
+    compress_body, encode_catalog, import_events, inventory_broker, load_event_catalog
+)
+
+# Regressions smaller than this many milliseconds are treated as noise
+LATENCY_SLACK_MS = 0.5
+
+def _request_headers(path, data):
+    headers = {'Content-Type': 'application/json'}
+    if path.startswith('/payments') and data is not None and app.config['PAYMENT_WEBHOOK_SECRET']:
+        headers['X-Signature'] = backend.payment_signature(data)
+    return headers
+
+class TestClientDriver:
+    mode = 'client'
+
+    def __init__(self):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        response = self.client.open(path, method=method, data=data, headers=_request_headers(path, data))
+        response.close()
+        return response.status_code
+
+class HttpDriver:
+    mode = 'http'
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()))
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        request = Request(self.url + path, data=data, method=method, headers=_request_headers(path, data))
+        try:
+            with self.opener.open(request) as response:
+                response.read()
+                return response.status
+        except HTTPError as error:
+            return error.code
+
+def _sample_fixtures():
+    """Pick existing rows for the routes to hit."""
+    with app.app_context():
+        event_ids = db.session.execute(db.select(Event.id).order_by(db.func.random()).limit(200)).scalars().all()
+        in_stock = db.session.execute(
+            db.select(EventTicketCount.event_id, EventTicketCount.tier)
+            .where(EventTicketCount.available_count > 0).order_by(db.func.random()).limit(200)
+        ).all()
+        ticket_ids = db.session.execute(db.select(Ticket.id).order_by(db.func.random()).limit(200)).scalars().all()
+        ticket_holders = db.session.execute(
+            db.select(Ticket.user_id).group_by(Ticket.user_id).order_by(db.func.random()).limit(200)
+        ).scalars().all()
+        seeded_user = db.session.execute(
+            db.select(User.email).where(User.email.like('seed%@example.com')).order_by(User.id).limit(1)
+        ).scalar()
+    if not event_ids or not in_stock or not ticket_holders:
+        raise click.ClickException('The database needs events, stock and tickets; run `flask seed` first')
+    return {
+        "event_ids": event_ids,
+        "in_stock": [tuple(row) for row in in_stock],
+        "ticket_ids": ticket_ids,
+        "ticket_holders": ticket_holders,
+        "login_email": seeded_user,
+        "words": SEED_WORDS
+    }
+
+def _scenarios(fixtures, rng, read_only):
+    event_id = lambda: rng.choice(fixtures['event_ids'])
+    scenarios = [
+        ('GET /events', lambda: ('GET', '/events', None)),
+        ('GET /events?venue', lambda: ('GET', '/events?venue=KICC&limit=20', None)),
+        ('GET /events/<id>', lambda: ('GET', '/events/{}'.format(event_id()), None)),
+        ('GET /events/summary', lambda: ('GET', '/events/summary', None)),
+        ('GET /events/search', lambda: ('GET', '/events/search?q={}'.format(rng.choice(fixtures['words'])), None)),
+        ('GET /categories', lambda: ('GET', '/categories', None)),
+        ('GET /tags', lambda: ('GET', '/tags', None)),
+        ('GET /event_ticket_counts/<id>/<tier>', lambda: ('GET', '/event_ticket_counts/{}/{}'.format(*rng.choice(fixtures['in_stock'])), None)),
+        ('GET /users/<id>/tickets', lambda: ('GET', '/users/{}/tickets?limit=20'.format(rng.choice(fixtures['ticket_holders'])), None)),
+        ('GET /check_login', lambda: ('GET', '/check_login', None)),
+    ]
+    if not read_only:
+        def purchase():
+            purchase_event, tier = rng.choice(fixtures['in_stock'])
+            body = {"tier": tier, "quantity": 1}
+            return 'POST', '/events/{}/purchase'.format(purchase_event), body
+
+        def ingest():
+            body = [{"ticket_id": rng.choice(fixtures['ticket_ids']), "transaction_id": 'BENCH{}'.format(uuid.uuid4().hex), "status": 'pending'}]
+            return 'POST', '/payments/ingest', body
+
+        scenarios += [('POST /events/<id>/purchase', purchase), ('POST /payments/ingest', ingest)]
+    return scenarios
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def _peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def run_scenario(driver, build_request, count, warmup):
+    statements = [0]
+
+    def count_statement(*args):
+        statements[0] += 1
+
+    for _ in range(warmup):
+        driver.request(*build_request())
+
+    counting = driver.mode == 'client'
+    if counting:
+        with app.app_context():
+            engine = db.engine
+        sa_event.listen(engine, 'before_cursor_execute', count_statement)
+    latencies, errors = [], 0
+    try:
+        for _ in range(count):
+            method, path, body = build_request()
+            start = time.perf_counter()
+            status = driver.request(method, path, body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if status >= 400:
+                errors += 1
+    finally:
+        if counting:
+            sa_event.remove(engine, 'before_cursor_execute', count_statement)
+
+    latencies.sort()
+    return {
+        "requests": count,
+        "errors": errors,
+        "p50_ms": round(_percentile(latencies, 0.50), 3),
+        "p95_ms": round(_percentile(latencies, 0.95), 3),
+        "p99_ms": round(_percentile(latencies, 0.99), 3),
+        "max_ms": round(latencies[-1], 3),
+        "statements_per_request": round(statements[0] / count, 2) if counting else None,
+        "peak_rss_kb": _peak_rss_kb() if counting else None
+    }
+
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    for name, base in baseline['routes'].items():
+        current = results['routes'].get(name)
+        if current is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            limit = base[metric] * (1 + tolerance) + LATENCY_SLACK_MS
+            if current[metric] > limit:
+                regressions.append('{}: {} {} > {:.3f}'.format(name, metric, current[metric], limit))
+        if current['statements_per_request'] is not None and base.get('statements_per_request') is not None:
+            if current['statements_per_request'] > base['statements_per_request'] + 0.5:
+                regressions.append('{}: statements_per_request {} > {}'.format(
+                    name, current['statements_per_request'], base['statements_per_request']))
+        if current['errors'] > base['errors']:
+            regressions.append('{}: errors {} > {}'.format(name, current['errors'], base['errors']))
+    if results['peak_rss_kb'] and baseline.get('peak_rss_kb'):
+        limit = baseline['peak_rss_kb'] * (1 + tolerance)
+        if results['peak_rss_kb'] > limit:
+            regressions.append('peak_rss_kb {} > {:.0f}'.format(results['peak_rss_kb'], limit))
+    return regressions
+
+@click.group()
+def cli():
+    """Backend benchmarks."""
+
+@cli.command()
+@click.option('--url', help='Benchmark a running server instead of the in-process test client.')
+@click.option('--requests', 'count', default=200, show_default=True, help='Timed requests per route.')
+@click.option('--warmup', default=20, show_default=True, help='Untimed requests per route.')
+@click.option('--route', 'only', multiple=True, help='Only run routes whose name contains this text.')
+@click.option('--read-only', is_flag=True, help='Skip the routes that write.')
+@click.option('--cache/--no-cache', default=False, show_default=True, help='Let the response cache serve GETs (test client only).')
+@click.option('--seed', type=int, default=0, show_default=True)
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), help='Fail on regressions against this file.')
+@click.option('--tolerance', default=0.2, show_default=True, help='Allowed relative slowdown.')
+@click.option('--save-baseline', type=click.Path(dir_okay=False), help='Write the results to this file.')
+def routes(url, count, warmup, only, read_only, cache, seed, baseline, tolerance, save_baseline):
+    """Benchmark the backend routes."""
+    rng = random.Random(seed)
+    if not cache:
+        # A cache that evicts every entry on insert, so each GET reaches the view
+        backend.response_cache = backend.MemoryCache(0)
+    driver = HttpDriver(url) if url else TestClientDriver()
+    fixtures = _sample_fixtures()
+    if fixtures['login_email']:
+        driver.request('POST', '/login', {"email": fixtures['login_email'], "password": SEED_PASSWORD})
+
+    with app.app_context():
+        database = db.engine.dialect.name
+    results = {
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+        "mode": driver.mode,
+        "database": database,
+        "cache": cache,
+        "routes": {}
+    }
+    click.echo('{:<38} {:>9} {:>9} {:>9} {:>9} {:>7} {:>6}'.format('route', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms', 'stmts', 'errors'))
+    for name, build_request in _scenarios(fixtures, rng, read_only):
+        if only and not any(route in name for route in only):
+            continue
+        result = run_scenario(driver, build_request, count, warmup)
+        results['routes'][name] = result
+        statements = result['statements_per_request']
+        click.echo('{:<38} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.2f} {:>7} {:>6}'.format(
+            name, result['p50_ms'], result['p95_ms'], result['p99_ms'], result['max_ms'],
+            '-' if statements is None else statements, result['errors']))
+    results['peak_rss_kb'] = _peak_rss_kb() if driver.mode == 'client' else None
+    if results['peak_rss_kb']:
+        click.echo('peak RSS {} KB'.format(results['peak_rss_kb']))
+
+    if save_baseline:
+        with open(save_baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        click.echo('Baseline written to {}'.format(save_baseline))
+    if baseline:
+        with open(baseline) as f:
+            regressions = find_regressions(results, json.load(f), tolerance)
+        if regressions:
+            for regression in regressions:
+                click.echo('REGRESSION ' + regression, err=True)
+            sys.exit(1)
+        click.echo('No regressions against {}'.format(baseline))
+
+def _best_time_ms(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+@cli.command()
+@click.option('--events', default=10000, show_default=True, help='Catalog size.')
+@click.option('--repeat', default=5, show_default=True, help='Runs per measurement; the fastest is reported.')
+def wire(events, repeat):
+    """Compare catalog wire formats: bytes on the wire and serialisation time."""
+    with app.app_context():
+        loaded = db.session.execute(db.select(Event).order_by(Event.id).limit(events)).scalars().all()
+        catalog = []
+        for start in range(0, len(loaded), 1000):
+            catalog += load_event_catalog(loaded[start:start + 1000])
+    if len(catalog) < events:
+        click.echo('Only {} events in the database; seed more with `flask seed`'.format(len(catalog)), err=True)
+
+    configured = app.json
+    variants = [('json (stdlib)', 'json', DefaultJSONProvider(app))]
+    if backend.orjson is not None:
+        variants.append(('json (orjson)', 'json', backend.OrjsonProvider(app)))
+    variants.append(('columnar json', 'columnar', configured))
+    if backend.msgpack is not None:
+        variants.append(('columnar msgpack', 'msgpack', configured))
+    encodings = ['gzip'] + (['br'] if backend.brotli is not None else [])
+
+    click.echo('{} events'.format(len(catalog)))
+    header = '{:<18} {:>12} {:>10}'.format('format', 'bytes', 'encode ms')
+    for encoding in encodings:
+        header += ' {:>12} {:>10}'.format(encoding + ' bytes', encoding + ' ms')
+    click.echo(header)
+    try:
+        for label, fmt, provider in variants:
+            app.json = provider
+            (body, _), encode_ms = _best_time_ms(lambda: encode_catalog(catalog, fmt), repeat)
+            line = '{:<18} {:>12} {:>10.1f}'.format(label, len(body), encode_ms)
+            for encoding in encodings:
+                compressed, compress_ms = _best_time_ms(lambda: compress_body(body, encoding), repeat)
+                line += ' {:>12} {:>10.1f}'.format(len(compressed), compress_ms)
+            click.echo(line)
+    finally:
+        app.json = configured
+
+def _cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+async def _hold_subscribers(application, subscribers, filtered, event_count, seconds, rate, rng):
+    stop = asyncio.Event()
+    counters = {"connected": 0, "messages": 0, "bytes": 0}
+
+    async def receive():
+        await stop.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] != 'http.response.body':
+            return
+        if message['body'].startswith(b'retry'):
+            counters['connected'] += 1
+        elif message['body'].startswith(b'event'):
+            counters['messages'] += 1
+            counters['bytes'] += len(message['body'])
+
+    def scope(index):
+        query = 'event_id={}'.format(rng.randint(1, event_count)) if index < subscribers * filtered else ''
+        return {'type': 'http', 'method': 'GET', 'path': '/inventory/stream',
+                'query_string': query.encode(), 'headers': []}
+
+    threads = threading.active_count()
+    tasks = [asyncio.ensure_future(application(scope(index), receive, send)) for index in range(subscribers)]
+    while counters['connected'] < subscribers:
+        await asyncio.sleep(0.1)
+    # aiosqlite runs each snapshot connection on its own thread; let them wind
+    # down so their teardown is not counted as fan-out
+    while threading.active_count() > threads + 1:
+        await asyncio.sleep(0.1)
+
+    published = [0]
+    done = threading.Event()
+
+    def publish():
+        # Catch up to the target rate every 10 ms, since sleeping between
+        # single updates undershoots it
+        start = time.perf_counter()
+        while not done.is_set():
+            while published[0] < rate * (time.perf_counter() - start):
+                inventory_broker.publish({rng.randint(1, event_count): {'VIP': rng.randint(0, 10000)}})
+                published[0] += 1
+            time.sleep(0.01)
+
+    publisher = threading.Thread(target=publish, daemon=True)
+    counters.update(messages=0, bytes=0)
+    cpu_start, wall_start = _cpu_seconds(), time.perf_counter()
+    publisher.start()
+    await asyncio.sleep(seconds)
+    done.set()
+    publisher.join()
+    cpu, wall = _cpu_seconds() - cpu_start, time.perf_counter() - wall_start
+
+    stop.set()
+    await asyncio.gather(*tasks)
+    return counters, published[0], cpu, wall
+
+@cli.command()
+@click.option('--subscribers', default=10000, show_default=True)
+@click.option('--seconds', default=10.0, show_default=True)
+@click.option('--rate', default=1000, show_default=True, help='Inventory updates published per second.')
+@click.option('--events', 'event_count', default=1000, show_default=True, help='Distinct events the updates touch.')
+@click.option('--filtered', default=0.5, show_default=True, help='Share of subscribers following a single event.')
+@click.option('--max-cpu', type=float, help='Fail if fan-out uses more than this percentage of one core.')
+@click.option('--seed', type=int, default=0, show_default=True)
+def push(subscribers, seconds, rate, event_count, filtered, max_cpu, seed):
+    """Measure inventory push fan-out to many SSE subscribers."""
+    from asgi import application  # Needs the ASGI dependencies
+
+    # Updates are published straight to the broker, so only the stream needs enabling
+    app.config['INVENTORY_PUSH'] = True
+
+    counters, published, cpu, wall = asyncio.run(
+        _hold_subscribers(application, subscribers, filtered, event_count, seconds, rate, random.Random(seed))
+    )
+    cpu_percent = cpu / wall * 100
+    click.echo('subscribers         {}'.format(subscribers))
+    click.echo('updates published   {} ({:.0f}/s)'.format(published, published / wall))
+    click.echo('messages delivered  {} ({:.0f}/s)'.format(counters['messages'], counters['messages'] / wall))
+    click.echo('bytes delivered     {}'.format(counters['bytes']))
+    click.echo('cpu                 {:.2f}s over {:.1f}s ({:.1f}% of one core)'.format(cpu, wall, cpu_percent))
+    click.echo('peak RSS            {} KB'.format(_peak_rss_kb()))
+    if max_cpu is not None and cpu_percent > max_cpu:
+        click.echo('CPU {:.1f}% is above the {:.1f}% limit'.format(cpu_percent, max_cpu), err=True)
+        sys.exit(1)
+
+# Write paths
+# These run through the test client against DATABASE_URL and add rows to it.
+BENCH_ORGANISER_EMAIL = 'bench-organiser@example.com'
+
+def _organiser_driver():
+    """A test client driver logged in as the benchmark organiser, created if missing."""
+    driver = TestClientDriver()
+    driver.request('POST', '/register', {
+        "username": 'bench-organiser', "email": BENCH_ORGANISER_EMAIL, "password": SEED_PASSWORD, "role": 'organiser'
+    })
+    if driver.request('POST', '/login', {"email": BENCH_ORGANISER_EMAIL, "password": SEED_PASSWORD}) != 200:
+        raise click.ClickException('Could not log in as {}'.format(BENCH_ORGANISER_EMAIL))
+    return driver
+
+def _bench_event_records(count, rng):
+    now = datetime.now().replace(microsecond=0)
+    with app.app_context():
+        organiser_id = db.session.execute(db.select(User.id).where(User.email == BENCH_ORGANISER_EMAIL)).scalar()
+        sqlite = db.engine.dialect.name == 'sqlite'
+    records = []
+    for _ in range(count):
+        record = backend._seed_event_record(rng, now, [organiser_id], 0)
+        if sqlite:
+            # SQLite only takes datetime objects, and POST /events passes the strings through
+            del record['time'], record['event_date']
+        records.append(record)
+    return records
+
+def _record_rows(records):
+    # The event, its date and one count and one type row per tier
+    return sum(1 + bool(record.get('event_date')) + len(record['ticket_counts']) + len(record['ticket_types'])
+               for record in records)
+
+@cli.command('import')
+@click.option('--events', 'event_count', default=5000, show_default=True, help='Events written by the bulk import.')
+@click.option('--loop-events', default=500, show_default=True, help='Events created one POST /events at a time.')
+@click.option('--chunk-size', default=1000, show_default=True)
+@click.option('--seed', type=int, default=0, show_default=True)
+def import_command(event_count, loop_events, chunk_size, seed):
+    """Compare bulk import rows/sec with looping POST /events."""
+    backend.response_cache = backend.MemoryCache(0)
+    rng = random.Random(seed)
+    driver = _organiser_driver()
+
+    records = _bench_event_records(loop_events, rng)
+    start = time.perf_counter()
+    errors = sum(driver.request('POST', '/events', record) != 201 for record in records)
+    loop_seconds = time.perf_counter() - start
+    loop_rows = _record_rows(records)
+
+    records = _bench_event_records(event_count, rng)
+    start = time.perf_counter()
+    with app.app_context():
+        import_events(iter(records), chunk_size)
+    import_seconds = time.perf_counter() - start
+    import_rows = _record_rows(records)
+
+    click.echo('{:<16} {:>8} {:>9} {:>9} {:>11} {:>7}'.format('path', 'events', 'rows', 'seconds', 'rows/s', 'errors'))
+    click.echo('{:<16} {:>8} {:>9} {:>9.2f} {:>11.0f} {:>7}'.format(
+        'POST /events', loop_events, loop_rows, loop_seconds, loop_rows / loop_seconds, errors))
+    click.echo('{:<16} {:>8} {:>9} {:>9.2f} {:>11.0f} {:>7}'.format(
+        'events import', event_count, import_rows, import_seconds, import_rows / import_seconds, 0))
+    click.echo('bulk import is {:.1f}x faster per row'.format((import_rows / import_seconds) / (loop_rows / loop_seconds)))
+
+def _current_rss_kb():
+    # ru_maxrss only ever grows, so read the live figure where there is one
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() // 1024
+    except OSError:
+        return _peak_rss_kb()
+
+def _top_up_payments(count, chunk_size=10000):
+    with app.app_context():
+        existing = db.session.execute(db.select(db.func.count(Payment.id))).scalar()
+        ticket_ids = db.session.execute(db.select(Ticket.id).limit(10000)).scalars().all()
+        if existing < count and not ticket_ids:
+            raise click.ClickException('The database needs tickets to attach payments to; run `flask seed` first')
+        run = uuid.uuid4().hex[:8]
+        for start in range(existing, count, chunk_size):
+            backend._bulk_insert(Payment, [{
+                "ticket_id": ticket_ids[n % len(ticket_ids)],
+                "transaction_id": 'BENCH{}-{}'.format(run, n),
+                "status": 'pending'
+            } for n in range(start, min(start + chunk_size, count))])
+            db.session.commit()
+        return max(existing, count)
+
+@cli.command()
+@click.option('--payments', 'payment_count', default=1000000, show_default=True, help='Rows in the payments table.')
+@click.option('--path', default='/payments', show_default=True, help='Admin list endpoint to stream.')
+@click.option('--sample-every', default=100000, show_default=True, help='Rows between RSS readings.')
+@click.option('--max-growth-mb', type=float, help='Fail if RSS grows by more than this while streaming.')
+def stream(payment_count, path, sample_every, max_growth_mb):
+    """Measure RSS while streaming an admin list endpoint as NDJSON."""
+    if path == '/payments':
+        _top_up_payments(payment_count)
+    client = app.test_client()
+    baseline = _current_rss_kb()
+    start = time.perf_counter()
+    response = client.get(path, query_string={"format": 'ndjson'}, buffered=False)
+    rows = size = 0
+    first_byte = None
+    readings = []
+    for chunk in response.response:
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        rows += chunk.count(b'\n')
+        size += len(chunk)
+        if rows >= sample_every * (len(readings) + 1):
+            readings.append((rows, _current_rss_kb()))
+    response.close()
+    elapsed = time.perf_counter() - start
+    if not readings or readings[-1][0] != rows:
+        readings.append((rows, _current_rss_kb()))
+
+    click.echo('{} rows, {} bytes in {:.1f}s ({:.0f} rows/s), first byte after {:.1f} ms'.format(
+        rows, size, elapsed, rows / elapsed, (first_byte or 0) * 1000))
+    click.echo('{:>10} {:>12}'.format('rows', 'RSS KB'))
+    click.echo('{:>10} {:>12}'.format(0, baseline))
+    for sent, rss in readings:
+        click.echo('{:>10} {:>12}'.format(sent, rss))
+    growth_mb = (max(rss for _, rss in readings) - baseline) / 1024
+    click.echo('RSS growth {:.1f} MB'.format(growth_mb))
+    if max_growth_mb is not None and growth_mb > max_growth_mb:
+        click.echo('RSS grew {:.1f} MB, above the {:.1f} MB limit'.format(growth_mb, max_growth_mb), err=True)
+        sys.exit(1)
+
+def _top_up_events(count, chunk_size):
+    with app.app_context():
+        existing = db.session.execute(db.select(db.func.count(Event.id))).scalar()
+        if existing < count:
+            click.echo('Seeding {} events'.format(count - existing))
+            try:
+                backend.seed_database(0, count - existing, 0, 20, 50, chunk_size)
+            except ValueError as error:
+                raise click.ClickException(str(error))
+        return max(existing, count)
+
+def _search_queries(rng):
+    word = lambda: rng.choice(SEED_WORDS)
+    return [
+        ('word', lambda: word()),
+        ('two words', lambda: '{} {}'.format(word(), word())),
+        ('prefix', lambda: word()[:rng.randint(2, 4)]),
+        ('word + prefix', lambda: '{} {}'.format(word(), word()[:rng.randint(2, 4)]))
+    ]
+
+@cli.command()
+@click.option('--events', 'event_count', default=1000000, show_default=True, help='Events in the catalog.')
+@click.option('--requests', 'count', default=200, show_default=True, help='Timed searches per query kind.')
+@click.option('--warmup', default=20, show_default=True)
+@click.option('--chunk-size', default=5000, show_default=True, help='Events seeded per transaction.')
+@click.option('--max-p95-ms', type=float, help='Fail if any query kind has a slower p95.')
+@click.option('--seed', type=int, default=0, show_default=True)
+def search(event_count, count, warmup, chunk_size, max_p95_ms, seed):
+    """Measure /events/search latency on a large catalog."""
+    backend.response_cache = backend.MemoryCache(0)
+    rng = random.Random(seed)
+    total = _top_up_events(event_count, chunk_size)
+    with app.app_context():
+        if not backend.search_index_installed():
+            click.echo('Installing the search index')
+            backend.init_search_command.callback()
+
+    driver = TestClientDriver()
+    click.echo('{} events'.format(total))
+    click.echo('{:<16} {:>9} {:>9} {:>9} {:>9} {:>6}'.format('query', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms', 'errors'))
+    slow = []
+    for name, query in _search_queries(rng):
+        build_request = lambda: ('GET', '/events/search?q={}'.format(query()), None)
+        result = run_scenario(driver, build_request, count, warmup)
+        click.echo('{:<16} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.2f} {:>6}'.format(
+            name, result['p50_ms'], result['p95_ms'], result['p99_ms'], result['max_ms'], result['errors']))
+        if max_p95_ms is not None and result['p95_ms'] > max_p95_ms:
+            slow.append(name)
+    if slow:
+        click.echo('p95 above {:.0f} ms for: {}'.format(max_p95_ms, ', '.join(slow)), err=True)
+        sys.exit(1)
+
+def _create_tiered_event(driver, tier_count):
+    name = 'bench-tiers-{}'.format(uuid.uuid4().hex)
+    tiers = ['Tier {}'.format(n) for n in range(tier_count)]
+    status = driver.request('POST', '/events', {
+        "name": name,
+        "venue": 'KICC',
+        "ticket_counts": [{"tier": tier, "total_count": 100, "available_count": 100} for tier in tiers],
+        "ticket_types": [{"tier_name": tier, "price": 1000} for tier in tiers]
+    })
+    if status != 201:
+        raise click.ClickException('Creating an event with {} tiers failed with {}'.format(tier_count, status))
+    with app.app_context():
+        return db.session.execute(db.select(Event.id).where(Event.name == name)).scalar(), tiers
+
+@cli.command()
+@click.option('--tiers', 'tier_counts', multiple=True, type=int, default=(10, 200), show_default=True, help='Tiers per event.')
+@click.option('--requests', 'count', default=50, show_default=True, help='Timed updates per tier count.')
+@click.option('--warmup', default=5, show_default=True)
+def tiers(tier_counts, count, warmup):
+    """Measure PUT /events/<id> updating every tier of an event."""
+    backend.response_cache = backend.MemoryCache(0)
+    driver = _organiser_driver()
+    click.echo('{:>6} {:>9} {:>9} {:>9} {:>9} {:>7} {:>6}'.format('tiers', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms', 'stmts', 'errors'))
+    for tier_count in tier_counts:
+        event_id, names = _create_tiered_event(driver, tier_count)
+        updates = itertools.count(1)
+
+        def build_request():
+            # Every update changes each tier's size and price, so every row is written
+            n = next(updates)
+            return 'PUT', '/events/{}'.format(event_id), {
+                "name": 'bench-tiers update {}'.format(n),
+                "ticket_counts": [{"tier": tier, "total_count": 100 + n} for tier in names],
+                "ticket_types": [{"tier_name": tier, "price": 1000 + n} for tier in names]
+            }
+
+        result = run_scenario(driver, build_request, count, warmup)
+        click.echo('{:>6} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.2f} {:>7} {:>6}'.format(
+            tier_count, result['p50_ms'], result['p95_ms'], result['p99_ms'], result['max_ms'],
+            result['statements_per_request'], result['errors']))
+
+def _ticket_holder(ticket_count, rng, chunk_size=5000):
+    """Create a user holding ticket_count tickets, most of them paid; returns its id."""
+    now = datetime.now().replace(microsecond=0)
+    with app.app_context():
+        event_ids = db.session.execute(db.select(Event.id).limit(1000)).scalars().all()
+        if not event_ids:
+            raise click.ClickException('The database needs events; run `flask seed` first')
+        name = 'bench-holder-{}'.format(uuid.uuid4().hex[:12])
+        user = User(username=name, email=name + '@example.com', password='x', role='user')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        for start in range(0, ticket_count, chunk_size):
+            rows = [{
+                "event_id": rng.choice(event_ids),
+                "user_id": user_id,
+                "tier": 'VIP',
+                "price": 1000,
+                "status": 'paid' if rng.random() < 0.9 else 'pending',
+                "created_at": now - timedelta(seconds=rng.randint(0, 365 * 86400))
+            } for _ in range(min(chunk_size, ticket_count - start))]
+            ticket_ids = backend._insert_returning_ids(Ticket, rows)
+            backend._bulk_insert(Payment, [{
+                "ticket_id": ticket_id,
+                "transaction_id": 'BENCH{}'.format(uuid.uuid4().hex),
+                "status": 'completed'
+            } for ticket_id, row in zip(ticket_ids, rows) if row['status'] == 'paid'])
+            db.session.commit()
+    return user_id
+
+def _history_cursors(driver, user_id, page_size):
+    cursors, cursor = [], None
+    while True:
+        path = '/users/{}/tickets?limit={}'.format(user_id, page_size) + ('&cursor={}'.format(cursor) if cursor else '')
+        response = driver.client.get(path)
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return cursors
+        cursors.append(cursor)
+
+@cli.command()
+@click.option('--tickets', 'ticket_counts', multiple=True, type=int, default=(100, 5000), show_default=True, help='Tickets held by the user.')
+@click.option('--page-size', default=20, show_default=True)
+@click.option('--requests', 'count', default=200, show_default=True, help='Timed requests per page kind.')
+@click.option('--warmup', default=20, show_default=True)
+@click.option('--seed', type=int, default=0, show_default=True)
+def history(ticket_counts, page_size, count, warmup, seed):
+    """Measure GET /users/<id>/tickets for users holding many tickets."""
+    backend.response_cache = backend.MemoryCache(0)
+    rng = random.Random(seed)
+    driver = TestClientDriver()
+    click.echo('{:>8} {:<12} {:>9} {:>9} {:>9} {:>7} {:>6}'.format('tickets', 'page', 'p50 ms', 'p95 ms', 'p99 ms', 'stmts', 'errors'))
+    for ticket_count in ticket_counts:
+        user_id = _ticket_holder(ticket_count, rng)
+        path = '/users/{}/tickets?limit={}'.format(user_id, page_size)
+        cursors = _history_cursors(driver, user_id, page_size)
+        pages = [('first', lambda: ('GET', path, None))]
+        if cursors:
+            pages.append(('random deep', lambda: ('GET', '{}&cursor={}'.format(path, rng.choice(cursors)), None)))
+        for name, build_request in pages:
+            result = run_scenario(driver, build_request, count, warmup)
+            click.echo('{:>8} {:<12} {:>9.2f} {:>9.2f} {:>9.2f} {:>7} {:>6}'.format(
+                ticket_count, name, result['p50_ms'], result['p95_ms'], result['p99_ms'],
+                result['statements_per_request'], result['errors']))
+
+# Load test
+# A minimal HTTP/1.1 client, so the connection count is not limited by a
+# client library's pool. Connections are spread over several processes to
+# keep the client from being the bottleneck.
+def _load_servers(port, workers):
+    bench = os.path.abspath(__file__)
+    return [
+        ('sync (werkzeug threads)', [sys.executable, bench, 'serve-sync', '--port', str(port)]),
+        ('async (uvicorn x{})'.format(workers), [
+            sys.executable, '-m', 'uvicorn', 'asgi:application', '--host', '127.0.0.1', '--port', str(port),
+            '--workers', str(workers), '--backlog', '4096', '--log-level', 'warning'
+        ])
+    ]
+
+async def _read_response(reader):
+    """Read one response; returns its status and whether the connection stays open."""
+    version, status = (await reader.readline()).split()[:2]
+    keep_alive = version == b'HTTP/1.1'
+    length, chunked = 0, False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value.lower():
+            chunked = True
+        elif name == 'connection' and value.strip().lower() == 'close':
+            keep_alive = False
+    if not chunked:
+        await reader.readexactly(length)
+        return int(status), keep_alive
+    while True:
+        size = int((await reader.readline()).split(b';')[0], 16)
+        await reader.readexactly(size + 2)
+        if size == 0:
+            return int(status), keep_alive
+
+async def _load_connection(host, port, paths, deadline, rng, results):
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        # Reconnecting counts towards the request, as a client would see it
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write('GET {} HTTP/1.1\r\nHost: {}\r\n\r\n'.format(rng.choice(paths), host).encode())
+            status, keep_alive = await _read_response(reader)
+            results['latencies'].append((time.perf_counter() - start) * 1000)
+            if status >= 500:
+                results['errors'] += 1
+            if not keep_alive:
+                writer.close()
+                reader = writer = None
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            results['errors'] += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+# Requests still unanswered this long after the deadline count as errors
+LOAD_GRACE_SECONDS = 5
+
+async def _load_process(host, port, paths, connections, seconds, seed):
+    rng = random.Random(seed)
+    results = {"latencies": [], "errors": 0}
+    deadline = time.perf_counter() + seconds
+    tasks = [asyncio.ensure_future(_load_connection(host, port, paths, deadline, rng, results)) for _ in range(connections)]
+    _, pending = await asyncio.wait(tasks, timeout=seconds + LOAD_GRACE_SECONDS)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    results['errors'] += len(pending)
+    return results
+
+def _run_load_process(args):
+    return asyncio.run(_load_process(*args))
+
+def _raise_open_file_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+def run_load(url, paths, concurrency, seconds, processes, seed):
+    host, _, port = url.split('://', 1)[-1].rstrip('/').partition(':')
+    port = int(port or 80)
+    split = [concurrency // processes + (1 if index < concurrency % processes else 0) for index in range(processes)]
+    jobs = [(host, port, paths, connections, seconds, seed + index) for index, connections in enumerate(split) if connections]
+    started = time.perf_counter()
+    with multiprocessing.Pool(len(jobs)) as pool:
+        parts = pool.map(_run_load_process, jobs)
+    elapsed = time.perf_counter() - started
+    latencies = sorted(latency for part in parts for latency in part['latencies'])
+    if not latencies:
+        raise click.ClickException('No request completed against {}'.format(url))
+    return {
+        "requests": len(latencies),
+        "errors": sum(part['errors'] for part in parts),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.50), 3),
+        "p99_ms": round(_percentile(latencies, 0.99), 3)
+    }
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _start_server(name, command, port):
+    env = dict(os.environ, CACHE_MAX_ENTRIES='0')  # Every request reaches the views
+    server = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise click.ClickException('{} exited with status {}'.format(name, server.returncode))
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise click.ClickException('{} did not start listening'.format(name))
+
+def _load_paths(fixtures):
+    paths = ['/events', '/events?limit=20', '/check_login']
+    paths += ['/events/{}'.format(event_id) for event_id in fixtures['event_ids']]
+    paths += ['/event_ticket_counts/{}/{}'.format(event_id, tier) for event_id, tier in fixtures['in_stock']]
+    return paths
+
+@cli.command()
+@click.option('--url', help='Load an already running server.')
+@click.option('--compare', is_flag=True, help='Start the sync and async servers in turn and load both.')
+@click.option('--concurrency', default=1000, show_default=True, help='Open keep-alive connections.')
+@click.option('--seconds', default=20.0, show_default=True)
+@click.option('--processes', default=max((os.cpu_count() or 2) // 2, 1), show_default=True, help='Client processes.')
+@click.option('--workers', default=1, show_default=True, help='uvicorn workers for the async server (--compare).')
+@click.option('--seed', type=int, default=0, show_default=True)
+def load(url, compare, concurrency, seconds, processes, workers, seed):
+    """Compare the sync and async serving modes under many concurrent connections."""
+    if bool(url) == compare:
+        raise click.UsageError('Pass either --url or --compare')
+    _raise_open_file_limit()
+    paths = _load_paths(_sample_fixtures())
+    runs = []
+    if url:
+        runs.append((url, run_load(url, paths, concurrency, seconds, processes, seed)))
+    else:
+        port = _free_port()
+        for name, command in _load_servers(port, workers):
+            server = _start_server(name, command, port)
+            try:
+                runs.append((name, run_load('http://127.0.0.1:{}'.format(port), paths, concurrency, seconds, processes, seed)))
+            finally:
+                server.terminate()
+                server.wait()
+    click.echo('{} connections, {:.0f}s'.format(concurrency, seconds))
+    click.echo('{:<24} {:>10} {:>10} {:>10} {:>10} {:>7}'.format('server', 'requests', 'req/s', 'p50 ms', 'p99 ms', 'errors'))
+    for name, result in runs:
+        click.echo('{:<24} {:>10} {:>10.1f} {:>10.2f} {:>10.2f} {:>7}'.format(
+            name, result['requests'], result['rps'], result['p50_ms'], result['p99_ms'], result['errors']))
+
+@cli.command('serve-sync', hidden=True)
+@click.option('--port', type=int, required=True)
+def serve_sync(port):
+    """Serve the Flask app on werkzeug's threaded server with keep-alive."""
+    from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler, run_simple
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    ThreadedWSGIServer.request_queue_size = 4096
+    run_simple('127.0.0.1', port, app, threaded=True, request_handler=KeepAliveHandler)
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+
+# Configure the app before it is imported: a throwaway SQLite database and
+# cheap password hashes
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'test.db')
+os.environ['DATABASE_URL'] = 'sqlite:///' + DATABASE_PATH
+os.environ['PASSWORD_HASH_ITERATIONS'] = '1000'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import app as backend
+from app import db
+
+@pytest.fixture
+def app(monkeypatch):
+    # A cache that keeps nothing, so every request reaches its view
+    monkeypatch.setattr(backend, 'response_cache', backend.MemoryCache(0))
+    with backend.app.app_context():
+        # Fresh connections: a pooled SQLite connection can keep a cached FTS5
+        # table that an earlier test dropped and recreated on another one
+        db.engine.dispose()
+        db.drop_all()
+        db.create_all()
+        yield backend.app
+        db.session.remove()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def statements(app):
+    """Record the SQL statements sent while the test runs."""
+    sent = []
+
+    def listener(conn, cursor, statement, *args):
+        sent.append(statement)
+
+    backend.sa_event.listen(db.engine, 'before_cursor_execute', listener)
+    yield sent
+    backend.sa_event.remove(db.engine, 'before_cursor_execute', listener)
+
+def add_event(name='Event', tiers=(('VIP', 10),), venue='KICC', time=backend.datetime(2030, 1, 1, 18), organiser_id=None):
+    """Insert an event with one date, and a ticket count and type per tier."""
+    event = backend.Event(name=name, venue=venue, time=time, organiser_id=organiser_id)
+    db.session.add(event)
+    db.session.flush()
+    db.session.add(backend.EventDate(event_id=event.id, event_date=backend.datetime(2030, 1, 1)))
+    for tier, count in tiers:
+        db.session.add(backend.EventTicketCount(event_id=event.id, tier=tier, total_count=count, available_count=count, total_purchased=0))
+        db.session.add(backend.EventTicketType(event_id=event.id, tier_name=tier, price=100))
+    db.session.commit()
+    return event.id
+
+def login(client, role='organiser', email=None):
+    """Register a user with the given role, log the client in as them and return their id."""
+    email = email or '{}@example.com'.format(role)
+    client.post('/register', json={"username": email.split('@')[0], "email": email, "password": 'secret', "role": role})
+    response = client.post('/login', json={"email": email, "password": 'secret'})
+    assert response.status_code == 200
+    return db.session.execute(db.select(backend.User.id).where(backend.User.email == email)).scalar()
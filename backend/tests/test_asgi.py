@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('aiosqlite')
+
+from conftest import add_event, login
+import app as backend
+import asgi
+
+@pytest.fixture
+def cache(app, monkeypatch):
+    cache = backend.MemoryCache(1024)
+    monkeypatch.setattr(backend, 'response_cache', cache)
+    return cache
+
+def _get(path, headers=()):
+    scope = {
+        "type": 'http', "method": 'GET', "path": path, "query_string": b'',
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers]
+    }
+    sent = []
+
+    async def receive():
+        return {"type": 'http.request', "body": b''}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi.application(scope, receive, send))
+    return sent[0]['status'], dict(sent[0]['headers']), sent[1]['body']
+
+def test_async_event_shares_the_flask_cache(client, cache, statements):
+    event_id = add_event()
+    path = '/events/{}'.format(event_id)
+    flask_response = client.get(path)
+
+    del statements[:]
+    status, headers, body = _get(path)
+    assert status == 200
+    assert body == flask_response.data
+    assert headers[b'etag'].decode() == flask_response.headers['ETag']
+    assert statements == []
+
+    status, headers, body = _get(path, [('If-None-Match', flask_response.headers['ETag'])])
+    assert status == 304
+    assert body == b''
+
+def test_async_listing_is_retired_by_writes(client, cache):
+    event_id = add_event(tiers=(('VIP', 10),))
+    status, before, _ = _get('/events')
+    assert status == 200
+
+    login(client, role='user')
+    assert client.post('/events/{}/purchase'.format(event_id), json={"tier": 'VIP', "quantity": 2}).status_code == 201
+    status, after, _ = _get('/events', [('If-None-Match', before[b'etag'].decode())])
+    assert status == 200
+    assert after[b'etag'] != before[b'etag']
@@ -0,0 +1,51 @@
+import pytest
+
+from conftest import add_event, login
+import app as backend
+
+@pytest.fixture
+def cache(app, monkeypatch):
+    cache = backend.MemoryCache(1024)
+    monkeypatch.setattr(backend, 'response_cache', cache)
+    return cache
+
+def _available(response):
+    return {count['tier']: count['available_count'] for count in response.get_json()['ticket_counts']}
+
+def test_matching_etag_is_not_modified(client, cache, statements):
+    event_id = add_event()
+    first = client.get('/events/{}'.format(event_id))
+    assert first.status_code == 200
+    assert first.headers['ETag']
+
+    del statements[:]
+    response = client.get('/events/{}'.format(event_id), headers={"If-None-Match": first.headers['ETag']})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert statements == []
+
+def test_purchase_changes_the_cached_event(client, cache):
+    event_id = add_event(tiers=(('VIP', 10),))
+    before = client.get('/events/{}'.format(event_id))
+    assert _available(before) == {'VIP': 10}
+
+    login(client, role='user')
+    assert client.post('/events/{}/purchase'.format(event_id), json={"tier": 'VIP', "quantity": 2}).status_code == 201
+    after = client.get('/events/{}'.format(event_id), headers={"If-None-Match": before.headers['ETag']})
+    assert after.status_code == 200
+    assert _available(after) == {'VIP': 8}
+    assert after.headers['ETag'] != before.headers['ETag']
+
+def test_event_writes_only_retire_that_event(client, cache, statements):
+    changed, untouched = add_event('Changed'), add_event('Untouched')
+    for event_id in (changed, untouched):
+        client.get('/events/{}'.format(event_id))
+    login(client)
+    response = client.post('/event_ticket_counts', json={"event_id": changed, "tier": 'Regular', "total_count": 5, "available_count": 5})
+    assert response.status_code == 201
+
+    del statements[:]
+    client.get('/events/{}'.format(untouched))
+    assert statements == []
+    assert 'Regular' in _available(client.get('/events/{}'.format(changed)))
+    assert statements != []
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import pytest
+
+from conftest import add_event
+from app import Category, EventCategory, db
+
+def _statements_for(client, statements, path):
+    del statements[:]
+    response = client.get(path)
+    assert response.status_code == 200
+    return len(statements), response.get_json()
+
+def test_event_listing_statements_do_not_grow_with_events(client, statements):
+    add_event('First', tiers=(('VIP', 10), ('Regular', 50)))
+    one, events = _statements_for(client, statements, '/events')
+    assert len(events) == 1
+
+    for index in range(20):
+        add_event('Event {}'.format(index), tiers=(('VIP', 10), ('Regular', 50)))
+    many, events = _statements_for(client, statements, '/events')
+    assert len(events) == 21
+    assert many == one
+
+def test_event_catalog_is_complete(client):
+    event_id = add_event('Gala', tiers=(('VIP', 10), ('Regular', 50)))
+    event = client.get('/events/{}'.format(event_id)).get_json()
+    assert event['name'] == 'Gala'
+    assert event['date'] is not None
+    assert sorted(count['tier'] for count in event['ticket_counts']) == ['Regular', 'VIP']
+    assert sorted(ticket_type['tier_name'] for ticket_type in event['ticket_types']) == ['Regular', 'VIP']
+
+def _walk(client, path):
+    ids, cursor = [], None
+    while True:
+        response = client.get(path, query_string={"limit": 2, "cursor": cursor} if cursor else {"limit": 2})
+        assert response.status_code == 200
+        ids += [event['id'] for event in response.get_json()]
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return ids
+
+@pytest.mark.parametrize('path', ['/events', '/events/summary'])
+def test_cursor_walk_visits_every_event_once_with_untimed_events_last(client, path):
+    times = [datetime(2030, 3, 1), None, datetime(2030, 1, 1), datetime(2030, 1, 1), None, datetime(2030, 2, 1)]
+    ids = [add_event('Event {}'.format(index), time=time) for index, time in enumerate(times)]
+    expected = sorted(ids, key=lambda id: (times[ids.index(id)] is None, times[ids.index(id)] or datetime.min, id))
+    assert _walk(client, path) == expected
+
+def test_listing_filters(client):
+    first, second = add_event('First'), add_event('Second')
+    db.session.add(Category(id=1, name='Music'))
+    db.session.add(EventCategory(event_id=second, category_id=1))
+    db.session.commit()
+    assert [event['id'] for event in client.get('/events?category=1').get_json()] == [second]
+    assert [event['id'] for event in client.get('/events?limit=1').get_json()] == [first]
+
+@pytest.mark.parametrize('query', ['category=abc', 'tag=abc', 'limit=abc', 'cursor=abc'])
+def test_listing_rejects_bad_parameters(client, query):
+    add_event()
+    assert client.get('/events?' + query).status_code == 400
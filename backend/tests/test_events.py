@@ -0,0 +1,74 @@
+import pytest
+
+from conftest import add_event, login
+import app as backend
+from app import Event, EventTicketCount, EventTicketType, db
+
+def _tier(event_id, tier='VIP'):
+    db.session.expire_all()
+    count = db.session.get(EventTicketCount, (event_id, tier))
+    return count and (count.total_count, count.available_count, count.total_purchased)
+
+def test_tier_update_keeps_sales_made_after_the_read(client, monkeypatch):
+    event_id = add_event(tiers=(('VIP', 10),), organiser_id=login(client))
+    upsert = backend.upsert
+
+    def sell_then_upsert(model, *args, **kwargs):
+        # Three tickets sell on another connection after the tiers were read
+        if model is EventTicketCount:
+            with db.engine.begin() as connection:
+                connection.execute(
+                    db.update(EventTicketCount)
+                    .where(EventTicketCount.event_id == event_id)
+                    .values(available_count=EventTicketCount.available_count - 3,
+                            total_purchased=EventTicketCount.total_purchased + 3)
+                )
+        return upsert(model, *args, **kwargs)
+
+    monkeypatch.setattr(backend, 'upsert', sell_then_upsert)
+    response = client.put('/events/{}'.format(event_id), json={"ticket_counts": [{"tier": 'VIP', "total_count": 12}]})
+    assert response.status_code == 200
+    assert _tier(event_id) == (12, 7, 3)
+
+def test_failed_update_leaves_no_partial_state(client):
+    event_id = add_event(name='Before', tiers=(('VIP', 10),), organiser_id=login(client))
+    response = client.put('/events/{}'.format(event_id), json={
+        "name": 'After',
+        "ticket_counts": [{"tier": 'VIP', "total_count": 20, "available_count": 20}],
+        # Written last, and rejected by the NOT NULL on price
+        "ticket_types": [{"tier_name": 'VIP', "price": 150}, {"tier_name": 'Regular'}]
+    })
+    assert response.status_code == 400
+
+    db.session.expire_all()
+    assert db.session.get(Event, event_id).name == 'Before'
+    assert _tier(event_id) == (10, 10, 0)
+    assert db.session.execute(
+        db.select(EventTicketType.tier_name, EventTicketType.price).where(EventTicketType.event_id == event_id)
+    ).all() == [('VIP', 100)]
+
+@pytest.mark.parametrize('path', ['/events', '/events/import', '/event_ticket_counts', '/event_ticket_types',
+                                  '/event_dates', '/categories', '/tags'])
+def test_catalog_writes_need_an_organiser(client, path):
+    assert client.post(path, json={}).status_code == 401
+    login(client, role='user')
+    assert client.post(path, json={}).status_code == 403
+
+def test_events_belong_to_the_organiser_who_created_them(app):
+    owner, other = app.test_client(), app.test_client()
+    owner_id = login(owner, email='owner@example.com')
+    login(other, email='other@example.com')
+
+    response = owner.post('/events', json={"name": 'Owned', "venue": 'KICC', "organiser_id": 999})
+    assert response.status_code == 201
+    event = db.session.execute(db.select(Event).where(Event.name == 'Owned')).scalar_one()
+    assert event.organiser_id == owner_id
+
+    assert other.put('/events/{}'.format(event.id), json={"name": 'Taken'}).status_code == 403
+    assert other.delete('/events/{}'.format(event.id)).status_code == 403
+    assert other.delete('/events/{}'.format(event.id + 1)).status_code == 404
+    db.session.expire_all()
+    assert db.session.get(Event, event.id).name == 'Owned'
+
+    assert owner.put('/events/{}'.format(event.id), json={"name": 'Renamed'}).status_code == 200
+    assert owner.delete('/events/{}'.format(event.id)).status_code == 200
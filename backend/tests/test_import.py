@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from conftest import login
+from app import Event, EventImportError, EventTicketCount, db, import_events
+
+def _record(name, total_count=10):
+    tier = {"tier": 'VIP', "available_count": total_count}
+    if total_count is not None:
+        tier['total_count'] = total_count
+    return {"name": name, "event_date": '2030-01-01', "ticket_counts": [tier], "ticket_types": [{"tier_name": 'VIP', "price": 100}]}
+
+def _ndjson(records):
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+def test_import_writes_events(client):
+    organiser_id = login(client)
+    records = [_record('A'), dict(_record('B'), organiser_id=999)]
+    response = client.post('/events/import', data=_ndjson(records), content_type='application/x-ndjson')
+    assert response.status_code == 201
+    assert response.get_json()['imported'] == 2
+    assert db.session.execute(db.select(db.func.count(EventTicketCount.event_id))).scalar() == 2
+    assert db.session.execute(db.select(Event.organiser_id)).scalars().all() == [organiser_id] * 2
+
+def test_import_database_error_is_a_client_error(client):
+    login(client)
+    response = client.post('/events/import', data=_ndjson([_record('A'), _record('B', total_count=None)]), content_type='application/x-ndjson')
+    assert response.status_code == 400
+    assert response.get_json()['imported'] == 0
+    assert 'total_count' in response.get_json()['message']
+    assert db.session.execute(db.select(db.func.count(Event.id))).scalar() == 0
+
+def test_import_reports_chunks_committed_before_a_failure(app):
+    with pytest.raises(EventImportError) as failure:
+        import_events([_record('A'), _record('B'), _record('C', total_count=None), _record('D')], chunk_size=2)
+    assert failure.value.imported == 2
+    names = db.session.execute(db.select(Event.name).order_by(Event.name)).scalars().all()
+    assert names == ['A', 'B']
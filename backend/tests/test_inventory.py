@@ -0,0 +1,37 @@
+import asyncio
+import random
+
+import pytest
+
+import app as backend
+
+def test_inventory_push_is_off_by_default(client):
+    assert client.get('/inventory/stream').status_code == 404
+
+def test_fan_out_sends_at_most_one_message_per_subscriber_per_tick(app, monkeypatch):
+    pytest.importorskip('aiosqlite')
+    import asgi
+    import bench
+
+    subscribers, tick, seconds, rate = 200, 0.1, 1.0, 1000
+    # A broker of its own: the ASGI relay is bound to the event loop that
+    # first subscribed, and asyncio.run makes a new one
+    broker = backend.InventoryBroker(tick)
+    monkeypatch.setitem(app.config, 'INVENTORY_PUSH', True)
+    monkeypatch.setattr(asgi, 'inventory_broker', broker)
+    monkeypatch.setattr(asgi, 'local_broker', None)
+    monkeypatch.setattr(bench, 'inventory_broker', broker)
+
+    counters, published, cpu, wall = asyncio.run(bench._hold_subscribers(
+        asgi.application, subscribers, 0.5, 10, seconds, rate, random.Random(0)
+    ))
+    for relay in list(broker.subscriptions):
+        broker.unsubscribe(relay)
+    ticks = wall / tick
+    assert counters['connected'] == subscribers
+    assert published >= rate * seconds * 0.9
+    # Updates are coalesced per tick, however fast they are published
+    assert counters['messages'] <= subscribers * (ticks + 2)
+    # The unfiltered half sees a change on nearly every tick
+    assert counters['messages'] >= subscribers / 2 * ticks / 2
+    assert cpu / wall < 0.5
@@ -0,0 +1,12 @@
+import json
+
+import pytest
+
+import app as backend
+
+@pytest.mark.skipif(backend.orjson is None, reason='orjson is not installed')
+def test_orjson_provider_falls_back_for_values_orjson_rejects(app):
+    provider = backend.OrjsonProvider(app)
+    value = {"id": 2 ** 70, "name": 'Café'}
+    assert json.loads(provider.dumps(value)) == value
+    assert json.loads(provider.dumps({"name": 'Café'})) == {"name": 'Café'}
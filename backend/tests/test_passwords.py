@@ -0,0 +1,10 @@
+import app as backend
+
+def test_calibrated_iterations_are_a_whole_step(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_ITERATIONS', 0)
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_MIN_ITERATIONS', 1000)
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_ITERATION_STEP', 50000)
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_TARGET_MS', 2000)
+    counts = {backend._calibrate_hash_iterations() for _ in range(3)}
+    assert all(count % 50000 == 0 for count in counts)
+    assert min(counts) >= 1000
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from conftest import add_event, login
+import app as backend
+from app import Payment, Ticket, db
+
+@pytest.fixture
+def secret(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'PAYMENT_WEBHOOK_SECRET', 'webhook-secret')
+
+def _post_signed(client, path, payload):
+    body = json.dumps(payload).encode()
+    return client.post(path, data=body, content_type='application/json',
+                       headers={"X-Signature": backend.payment_signature(body)})
+
+def _ticket_id(client):
+    event_id = add_event(tiers=(('VIP', 10),))
+    login(client, role='user')
+    response = client.post('/events/{}/purchase'.format(event_id), json={"tier": 'VIP'})
+    return response.get_json()['ticket_ids'][0]
+
+def test_settled_payment_beats_a_later_retry_in_the_same_batch(client, secret):
+    ticket_id = _ticket_id(client)
+    response = _post_signed(client, '/payments/ingest', [
+        {"ticket_id": ticket_id, "transaction_id": 'X', "status": 'completed'},
+        {"ticket_id": ticket_id, "transaction_id": 'X', "status": 'pending'}
+    ])
+    assert response.status_code == 200
+    assert response.get_json()['ingested'] == 1
+
+    response = _post_signed(client, '/payments/ingest', {"ticket_id": ticket_id, "transaction_id": 'X', "status": 'pending'})
+    assert response.get_json()['ingested'] == 0
+
+    db.session.expire_all()
+    assert db.session.execute(db.select(Payment.transaction_id, Payment.status)).all() == [('X', 'completed')]
+    assert db.session.get(Ticket, ticket_id).status == 'paid'
+
+@pytest.mark.parametrize('path', ['/payments', '/payments/ingest'])
+@pytest.mark.parametrize('signature', [None, 'bad', 'other-secret'])
+def test_unsigned_payments_are_rejected(client, secret, path, signature):
+    ticket_id = _ticket_id(client)
+    body = json.dumps({"ticket_id": ticket_id, "transaction_id": 'X', "status": 'completed'}).encode()
+    headers = {}
+    if signature == 'other-secret':
+        headers['X-Signature'] = backend.hmac.new(b'other-secret', body, backend.hashlib.sha256).hexdigest()
+    elif signature:
+        headers['X-Signature'] = signature
+    response = client.post(path, data=body, content_type='application/json', headers=headers)
+    assert response.status_code == 401
+
+    db.session.expire_all()
+    assert db.session.execute(db.select(Payment)).all() == []
+    assert db.session.get(Ticket, ticket_id).status == 'pending'
+
+def test_payments_are_closed_without_a_secret(client):
+    ticket_id = _ticket_id(client)
+    response = client.post('/payments', json={"ticket_id": ticket_id, "transaction_id": 'X', "status": 'completed'},
+                           headers={"X-Signature": ''})
+    assert response.status_code == 401
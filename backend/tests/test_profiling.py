@@ -0,0 +1,51 @@
+import re
+
+import pytest
+
+from conftest import add_event
+import app as backend
+from app import db
+
+@pytest.fixture
+def profiled(app, monkeypatch):
+    backend.sa_event.listen(db.engine, 'before_cursor_execute', backend._before_cursor_execute)
+    backend.sa_event.listen(db.engine, 'after_cursor_execute', backend._after_cursor_execute)
+    monkeypatch.setattr(app, 'before_request_funcs', {None: [backend._start_request_profile]})
+    monkeypatch.setattr(app, 'after_request_funcs', {None: [backend._finish_request_profile]})
+    yield
+    backend.sa_event.remove(db.engine, 'before_cursor_execute', backend._before_cursor_execute)
+    backend.sa_event.remove(db.engine, 'after_cursor_execute', backend._after_cursor_execute)
+
+def test_failed_statement_leaves_no_timing_behind(app, profiled):
+    with app.test_request_context():
+        backend._start_request_profile()
+        connection = db.session.connection()
+        info = dict(connection.info)
+        with pytest.raises(Exception):
+            connection.execute(db.text('SELECT * FROM no_such_table'))
+        assert dict(connection.info) == info
+        db.session.rollback()
+
+def test_sqlite_selects_are_uncounted_not_zero(client, profiled):
+    add_event()
+    response = client.get('/events')
+    assert response.status_code == 200
+    statements, rows, uncounted = map(int, re.search(
+        r'(\d+) statements, (\d+) rows, (\d+) uncounted', response.headers['Server-Timing']
+    ).groups())
+    assert uncounted == statements
+    assert rows == 0
+
+@pytest.mark.parametrize('statement, explainable', [
+    ('SELECT events.id FROM events WHERE events.id = %(id)s', True),
+    ("SELECT nextval(pg_get_serial_sequence('events', 'id')) FROM generate_series(1, 5)", False),
+    ("SELECT setval('events_id_seq', 10)", False),
+    ('SELECT pg_notify(%(channel)s, %(payload)s)', False),
+    ('SELECT pg_try_advisory_lock(1)', False),
+    ('SELECT jobs.id FROM jobs LIMIT 10 FOR UPDATE SKIP LOCKED', False),
+    ('SELECT * FROM event_summary FOR NO KEY UPDATE', False),
+    ('SELECT * INTO events_copy FROM events', False),
+    ('UPDATE events SET name = %(name)s', False),
+])
+def test_only_side_effect_free_selects_are_explained(statement, explainable):
+    assert backend._explainable(statement) is explainable
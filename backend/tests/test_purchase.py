@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from conftest import add_event, login
+from app import EventTicketCount, Ticket, db
+
+def test_purchase_does_not_reload_tickets(client, statements):
+    event_id = add_event(tiers=(('VIP', 10),))
+    login(client, role='user')
+    response = client.post('/events/{}/purchase'.format(event_id), json={"tier": 'VIP', "quantity": 5})
+    assert response.status_code == 201
+    reloads = [statement for statement in statements if statement.lstrip().startswith('SELECT') and 'FROM tickets' in statement]
+    assert reloads == []
+    ticket_ids = response.get_json()['ticket_ids']
+    assert sorted(ticket_ids) == db.session.execute(db.select(Ticket.id).order_by(Ticket.id)).scalars().all()
+
+def test_concurrent_purchases_never_oversell(app):
+    stock, threads, attempts = 50, 8, 20
+    event_id = add_event(tiers=(('VIP', stock),))
+    clients = [app.test_client() for _ in range(threads)]
+    for client in clients:
+        login(client, role='user')
+    statuses = Counter()
+    lock = threading.Lock()
+    start = threading.Barrier(threads)
+
+    def buyer(client):
+        start.wait()
+        for _ in range(attempts):
+            status = client.post('/events/{}/purchase'.format(event_id), json={"tier": 'VIP'}).status_code
+            with lock:
+                statuses[status] += 1
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=buyer, args=(client,)) for client in clients]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    print('{} purchase attempts in {:.2f}s ({:.0f}/s): {}'.format(
+        threads * attempts, elapsed, threads * attempts / elapsed, dict(statuses)))
+
+    db.session.expire_all()
+    count = db.session.get(EventTicketCount, (event_id, 'VIP'))
+    sold = db.session.execute(db.select(db.func.count(Ticket.id))).scalar()
+    assert statuses[201] == stock
+    assert statuses[409] == threads * attempts - stock
+    assert count.available_count == 0
+    assert count.total_purchased == stock
+    assert sold == stock
+
+def test_purchase_needs_a_login(client):
+    event_id = add_event(tiers=(('VIP', 10),))
+    response = client.post('/events/{}/purchase'.format(event_id), json={"tier": 'VIP', "user_id": 999})
+    assert response.status_code == 401
+    assert db.session.get(EventTicketCount, (event_id, 'VIP')).available_count == 10
+
+@pytest.mark.parametrize('quantity', [True, 0, -1, 1.5, '2'])
+def test_purchase_rejects_bad_quantities(client, quantity):
+    event_id = add_event(tiers=(('VIP', 10),))
+    login(client, role='user')
+    response = client.post('/events/{}/purchase'.format(event_id), json={"tier": 'VIP', "quantity": quantity})
+    assert response.status_code == 400
@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+
+import pytest
+
+from conftest import DATABASE_PATH, add_event
+import app as backend
+from app import Event, db
+
+@pytest.fixture
+def replica(app, monkeypatch):
+    """A second SQLite file behind a ReplicaRouter, holding its own copy of the event rows."""
+    path = os.path.join(os.path.dirname(DATABASE_PATH), 'replica.db')
+    if os.path.exists(path):
+        os.remove(path)
+    router = backend.ReplicaRouter(['sqlite:///' + path], max_lag=5, interval=1)
+    # Lag checks run by hand below rather than on the background thread
+    router.thread = threading.main_thread()
+    db.metadata.create_all(router.engines[0])
+    router.check()
+    monkeypatch.setattr(backend, 'replica_router', router)
+    yield router
+    router.engines[0].dispose()
+
+def _copy_to_replica(router, event_id, name):
+    with router.engines[0].begin() as connection:
+        connection.execute(db.insert(Event).values(id=event_id, name=name, venue='KICC', time=backend.datetime(2030, 1, 1, 18)))
+
+def _name(client, event_id):
+    response = client.get('/events/{}'.format(event_id))
+    assert response.status_code == 200
+    return response.get_json()['name']
+
+def test_reads_go_to_a_replica(client, replica):
+    event_id = add_event('On the primary')
+    _copy_to_replica(replica, event_id, 'On the replica')
+    assert _name(client, event_id) == 'On the replica'
+
+def test_a_write_pins_the_client_to_the_primary(client, replica):
+    event_id = add_event('On the primary')
+    _copy_to_replica(replica, event_id, 'On the replica')
+
+    # Logging in is a write, so it sets the sticky cookie
+    response = client.post('/register', json={"username": 'u', "email": 'u@example.com', "password": 'secret', "role": 'user'})
+    assert backend.REPLICA_STICKY_COOKIE in response.headers['Set-Cookie']
+    assert _name(client, event_id) == 'On the primary'
+
+    client.set_cookie(backend.REPLICA_STICKY_COOKIE, '{:.3f}'.format(time.time() - 1))
+    assert _name(client, event_id) == 'On the replica'
+
+def test_failed_writes_do_not_pin_the_client(client, replica):
+    response = client.post('/login', json={"email": 'nobody@example.com', "password": 'wrong'})
+    assert response.status_code >= 400
+    assert backend.REPLICA_STICKY_COOKIE not in response.headers.get('Set-Cookie', '')
+
+def test_a_lagging_replica_is_skipped(client, replica):
+    event_id = add_event('On the primary')
+    _copy_to_replica(replica, event_id, 'On the replica')
+
+    def report_lag(conn, cursor, statement, parameters, context, executemany):
+        # SQLite has no replication, so the router's probe stands in for 30 s of lag
+        return ('SELECT 30' if statement == 'SELECT 0' else statement), parameters
+
+    backend.sa_event.listen(replica.engines[0], 'before_cursor_execute', report_lag, retval=True)
+    replica.check()
+    assert replica.lags == [30.0]
+    assert replica.pick() is None
+    assert _name(client, event_id) == 'On the primary'
+
+def test_writes_in_a_read_only_request_use_the_primary(app, replica):
+    event_id = add_event('On the primary')
+    _copy_to_replica(replica, event_id, 'On the replica')
+    primary = db.engine
+    with app.test_request_context():
+        backend.g.read_replica = replica.engines[0]
+        assert db.session.get_bind(clause=db.select(Event)) is replica.engines[0]
+        assert db.session.get_bind(clause=db.update(Event)) is primary
+
+        db.session.execute(db.update(Event).where(Event.id == event_id).values(name='Updated'))
+        db.session.add(Event(name='Added', venue='KICC', time=backend.datetime(2030, 1, 1, 18)))
+        db.session.commit()
+
+    with primary.connect() as connection:
+        assert connection.execute(db.select(Event.name).order_by(Event.id)).scalars().all() == ['Updated', 'Added']
+    with replica.engines[0].connect() as connection:
+        assert connection.execute(db.select(Event.name)).scalars().all() == ['On the replica']
@@ -0,0 +1,50 @@
+from conftest import add_event, login
+from app import EventTicketCount, Payment, Reservation, Ticket, User, db
+
+def _reserve(client, event_id, quantity=2):
+    response = client.post('/events/{}/reservations'.format(event_id), json={"tier": 'VIP', "quantity": quantity})
+    assert response.status_code == 201
+    return response.get_json()['reservation_id']
+
+def test_holds_belong_to_the_logged_in_user(client):
+    event_id = add_event(tiers=(('VIP', 10),))
+    response = client.post('/events/{}/reservations'.format(event_id), json={"tier": 'VIP', "quantity": 2, "user_id": 999})
+    assert response.status_code == 401
+    assert db.session.get(EventTicketCount, (event_id, 'VIP')).available_count == 10
+    assert db.session.execute(db.select(Reservation)).all() == []
+
+    login(client, role='user', email='buyer@example.com')
+    response = client.post('/events/{}/reservations'.format(event_id), json={"tier": 'VIP', "quantity": 2, "user_id": 999})
+    assert response.status_code == 201
+    reservation_id = response.get_json()['reservation_id']
+    buyer = db.session.execute(db.select(User.id).where(User.email == 'buyer@example.com')).scalar()
+    assert db.session.get(Reservation, reservation_id).user_id == buyer
+
+def test_confirming_a_hold_leaves_the_payment_pending(client):
+    event_id = add_event(tiers=(('VIP', 10),))
+    login(client, role='user')
+    reservation_id = _reserve(client, event_id)
+
+    response = client.post('/reservations/{}/confirm'.format(reservation_id), json={"status": 'completed'})
+    assert response.status_code == 400
+    assert db.session.get(Reservation, reservation_id).status == 'held'
+
+    response = client.post('/reservations/{}/confirm'.format(reservation_id), json={"transaction_id": 'T1', "status": 'completed'})
+    assert response.status_code == 200
+    db.session.expire_all()
+    assert db.session.execute(db.select(Payment.transaction_id, Payment.status)).all() == [('T1', 'pending')]
+    assert db.session.execute(db.select(Ticket.status)).scalars().all() == ['pending', 'pending']
+
+def test_only_the_holder_can_confirm_or_release(app):
+    event_id = add_event(tiers=(('VIP', 10),))
+    holder, other = app.test_client(), app.test_client()
+    login(holder, role='user', email='holder@example.com')
+    login(other, role='user', email='other@example.com')
+    reservation_id = _reserve(holder, event_id)
+
+    assert app.test_client().delete('/reservations/{}'.format(reservation_id)).status_code == 401
+    assert other.post('/reservations/{}/confirm'.format(reservation_id), json={"transaction_id": 'T1'}).status_code == 404
+    assert other.delete('/reservations/{}'.format(reservation_id)).status_code == 404
+    assert db.session.get(Reservation, reservation_id).status == 'held'
+
+    assert holder.delete('/reservations/{}'.format(reservation_id)).status_code == 200
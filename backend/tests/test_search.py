@@ -0,0 +1,18 @@
+import app as backend
+from app import db
+from conftest import add_event
+
+def test_search_index_is_created_with_the_schema(client):
+    add_event('Jazz Night', venue='KICC')
+    add_event('Rock Show', venue='Carnivore')
+    events = client.get('/events/search?q=jaz').get_json()
+    assert [event['name'] for event in events] == ['Jazz Night']
+
+def test_search_without_index_is_unavailable(client, monkeypatch):
+    add_event('Jazz Night')
+    db.session.execute(db.text("DROP TABLE events_fts"))
+    db.session.commit()
+    monkeypatch.setattr(backend, '_search_index_installed', False)
+    response = client.get('/events/search?q=jazz')
+    assert response.status_code == 503
+    assert response.is_json
@@ -0,0 +1,46 @@
+from conftest import add_event, login
+import app as backend
+from app import EventSummary, Job, _event_summary_query, db
+
+def _summary(event_id):
+    db.session.expire_all()
+    row = db.session.get(EventSummary, event_id)
+    return row.total_available, row.sold_out
+
+def test_inventory_changes_shift_the_summary_in_place(client, statements):
+    event_id = add_event(tiers=(('VIP', 2), ('Regular', 3)))
+    login(client, role='user')
+
+    statements.clear()
+    response = client.post('/events/{}/purchase'.format(event_id), json={"tier": 'VIP', "quantity": 2})
+    assert response.status_code == 201
+    assert [statement.split()[0] for statement in statements if 'event_summary' in statement] == ['UPDATE']
+    assert _summary(event_id) == (3, False)
+
+    response = client.post('/events/{}/reservations'.format(event_id), json={"tier": 'Regular', "quantity": 3})
+    assert response.status_code == 201
+    assert _summary(event_id) == (0, True)
+
+    assert client.delete('/reservations/{}'.format(response.get_json()['reservation_id'])).status_code == 200
+    assert _summary(event_id) == (3, False)
+    refreshed = db.session.execute(_event_summary_query([event_id])).mappings().one()
+    assert _summary(event_id) == (refreshed['total_available'], bool(refreshed['sold_out']))
+
+def test_deferred_inventory_changes_leave_the_summary_row_alone(client, statements, monkeypatch):
+    monkeypatch.setitem(backend.app.config, 'JOBS_DEFER_SUMMARIES', True)
+    event_id = add_event(tiers=(('VIP', 2), ('Regular', 3)))
+    backend.run_jobs(100)
+    login(client, role='user')
+
+    statements.clear()
+    for tier in ('VIP', 'Regular'):
+        response = client.post('/events/{}/purchase'.format(event_id), json={"tier": tier, "quantity": 1})
+        assert response.status_code == 201
+    assert not [statement for statement in statements if 'event_summary' in statement]
+    assert _summary(event_id) == (5, False)
+
+    statements.clear()
+    assert backend.run_jobs(100) == 2
+    assert [statement.split()[0] for statement in statements if 'event_summary' in statement] == ['UPDATE']
+    assert _summary(event_id) == (3, False)
+    assert db.session.execute(db.select(Job.status)).scalars().all() == ['done'] * 3